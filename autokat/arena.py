@@ -0,0 +1,158 @@
+"""An arena is a wall with its own game, tracker and clients.
+
+Several arenas are served by a single server, their games all run as tasks
+on the event loop of the server. Clients pick their arena with the URL of
+the websocket, ``/ws/{arena}``.
+"""
+from __future__ import annotations
+import asyncio
+import datetime
+import json
+from threading import Thread
+import time
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from autokat.connections import ConnectionManager
+from autokat.detection_channel import DetectionChannel, DetectionLatency, latest_capture
+from autokat.encoding import BinaryStateStream, StateStream, state_message
+from autokat.game import Game
+from autokat.metrics import REGISTRY
+from autokat.multitrack import DummyMultiLaserTracker, Vec
+from autokat.timestep import FixedTimestep
+
+TICK_SECONDS = REGISTRY.histogram("autokat_game_tick_seconds", "Time a step of the game takes", ["arena"])
+JITTER_SECONDS = REGISTRY.histogram("autokat_game_jitter_seconds", "How late the game loop woke up for a step that was due", ["arena"])
+BROADCAST_SECONDS = REGISTRY.histogram("autokat_game_broadcast_seconds", "Time it takes to encode a state and queue it for every client", ["arena"])
+
+
+class Arena:
+    """The game of one wall, the tracker that watches it and the clients that show it."""
+
+    def __init__(
+        self,
+        name: str,
+        laser_tracker,
+        tick_time: float = 0.03,
+        max_substeps: int = 4,
+        broadcast_time: float = 0.03,
+        keyframe_every: int = 100,
+        wake_on_detection: bool = False,
+    ):
+        self.name = name
+        self.laser_tracker = laser_tracker
+        # the pointers of the browser, when there's no laser tracker they're the only ones
+        self.dummy_tracker = laser_tracker if isinstance(laser_tracker, DummyMultiLaserTracker) else DummyMultiLaserTracker()
+        self.tick_time = tick_time
+        self.broadcast_time = broadcast_time
+        self.wake_on_detection = wake_on_detection
+        self.timestep = FixedTimestep(datetime.timedelta(seconds=tick_time), max_substeps=max_substeps)
+        self.game = Game(laser_tracker=laser_tracker)
+        self.manager = ConnectionManager(name=name)
+        self.state_stream = StateStream(keyframe_every=keyframe_every)
+        # for the clients that get the hot fields as binary frames, only encoded while there are any
+        self.binary_state_stream = BinaryStateStream(keyframe_every=keyframe_every)
+        self._last_document: dict | None = None
+        self.detection_channel = DetectionChannel()
+        laser_tracker.detection_channel = self.detection_channel
+        self.detection_latency = DetectionLatency()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start the tracker and the game, on the running event loop."""
+        self.detection_channel.bind(asyncio.get_running_loop())
+        Thread(target=self.laser_tracker.run, name=f"tracker {self.name}", daemon=True).start()
+        self._task = asyncio.create_task(self.run(), name=f"arena {self.name}")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self.manager.close()
+        if hasattr(self.laser_tracker, "stop"):
+            self.laser_tracker.stop()
+
+    async def run(self) -> None:
+        broadcast_every = max(round(self.broadcast_time / self.tick_time), 1)
+        steps_since_broadcast = 0
+        timestep = self.timestep
+        tick_seconds = TICK_SECONDS.labels(self.name)
+        jitter_seconds = JITTER_SECONDS.labels(self.name)
+        broadcast_seconds = BROADCAST_SECONDS.labels(self.name)
+        await asyncio.sleep(self.tick_time)
+        timestep.start()
+        woken_by_detection = False
+        while True:
+            messages = []
+            # fresh detections pull the next step in, the steps after it are due later
+            steps = timestep.advance(lead=self.tick_time if woken_by_detection else 0.0)
+            if steps:
+                jitter_seconds.observe(timestep.metrics.last_jitter)
+            for _ in range(steps):
+                total_dt = timestep.next_step()
+                started_at = time.perf_counter()
+                # only the messages of the last step are still worth sending
+                messages = list(self.game.tick(total_dt=total_dt, dt=timestep.step))
+                tick_seconds.observe(time.perf_counter() - started_at)
+                steps_since_broadcast += 1
+            if messages and steps_since_broadcast >= broadcast_every:
+                steps_since_broadcast = 0
+                started_at = time.perf_counter()
+                for message in messages:
+                    # encoded once, the same messages are queued for every client
+                    document = self._last_document = state_message(message)
+                    binary = None
+                    if self.manager.binary_clients:
+                        binary = [self.binary_state_stream.encode_document(document), self.binary_state_stream.hot_fields]
+                    else:
+                        # the first binary client that joins starts from a keyframe
+                        self.binary_state_stream.reset()
+                    await self.manager.broadcast(self.state_stream.encode_document(document), binary=binary)
+                broadcast_seconds.observe(time.perf_counter() - started_at)
+                self.detection_latency.record(latest_capture(self.laser_tracker.last_detections), datetime.datetime.now())
+            if self.wake_on_detection:
+                woken_by_detection = await self.detection_channel.wait(timestep.time_until_next_step())
+            else:
+                await asyncio.sleep(timestep.time_until_next_step())
+
+    async def send_keyframe(self, websocket: WebSocket) -> None:
+        if self.manager.is_binary(websocket):
+            if self.binary_state_stream.keyframe() is None and self._last_document is not None:
+                # no binary client was connected, the binary stream starts over at the latest state
+                self.binary_state_stream.encode_document(self._last_document)
+            if (keyframe := self.binary_state_stream.keyframe()) is not None:
+                await self.manager.send(websocket, (keyframe, self.binary_state_stream.hot_fields))
+        elif (keyframe := self.state_stream.keyframe()) is not None:
+            await self.manager.send(websocket, keyframe)
+
+    async def serve(self, websocket: WebSocket) -> None:
+        """Talk to a client of this arena until it disconnects."""
+        manager = self.manager
+        laser_tracker = self.laser_tracker
+        await manager.connect(websocket)
+        await self.send_keyframe(websocket)
+        try:
+            while True:
+                raw_data = await websocket.receive_text()
+                # print(raw_data)
+                data = json.loads(raw_data)
+                match data:
+                    case {"type": "pointer", "position": [x, y], "color": color}:
+                        self.dummy_tracker.detect(color, Vec(x, y))
+                    case {"type": "resync"}:
+                        await self.send_keyframe(websocket)
+                    case {"type": "encoding", "binary": bool(binary)}:
+                        manager.set_binary(websocket, binary)
+                        await self.send_keyframe(websocket)
+                    case {"type": "calibration", "corner": corner}:
+                        print("cal", self.name, corner)
+                        if hasattr(laser_tracker, "calibrate_corner"):
+                            # every camera has its own camera position of the laser
+                            laser_tracker.calibrate_corner(corner, "red")
+                        else:
+                            laser_tracker.update_calibration(**{corner: Vec(*laser_tracker.last_detections["red"].camera_position)})
+
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # also when the manager already evicted this client
+            manager.disconnect(websocket)
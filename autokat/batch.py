@@ -0,0 +1,510 @@
+"""Many headless games at once, to balance the game.
+
+``BatchPlaying`` keeps N independent games of ``Playing`` in NumPy arrays and
+steps them all together, with the same arithmetic as ``Playing.tick`` one
+array element at a time. It has no shapely shapes, clients or leaderboard, so
+it's fast enough to play thousands of games with different settings and look
+at the scores they reach. The tests check it against ``Playing`` tick by tick.
+
+The lights follow pointers that are moved by a pointer policy, like the
+demo player of ``Intro`` (``IntroPointers``) or a script (``ScriptedPointers``).
+
+Run ``python -m autokat.batch --help`` to compare settings.
+"""
+from __future__ import annotations
+import argparse
+import itertools
+import math
+from collections.abc import Callable, Sequence
+from typing import NamedTuple
+
+import numpy as np
+
+from autokat.game import CONE_LENGTH, DEFAULT_SIZE, Playing
+from autokat.vec import Vec
+
+_DEFAULTS = Playing(team_name="")
+
+# the rotations of Vec.rotate, including their rounding errors
+_COS_LEFT, _SIN_LEFT = math.cos(math.pi / 2), math.sin(math.pi / 2)
+_COS_RIGHT, _SIN_RIGHT = math.cos(-math.pi / 2), math.sin(-math.pi / 2)
+
+
+class BatchResults(NamedTuple):
+    # the best rally of every game, what would go on the leaderboard, -1 if it isn't over yet
+    game_scores: np.ndarray
+    # every missed ball: the game it was in, its bounces and how many ticks it was in play
+    rally_games: np.ndarray
+    rally_scores: np.ndarray
+    rally_ticks: np.ndarray
+
+
+def distribution(scores: np.ndarray) -> np.ndarray:
+    """How many times every score was reached, indexed by score."""
+    return np.bincount(scores[scores >= 0])
+
+
+def _magnitude(v: np.ndarray) -> np.ndarray:
+    return np.sqrt(v[:, 0] * v[:, 0] + v[:, 1] * v[:, 1])
+
+
+def _clip(t_min, t_max, valid, value, slope, low, high):
+    """``geometry._clip`` for arrays, rows that are or become empty are no longer ``valid``."""
+    flat = slope == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_low = (low - value) / slope
+        t_high = (high - value) / slope
+    t_low, t_high = np.minimum(t_low, t_high), np.maximum(t_low, t_high)
+    clipped_min = np.where(t_low > t_min, t_low, t_min)
+    clipped_max = np.where(t_high < t_max, t_high, t_max)
+    valid = valid & np.where(flat, (low <= value) & (value <= high), ~(clipped_min > clipped_max))
+    return np.where(flat, t_min, clipped_min), np.where(flat, t_max, clipped_max), valid
+
+
+def capsule_segment_intervals(start, end, radius, segment_start: Vec, segment_end: Vec):
+    """``geometry.capsule_segment_interval`` for rows of capsules and one segment.
+
+    Returns ``t_min``, ``t_max`` and whether the capsule touches the segment.
+    """
+    sx, sy = start[:, 0], start[:, 1]
+    ex, ey = end[:, 0], end[:, 1]
+    ax, ay = segment_start
+    bx, by = segment_end
+    far = (
+        ((ax < sx - radius) & (ax < ex - radius) & (bx < sx - radius) & (bx < ex - radius))
+        | ((ax > sx + radius) & (ax > ex + radius) & (bx > sx + radius) & (bx > ex + radius))
+        | ((ay < sy - radius) & (ay < ey - radius) & (by < sy - radius) & (by < ey - radius))
+        | ((ay > sy + radius) & (ay > ey + radius) & (by > sy + radius) & (by > ey + radius))
+    )
+
+    dx, dy = bx - ax, by - ay
+    a = dx * dx + dy * dy
+    t_min = np.full(len(start), math.inf)
+    t_max = np.full(len(start), -math.inf)
+    for cx, cy in (sx, sy), (ex, ey):
+        ox, oy = ax - cx, ay - cy
+        b = 2 * (dx * ox + dy * oy)
+        c = ox * ox + oy * oy - radius * radius
+        discriminant = b * b - 4 * a * c
+        touches = discriminant >= 0
+        root = np.sqrt(np.where(touches, discriminant, 0))
+        t_low, t_high = (-b - root) / (2 * a), (-b + root) / (2 * a)
+        t_min = np.where(touches & (t_low < t_min), t_low, t_min)
+        t_max = np.where(touches & (t_high > t_max), t_high, t_max)
+    sweep_x, sweep_y = ex - sx, ey - sy
+    sweep_length = np.hypot(sweep_x, sweep_y)
+    swept = sweep_length > 0
+    safe_length = np.where(swept, sweep_length, 1)
+    ux, uy = sweep_x / safe_length, sweep_y / safe_length
+    ox, oy = ax - sx, ay - sy
+    r_min, r_max, rectangle = _clip(
+        np.full(len(start), -math.inf), np.full(len(start), math.inf), swept,
+        ox * ux + oy * uy, dx * ux + dy * uy,
+        0, sweep_length,
+    )
+    r_min, r_max, rectangle = _clip(r_min, r_max, rectangle, oy * ux - ox * uy, dy * ux - dx * uy, -radius, radius)
+    t_min = np.where(rectangle & (r_min < t_min), r_min, t_min)
+    t_max = np.where(rectangle & (r_max > t_max), r_max, t_max)
+    t_min = np.where(t_min < 0.0, 0.0, t_min)
+    t_max = np.where(t_max > 1.0, 1.0, t_max)
+    return t_min, t_max, ~far & ~(t_min > t_max)
+
+
+def triangle_segment_intervals(triangles, segment_start: Vec, segment_end: Vec):
+    """``geometry.polygon_segment_interval`` for rows of triangles, shaped (n, 3, 2), and one segment."""
+    edges = [(triangles[:, i], triangles[:, (i + 1) % 3]) for i in range(3)]
+    signed_area = sum(p[:, 0] * q[:, 1] - q[:, 0] * p[:, 1] for p, q in edges)
+    orientation = np.where(signed_area > 0, 1, -1)
+    dx, dy = segment_end.x - segment_start.x, segment_end.y - segment_start.y
+    t_min, t_max = np.zeros(len(triangles)), np.ones(len(triangles))
+    valid = np.ones(len(triangles), dtype=bool)
+    for p, q in edges:
+        ex, ey = q[:, 0] - p[:, 0], q[:, 1] - p[:, 1]
+        value = orientation * (ex * (segment_start.y - p[:, 1]) - ey * (segment_start.x - p[:, 0]))
+        slope = orientation * (ex * dy - ey * dx)
+        t_min, t_max, valid = _clip(t_min, t_max, valid, value, slope, 0, math.inf)
+    return t_min, t_max, valid
+
+
+class BatchPlaying:
+    """N games of ``Playing`` stepped together.
+
+    The settings that are worth balancing can be given per game, as arrays of
+    length ``n``, so one batch can compare them. A missed ball is followed by
+    a countdown of ``countdown`` seconds and a new ball, until the game has
+    used ``max_lives`` balls. Then the game is over and stays over: every game
+    of the batch is played once. In ``demo_mode`` a missed ball is replaced
+    right away and the games never end, like the demo of ``Intro``.
+    """
+
+    def __init__(
+        self,
+        n: int,
+        *,
+        pointers: Callable[[BatchPlaying], None] | None = None,
+        size: Vec = DEFAULT_SIZE,
+        ball_speed=_DEFAULTS.ball_speed,
+        ball_radius=_DEFAULTS.ball_radius,
+        bounce_speed_up=_DEFAULTS.bounce_speed_up,
+        light_speed=_DEFAULTS.light_speed,
+        forbidden_radius=_DEFAULTS.pillar.forbidden_radius,
+        max_lives=_DEFAULTS.max_lives,
+        countdown: float = 5.0,
+        demo_mode: bool = False,
+        seed: int | None = None,
+    ):
+        self.n = n
+        self.pointers = pointers if pointers is not None else IntroPointers()
+        self.size = size
+        playing = Playing(team_name="", size=size)
+        self.walls = playing.walls
+        self.wall_normals = playing.wall_normals
+        self.pillar_position = np.array(playing.pillar.position, dtype=float)
+        self.pillar_radius = playing.pillar.radius
+
+        def per_game(value, dtype=float):
+            return np.broadcast_to(np.asarray(value, dtype=dtype), (n,)).copy()
+
+        self.ball_speed = per_game(ball_speed)
+        self.ball_radius = per_game(ball_radius)
+        self.bounce_speed_up = per_game(bounce_speed_up)
+        self.light_speed = per_game(light_speed)
+        self.forbidden_radius = per_game(forbidden_radius)
+        self.max_lives = per_game(max_lives, int)
+        self.countdown = countdown
+        self.demo_mode = demo_mode
+        self.rng = np.random.default_rng(seed)
+
+        self.red_light = np.tile(np.array(playing.red_light, dtype=float), (n, 1))
+        self.green_light = np.tile(np.array(playing.green_light, dtype=float), (n, 1))
+        self.red_pointer = self.red_light.copy()
+        self.green_pointer = self.green_light.copy()
+        self.ball_position = np.zeros((n, 2))
+        self.ball_velocity = np.zeros((n, 2))
+        self.has_ball = np.zeros(n, dtype=bool)
+        # the bounces of the current ball, the balls missed before it and the best of those
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lives_used = np.zeros(n, dtype=np.int64)
+        self.best_score = np.zeros(n, dtype=np.int64)
+        self.rally_ticks = np.zeros(n, dtype=np.int64)
+        # ticks until the next ball, -1 when there is none coming
+        self.countdown_ticks = np.full(n, -1, dtype=np.int64)
+        self.game_scores = np.full(n, -1, dtype=np.int64)
+        self.time = 0.0
+        self._rallies: list[tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self.spawn_balls(np.arange(n))
+
+    @classmethod
+    def from_playing(cls, states: Sequence[Playing], **kwargs) -> BatchPlaying:
+        """A batch that continues the given games, they must all have the same size and a ball."""
+        batch = cls(
+            len(states),
+            size=states[0].size,
+            ball_speed=[s.ball_speed for s in states],
+            ball_radius=[s.ball_radius for s in states],
+            bounce_speed_up=[s.bounce_speed_up for s in states],
+            light_speed=[s.light_speed for s in states],
+            forbidden_radius=[s.pillar.forbidden_radius for s in states],
+            max_lives=[s.max_lives for s in states],
+            demo_mode=states[0].demo_mode,
+            **kwargs,
+        )
+        batch.red_light[:] = batch.red_pointer[:] = [s.red_light for s in states]
+        batch.green_light[:] = batch.green_pointer[:] = [s.green_light for s in states]
+        batch.ball_position[:] = [s.ball.position for s in states]
+        batch.ball_velocity[:] = [s.ball.velocity for s in states]
+        batch.ball_radius[:] = [s.ball.radius for s in states]
+        batch.score[:] = [s.scores[-1] for s in states]
+        batch.lives_used[:] = [len(s.scores) - 1 for s in states]
+        batch.best_score[:] = [max(s.scores[:-1], default=0) for s in states]
+        return batch
+
+    @property
+    def game_over(self) -> np.ndarray:
+        return self.game_scores >= 0
+
+    def spawn_balls(self, games: np.ndarray) -> None:
+        """New balls in the center, in a random direction like ``Vec.normalized_random``."""
+        directions = 1 - 2 * self.rng.random((len(games), 2))
+        directions /= _magnitude(directions)[:, None]
+        self.ball_position[games] = (self.size.x / 2, self.size.y / 2)
+        self.ball_velocity[games] = directions * self.ball_speed[games, None]
+        self.has_ball[games] = True
+        self.countdown_ticks[games] = -1
+        self.rally_ticks[games] = 0
+
+    def _moved_lights(self, lights: np.ndarray, pointers: np.ndarray, dt: float) -> np.ndarray:
+        """``Playing._update_light`` for every game."""
+        max_d = self.light_speed * dt
+        delta = pointers - lights
+        magnitude = _magnitude(delta)
+        too_far = magnitude > max_d
+        delta[too_far] = delta[too_far] / magnitude[too_far, None] * max_d[too_far, None]
+        new_lights = lights + delta
+        pillar_diff = new_lights - self.pillar_position
+        pillar_distance = _magnitude(pillar_diff)
+        on_pillar = pillar_distance < 1
+        pillar_diff[on_pillar] = (1, 0)
+        pillar_distance[on_pillar] = 1.0
+        inside = pillar_distance < self.forbidden_radius
+        new_lights[inside] = (
+            self.pillar_position
+            + pillar_diff[inside] / pillar_distance[inside, None] * self.forbidden_radius[inside, None]
+        )
+        return new_lights
+
+    def _cones(self, lights: np.ndarray) -> np.ndarray:
+        """``cone_geometry`` of every light, as triangles shaped (n, 3, 2)."""
+        dx, dy = lights[:, 0] - self.pillar_position[0], lights[:, 1] - self.pillar_position[1]
+        sides = [lights]
+        for cos, sin in (_COS_LEFT, _SIN_LEFT), (_COS_RIGHT, _SIN_RIGHT):
+            px, py = dx * cos - dy * sin, dx * sin + dy * cos
+            length = np.sqrt(px * px + py * py)
+            px, py = px / length * self.pillar_radius, py / length * self.pillar_radius
+            side_x, side_y = (dx + px) * -1, (dy + py) * -1
+            sides.append(np.stack([lights[:, 0] + side_x * CONE_LENGTH, lights[:, 1] + side_y * CONE_LENGTH], axis=1))
+        return np.stack(sides, axis=1)
+
+    def _collide(self, games: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """The walls part of ``Playing.tick`` for the balls of ``games`` that come near one.
+
+        Updates the balls and scores, returns which of them were missed.
+        """
+        velocity = self.ball_velocity[games]
+        # every wall is checked against the swept path of the ball, bounces only move where it ends up
+        position = end.copy()
+        radius = self.ball_radius[games]
+        cones = self._cones(self.red_light[games]), self._cones(self.green_light[games])
+        missed = np.zeros(len(games), dtype=bool)
+        bounces = np.zeros(len(games), dtype=np.int64)
+        for wall, normal in zip(self.walls, self.wall_normals):
+            w_min, w_max, hit = capsule_segment_intervals(start, end, radius, *wall)
+            hit &= ~missed
+            if not hit.any():
+                continue
+            bounced = np.zeros(len(games), dtype=bool)
+            c_min, c_max = np.zeros(len(games)), np.ones(len(games))
+            for triangles in cones:
+                t_min, t_max, inside = triangle_segment_intervals(triangles, *wall)
+                inside &= hit & ~bounced & (t_min <= w_min) & (w_max <= t_max) & (t_min < t_max)
+                c_min, c_max = np.where(inside, t_min, c_min), np.where(inside, t_max, c_max)
+                bounced |= inside
+            missed |= hit & ~bounced
+            if not bounced.any():
+                continue
+
+            location = (w_min[bounced] + w_max[bounced]) / 2
+            distance_from_center = 1 - 2 * ((location - c_min[bounced]) / (c_max[bounced] - c_min[bounced]))
+            nx, ny = normal
+            vx, vy = velocity[bounced, 0], velocity[bounced, 1]
+            dot = vx * nx + vy * ny
+            vx, vy = vx - nx * 2 * dot, vy - ny * 2 * dot
+            added_angle = -math.pi / 4 * distance_from_center
+            cos, sin = np.cos(added_angle), np.sin(added_angle)
+            rx, ry = vx * cos - vy * sin, vx * sin + vy * cos
+            inwards = rx * nx + ry * ny < 0
+            vx, vy = np.where(inwards, rx, vx), np.where(inwards, ry, vy)
+
+            x, y = position[bounced, 0], position[bounced, 1]
+            r = radius[bounced]
+            x_overshoot = x + r - self.size.x
+            x = np.where(x_overshoot > 0, x - 2 * x_overshoot, x)
+            y_overshoot = y + r - self.size.y
+            y = np.where(y_overshoot > 0, y - 2 * y_overshoot, y)
+            x_undershoot = x - r
+            x = np.where(x_undershoot < 0, x - 2 * x_undershoot, x)
+            y_undershoot = y - r
+            y = np.where(y_undershoot < 0, y - 2 * y_undershoot, y)
+            position[bounced] = np.stack([x, y], axis=1)
+
+            bounces[bounced] += 1
+            speed = np.sqrt(vx * vx + vy * vy)
+            speed_up = self.bounce_speed_up[games[bounced]]
+            velocity[bounced] = np.stack([vx + vx / speed * speed_up, vy + vy / speed * speed_up], axis=1)
+
+        self.score[games] += bounces
+        kept = games[~missed]
+        self.ball_position[kept] = position[~missed]
+        self.ball_velocity[kept] = velocity[~missed]
+        return missed
+
+    def _miss(self, games: np.ndarray, dt: float) -> None:
+        """What ``Playing.tick`` does when a ball gets past the lights."""
+        self._rallies.append((games, self.score[games].copy(), self.rally_ticks[games].copy()))
+        if self.demo_mode:
+            self.spawn_balls(games)
+            return
+        self.has_ball[games] = False
+        self.best_score[games] = np.maximum(self.best_score[games], self.score[games])
+        self.score[games] = 0
+        self.lives_used[games] += 1
+        over = self.lives_used[games] >= self.max_lives[games]
+        self.game_scores[games[over]] = self.best_score[games[over]]
+        # Countdown spawns the ball on the first tick later than its start_at
+        self.countdown_ticks[games[~over]] = math.floor(round(self.countdown / dt, 9)) + 1
+
+    def tick(self, dt: float) -> None:
+        self.pointers(self)
+        self.red_light = self._moved_lights(self.red_light, self.red_pointer, dt)
+        self.green_light = self._moved_lights(self.green_light, self.green_pointer, dt)
+        self.time += dt
+        waiting = np.flatnonzero(self.countdown_ticks > 0)
+
+        games = np.flatnonzero(self.has_ball)
+        self.rally_ticks[games] += 1
+        start = self.ball_position[games]
+        velocity = self.ball_velocity[games]
+        end = start + velocity * dt
+        radius = self.ball_radius[games]
+        within = (
+            (radius < start[:, 0]) & (start[:, 0] < self.size.x - radius)
+            & (radius < end[:, 0]) & (end[:, 0] < self.size.x - radius)
+            & (radius < start[:, 1]) & (start[:, 1] < self.size.y - radius)
+            & (radius < end[:, 1]) & (end[:, 1] < self.size.y - radius)
+        )
+        self.ball_position[games[within]] = end[within]
+        near = ~within
+        if near.any():
+            missed = self._collide(games[near], start[near], end[near])
+            if missed.any():
+                self._miss(games[near][missed], dt)
+
+        self.countdown_ticks[waiting] -= 1
+        self.spawn_balls(waiting[self.countdown_ticks[waiting] == 0])
+
+    def run(self, dt: float = 0.03, max_ticks: int = 100_000) -> int:
+        """Tick until every game is over, or ``max_ticks``. Returns the number of ticks."""
+        for ticks in range(max_ticks):
+            if self.game_over.all():
+                return ticks
+            self.tick(dt)
+        return max_ticks
+
+    def results(self) -> BatchResults:
+        if self._rallies:
+            rally_games, rally_scores, rally_ticks = (np.concatenate(column) for column in zip(*self._rallies))
+        else:
+            rally_games, rally_scores, rally_ticks = (np.zeros(0, dtype=np.int64) for _ in range(3))
+        return BatchResults(
+            game_scores=self.game_scores.copy(),
+            rally_games=rally_games,
+            rally_scores=rally_scores,
+            rally_ticks=rally_ticks,
+        )
+
+
+class IntroPointers:
+    """Points the lights like the demo of ``Intro`` does.
+
+    While the ball is slower than ``max_ball_speed``, the pointer closest to
+    where the lights should be moves so its cone covers the spot where the
+    ball will hit the wall. Raise ``max_ball_speed`` for a better player.
+    """
+
+    def __init__(self, max_ball_speed: float = 300):
+        self.max_ball_speed = max_ball_speed
+
+    def __call__(self, batch: BatchPlaying) -> None:
+        games = np.flatnonzero(batch.has_ball & (_magnitude(batch.ball_velocity) < self.max_ball_speed))
+        px, py = batch.ball_position[games, 0], batch.ball_position[games, 1]
+        vx, vy = batch.ball_velocity[games, 0], batch.ball_velocity[games, 1]
+        # the walls are a box, the ball is headed for the wall it reaches first
+        with np.errstate(divide="ignore", invalid="ignore"):
+            to_x = np.where(vx < 0, -px / vx, np.where(vx > 0, (batch.size.x - px) / vx, math.inf))
+            to_y = np.where(vy < 0, -py / vy, np.where(vy > 0, (batch.size.y - py) / vy, math.inf))
+        x_first = to_x <= to_y
+        seconds = np.where(x_first, to_x, to_y)
+        # Intro looks 10 000 seconds ahead
+        ahead = seconds <= 10_000
+        games, x_first, seconds = games[ahead], x_first[ahead], seconds[ahead]
+        px, py, vx, vy = px[ahead], py[ahead], vx[ahead], vy[ahead]
+        hit_x = np.where(x_first, np.where(vx < 0, 0.0, batch.size.x), px + vx * seconds)
+        hit_y = np.where(x_first, py + vy * seconds, np.where(vy < 0, 0.0, batch.size.y))
+        diff_x, diff_y = hit_x - batch.pillar_position[0], hit_y - batch.pillar_position[1]
+        distance = np.sqrt(diff_x * diff_x + diff_y * diff_y)
+        reach = -1.5 * batch.forbidden_radius[games]
+        target = np.stack([
+            batch.pillar_position[0] + diff_x / distance * reach,
+            batch.pillar_position[1] + diff_y / distance * reach,
+        ], axis=1)
+        # on a tie it's the red one, like min of the detections
+        red = _magnitude(target - batch.red_pointer[games]) <= _magnitude(target - batch.green_pointer[games])
+        batch.red_pointer[games[red]] = target[red] + 3
+        batch.green_pointer[games[~red]] = target[~red] + 3
+
+
+class ScriptedPointers:
+    """Pointers that are where ``script(time, batch)`` says, it returns the red and the green positions.
+
+    The positions are broadcast, one position moves the pointers of every game.
+    """
+
+    def __init__(self, script: Callable[[float, BatchPlaying], tuple[np.ndarray, np.ndarray]]):
+        self.script = script
+
+    def __call__(self, batch: BatchPlaying) -> None:
+        red, green = self.script(batch.time, batch)
+        batch.red_pointer[:] = red
+        batch.green_pointer[:] = green
+
+
+def _floats(text: str) -> list[float]:
+    return [float(value) for value in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play many headless games for every combination of settings and show the scores they reach. "
+        "Settings take comma separated values.",
+    )
+    parser.add_argument("-g", "--games", default=1000, type=int, help="Games per combination of settings")
+    parser.add_argument("--ball-speed", default=str(_DEFAULTS.ball_speed), type=_floats)
+    parser.add_argument("--bounce-speed-up", default=str(_DEFAULTS.bounce_speed_up), type=_floats)
+    parser.add_argument("--forbidden-radius", default=str(_DEFAULTS.pillar.forbidden_radius), type=_floats)
+    parser.add_argument("--max-lives", default=str(_DEFAULTS.max_lives), type=_floats)
+    parser.add_argument("--player-speed", default=300, type=float, help="Fastest ball the player still follows")
+    parser.add_argument("--light-speed", default=_DEFAULTS.light_speed, type=float)
+    parser.add_argument("--histogram", action="store_true", help="Show how many games reached every score")
+    parser.add_argument("-t", "--tick-time", default=0.03, type=float, help="Seconds per tick")
+    parser.add_argument("--max-minutes", default=60, type=float, help="Simulated minutes after which unfinished games are left out")
+    parser.add_argument("--seed", default=None, type=int)
+    params = parser.parse_args()
+
+    settings = list(itertools.product(params.ball_speed, params.bounce_speed_up, params.forbidden_radius, params.max_lives))
+    ball_speed, bounce_speed_up, forbidden_radius, max_lives = (np.repeat(column, params.games) for column in zip(*settings))
+    batch = BatchPlaying(
+        len(settings) * params.games,
+        pointers=IntroPointers(max_ball_speed=params.player_speed),
+        ball_speed=ball_speed,
+        bounce_speed_up=bounce_speed_up,
+        light_speed=params.light_speed,
+        forbidden_radius=forbidden_radius,
+        max_lives=max_lives,
+        seed=params.seed,
+    )
+    batch.run(params.tick_time, max_ticks=round(params.max_minutes * 60 / params.tick_time))
+    results = batch.results()
+
+    print(f"{'speed':>6} {'speed up':>9} {'forbidden':>10} {'lives':>6} {'games':>6} {'mean':>6} {'p10':>4} {'p50':>4} {'p90':>4} {'p99':>4} {'max':>4} {'rally (s)':>10}")
+    for i, (speed, speed_up, forbidden, lives) in enumerate(settings):
+        games = slice(i * params.games, (i + 1) * params.games)
+        scores = results.game_scores[games]
+        scores = scores[scores >= 0]
+        rallies = (results.rally_games >= games.start) & (results.rally_games < games.stop)
+        rally_seconds = results.rally_ticks[rallies].mean() * params.tick_time if rallies.any() else math.nan
+        if len(scores) == 0:
+            print(f"{speed:>6g} {speed_up:>9g} {forbidden:>10g} {lives:>6g} {0:>6} no game finished")
+            continue
+        p10, p50, p90, p99 = np.percentile(scores, [10, 50, 90, 99])
+        print(
+            f"{speed:>6g} {speed_up:>9g} {forbidden:>10g} {lives:>6g} {len(scores):>6} {scores.mean():>6.1f} "
+            f"{p10:>4.0f} {p50:>4.0f} {p90:>4.0f} {p99:>4.0f} {scores.max():>4} {rally_seconds:>10.1f}"
+        )
+        if params.histogram:
+            for score, count in enumerate(distribution(scores)):
+                if count:
+                    print(f"{score:>10} {count:>6} {'#' * math.ceil(60 * count / len(scores))}")
+
+
+if __name__ == "__main__":
+    main()
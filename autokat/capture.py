@@ -0,0 +1,83 @@
+from __future__ import annotations
+import collections
+import datetime
+import sys
+import threading
+from typing import NamedTuple
+
+import numpy
+
+
+class Frame(NamedTuple):
+    image: numpy.ndarray
+    index: int
+    captured_at: datetime.datetime
+
+
+class LatestFrameBuffer:
+    """Bounded ring buffer between the capture thread and the detection worker.
+
+    The newest frame always wins: when the buffer is full the oldest frame is
+    dropped, and ``get`` hands out the newest frame and discards the older ones,
+    so the detection worker never works on a stale frame.
+    """
+
+    def __init__(self, size: int = 2):
+        self._frames: collections.deque[Frame] = collections.deque(maxlen=size)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, frame: Frame) -> None:
+        with self._condition:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(frame)
+            self._condition.notify()
+
+    def get(self, timeout: float | None = None) -> Frame | None:
+        """Wait for the newest frame. Returns None when the buffer is closed or on timeout."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._frames or self._closed, timeout)
+            if not self._frames:
+                return None
+            frame = self._frames.pop()
+            self.dropped += len(self._frames)
+            self._frames.clear()
+            return frame
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class FrameGrabber:
+    """Reads frames from a capture device on its own thread as fast as the device delivers them."""
+
+    def __init__(self, capture, frame_buffer: LatestFrameBuffer):
+        self.capture = capture
+        self.frame_buffer = frame_buffer
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run(self) -> None:
+        index = 0
+        while not self._stopped.is_set():
+            success, image = self.capture.read()
+            captured_at = datetime.datetime.now()
+            if not success:  # no image captured... end the processing
+                sys.stderr.write("Could not read camera frame.\n")
+                break
+            self.frame_buffer.put(Frame(image=image, index=index, captured_at=captured_at))
+            index += 1
+        self.frame_buffer.close()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,132 @@
+"""Classifies camera pixels as background, bright or one of the lasers in a single pass.
+
+The ``ProcessingConfig`` thresholds are baked into a lookup table over BGR
+colors quantised to 5 bits of blue, 6 of green and 5 of red. OpenCV packs
+a frame into exactly those 16 bit indices (``COLOR_BGR2BGR565``) and one
+``numpy.take`` looks them all up, which replaces the HSV conversion, the
+channel split, the hue blur and the thresholds. Blobs get the class most of
+their pixels have.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, NamedTuple
+
+import cv2
+import numpy
+
+if TYPE_CHECKING:
+    from autokat.multitrack import ProcessingConfig
+
+# colors that are this little saturated could be gray before quantisation
+_GRAY_SATURATION = 16
+
+BACKGROUND = 0
+# bright enough, but not the hue of any laser
+UNKNOWN = 1
+# laser i in the config has class FIRST_LASER + i
+FIRST_LASER = 2
+
+
+class ClassifiedBlobs(NamedTuple):
+    area: numpy.ndarray
+    mean_hue: numpy.ndarray
+    bbox: numpy.ndarray
+    # the class most pixels of every blob have
+    blob_class: numpy.ndarray
+    # the fraction of the pixels of every blob that have that class
+    confidence: numpy.ndarray
+
+
+def config_key(processing_config: ProcessingConfig) -> tuple:
+    """Everything the lookup table depends on, to notice when the config was edited."""
+    return (
+        processing_config.val_min,
+        processing_config.val_max,
+        tuple((name, c.hue_min, c.hue_max) for name, c in processing_config.laser_configs.items()),
+    )
+
+
+class PixelClassifier:
+    """The lookup table of one ``ProcessingConfig``."""
+
+    def __init__(self, processing_config: ProcessingConfig):
+        self.key = config_key(processing_config)
+        self.laser_names = list(processing_config.laser_configs)
+        self.num_classes = FIRST_LASER + len(self.laser_names)
+
+        # a color of every bin, bits 0-4 are blue, 5-10 green and 11-15 red. The
+        # bits are repeated in the low bits, so black and white stay exact.
+        index = numpy.arange(1 << 16, dtype=numpy.uint32)
+        blue, green, red = index & 0x1f, (index >> 5) & 0x3f, index >> 11
+        bgr = numpy.empty((1, len(index), 3), numpy.uint8)
+        bgr[0, :, 0] = (blue << 3) | (blue >> 2)
+        bgr[0, :, 1] = (green << 2) | (green >> 4)
+        bgr[0, :, 2] = (red << 3) | (red >> 2)
+        hue, saturation, value = (channel.ravel() for channel in cv2.split(cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)))
+        # grays get a random hue from the rounding, OpenCV gives exact grays hue 0
+        hue[saturation < _GRAY_SATURATION] = 0
+
+        classes = numpy.full(hue.shape, BACKGROUND, numpy.uint8)
+        bright = (processing_config.val_min <= value) & (value <= processing_config.val_max)
+        classes[bright] = UNKNOWN
+        # the first laser whose range contains the hue wins
+        for i, laser_config in reversed(list(enumerate(processing_config.laser_configs.values()))):
+            matches = bright & (laser_config.hue_min <= hue) & (hue <= laser_config.hue_max)
+            classes[matches] = FIRST_LASER + i
+        self.classes = classes
+        self.hues = hue.astype(numpy.float64)
+
+    def classify(self, image: numpy.ndarray, buffers: FrameBuffers, mask: numpy.ndarray | None = None) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """The class of every pixel of a BGR image, and a 255/0 mask of the pixels that aren't background.
+
+        Pixels outside of ``mask`` are left out of the foreground. Both are
+        written to ``buffers``, which must have the size of ``image``.
+        """
+        cv2.cvtColor(image, cv2.COLOR_BGR2BGR565, dst=buffers.packed)
+        # take wants intp indices, converting into our own buffer saves numpy an allocation
+        numpy.copyto(buffers.index, buffers.packed.view(numpy.uint16)[..., 0])
+        numpy.take(self.classes, buffers.index, out=buffers.pixel_classes, mode="wrap")
+        cv2.compare(buffers.pixel_classes, BACKGROUND, cv2.CMP_GT, dst=buffers.foreground)
+        if mask is not None:
+            cv2.bitwise_and(buffers.foreground, mask, dst=buffers.foreground)
+        return buffers.pixel_classes, buffers.foreground
+
+    def blob_statistics(self, labels: numpy.ndarray, stats: numpy.ndarray, buffers: FrameBuffers) -> ClassifiedBlobs:
+        """Like ``multitrack.blob_statistics`` for the frame classified into ``buffers``, plus the majority class of every label.
+
+        Only the foreground pixels are looked at, the mean hue is that of
+        their quantised colors.
+        """
+        num_labels = len(stats)
+        flat_labels = labels.ravel()
+        foreground = numpy.not_equal(buffers.foreground, 0, out=buffers.is_foreground).ravel()
+        blob_labels = flat_labels[foreground]
+        votes = numpy.bincount(
+            blob_labels * self.num_classes + buffers.pixel_classes.ravel()[foreground],
+            minlength=num_labels * self.num_classes,
+        ).reshape(num_labels, self.num_classes)
+        hue_sum = numpy.bincount(blob_labels, weights=self.hues[buffers.index.ravel()[foreground]], minlength=num_labels)
+        area = stats[:, cv2.CC_STAT_AREA]
+        return ClassifiedBlobs(
+            area=area,
+            mean_hue=hue_sum / numpy.maximum(area, 1),
+            bbox=stats[:, [cv2.CC_STAT_LEFT, cv2.CC_STAT_TOP, cv2.CC_STAT_WIDTH, cv2.CC_STAT_HEIGHT]],
+            blob_class=votes.argmax(axis=1),
+            confidence=votes.max(axis=1) / numpy.maximum(area, 1),
+        )
+
+
+class FrameBuffers:
+    """The full frame arrays a frame is processed in, allocated once per frame size.
+
+    Every frame overwrites them, so whatever is handed out in them is only
+    valid until the next frame.
+    """
+
+    def __init__(self, shape: tuple[int, int]):
+        self.shape = shape
+        self.packed = numpy.empty((*shape, 2), numpy.uint8)
+        self.index = numpy.empty(shape, numpy.intp)
+        self.pixel_classes = numpy.empty(shape, numpy.uint8)
+        self.foreground = numpy.empty(shape, numpy.uint8)
+        self.is_foreground = numpy.empty(shape, numpy.bool_)
+        self.labels = numpy.empty(shape, numpy.int32)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+import asyncio
+from collections.abc import Sequence
+import traceback
+
+from fastapi import WebSocket
+
+from autokat.metrics import REGISTRY
+
+CLIENTS = REGISTRY.gauge("autokat_clients", "Connected clients", ["arena"])
+QUEUE_DEPTH = REGISTRY.gauge("autokat_client_queue_depth", "Messages waiting in the fullest client queue", ["arena"])
+DROPPED_MESSAGES = REGISTRY.counter("autokat_client_dropped_messages_total", "Messages dropped because a client couldn't keep up", ["arena"])
+SEND_FAILURES = REGISTRY.counter("autokat_client_send_failures_total", "Clients disconnected because sending to them failed", ["arena", "reason"])
+
+Message = str | bytes | tuple[str | bytes, ...]
+
+
+class ClientConnection:
+    """A connected websocket with its own bounded send queue.
+
+    When the client can't keep up the oldest queued message is dropped: the
+    game state is sent every tick, so only the newest messages matter. A
+    tuple of messages that only make sense together is queued, and dropped,
+    as one.
+    """
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue[Message] = asyncio.Queue(maxsize=queue_size)
+        # whether the client asked for the binary state frames
+        self.binary = False
+        self.dropped = 0
+        self.task: asyncio.Task | None = None
+
+    def enqueue(self, message: Message) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+class ConnectionManager:
+    """Fans messages out to all connected clients without ever waiting for them.
+
+    Every client gets a sender task that drains its queue. A client that
+    doesn't accept a message within ``send_timeout`` seconds, or whose
+    socket fails, is disconnected.
+    """
+
+    def __init__(self, queue_size: int = 4, send_timeout: float = 2.0, name: str = "default"):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.active_connections: dict[WebSocket, ClientConnection] = {}
+        # the arena label of its metrics
+        self.name = name
+        CLIENTS.labels(name).set_function(lambda: len(self.active_connections))
+        QUEUE_DEPTH.labels(name).set_function(lambda: max((c.queue.qsize() for c in list(self.active_connections.values())), default=0))
+        self._dropped_messages = DROPPED_MESSAGES.labels(name)
+        self._timeouts = SEND_FAILURES.labels(name, "timeout")
+        self._errors = SEND_FAILURES.labels(name, "error")
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        client = ClientConnection(websocket, self.queue_size)
+        self.active_connections[websocket] = client
+        client.task = asyncio.create_task(self._send_messages(client))
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.active_connections.pop(websocket, None)
+        if client is not None and client.task is not None:
+            client.task.cancel()
+
+    def close(self) -> None:
+        """Disconnect every client and stop serving the metrics of this manager."""
+        for websocket in list(self.active_connections):
+            self.disconnect(websocket)
+        CLIENTS.remove(self.name)
+        QUEUE_DEPTH.remove(self.name)
+
+    async def send(self, websocket: WebSocket, message: Message):
+        """Queue a message, or a tuple of messages that go together, for one client only."""
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            self._enqueue(client, message)
+
+    def _enqueue(self, client: ClientConnection, message: Message) -> None:
+        if client.queue.full():
+            self._dropped_messages.inc()
+        client.enqueue(message)
+
+    def set_binary(self, websocket: WebSocket, binary: bool):
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            client.binary = binary
+
+    def is_binary(self, websocket: WebSocket) -> bool:
+        client = self.active_connections.get(websocket)
+        return client is not None and client.binary
+
+    @property
+    def binary_clients(self) -> int:
+        """How many clients asked for the binary state frames."""
+        return sum(client.binary for client in list(self.active_connections.values()))
+
+    async def broadcast(self, message: str, binary: Sequence[str | bytes] | None = None):
+        """Queue ``message`` for every client, clients that opted in to binary frames get ``binary`` when given.
+
+        The messages of ``binary`` go together, they're dropped together when the client can't keep up.
+        """
+        if binary is not None:
+            binary = tuple(binary)
+        for client in list(self.active_connections.values()):
+            if client.binary and binary is not None:
+                self._enqueue(client, binary)
+            else:
+                self._enqueue(client, message)
+
+    async def _send_messages(self, client: ClientConnection):
+        try:
+            while True:
+                queued = await client.queue.get()
+                for message in queued if isinstance(queued, tuple) else (queued,):
+                    if isinstance(message, bytes):
+                        sending = client.websocket.send_bytes(message)
+                    else:
+                        sending = client.websocket.send_text(message)
+                    # unlike wait_for, doesn't swallow a cancel that comes in as the send finishes
+                    async with asyncio.timeout(self.send_timeout):
+                        await sending
+        except asyncio.TimeoutError:
+            self._timeouts.inc()
+            print(f"Evicting client {client.websocket.client}, it didn't receive a message in {self.send_timeout}s")
+        except Exception:
+            self._errors.inc()
+            traceback.print_exc()
+        self.active_connections.pop(client.websocket, None)
+        try:
+            await asyncio.wait_for(client.websocket.close(), self.send_timeout)
+        except Exception:
+            pass
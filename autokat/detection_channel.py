@@ -0,0 +1,94 @@
+"""Tells the game loop when the tracker has fresh detections.
+
+The tracker runs in its own thread (or process) at the rate of the camera,
+the game loop in asyncio at its own rate. Instead of the game finding the
+detections whenever it happens to tick, a tracker publishes every frame
+with detections to a ``DetectionChannel`` and the game loop can wake up
+for it. ``DetectionLatency`` measures how long detections take from the
+camera to the clients.
+"""
+from __future__ import annotations
+import asyncio
+import dataclasses
+import datetime
+
+from autokat.multitrack import Detection
+
+
+class DetectionChannel:
+    """Wakes an asyncio task from any thread when detections were published.
+
+    Publishing only sets an ``asyncio.Event`` through ``call_soon_threadsafe``,
+    the detections themselves are read from the tracker as before. Nothing
+    wakes before ``bind`` gave the channel its event loop.
+    """
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._event = asyncio.Event()
+        # capture time of the latest published detections
+        self.captured_at: datetime.datetime | None = None
+        self.published = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def publish(self, captured_at: datetime.datetime | None) -> None:
+        """Called by the tracker, from any thread, after it updated its detections."""
+        self.captured_at = captured_at
+        self.published += 1
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # the loop is closed, the server is shutting down
+            pass
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait at most ``timeout`` seconds for detections published since the last wait.
+
+        Returns whether there are any.
+        """
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+
+def latest_capture(detections: dict[str, Detection]) -> datetime.datetime | None:
+    """When the newest of ``detections`` was captured, None when none has a capture time."""
+    return max((d.captured_at for d in detections.values() if d.captured_at is not None), default=None)
+
+
+@dataclasses.dataclass
+class DetectionLatency:
+    """Time from capturing a camera frame to broadcasting a state based on it, in seconds.
+
+    Only the first broadcast of every detection counts.
+    """
+    count: int = 0
+    last: float = 0.0
+    max: float = 0.0
+    total: float = 0.0
+    _last_captured_at: datetime.datetime | None = dataclasses.field(default=None, repr=False)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def record(self, captured_at: datetime.datetime | None, broadcast_at: datetime.datetime) -> None:
+        if captured_at is None or captured_at == self._last_captured_at:
+            return
+        self._last_captured_at = captured_at
+        latency = (broadcast_at - captured_at).total_seconds()
+        self.count += 1
+        self.last = latency
+        self.max = max(self.max, latency)
+        self.total += latency
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "last": self.last, "max": self.max, "total": self.total, "mean": self.mean}
@@ -0,0 +1,267 @@
+"""Turns the game messages into the JSON that is sent to the clients.
+
+Every state type has a converter that builds plain dicts, lists and numbers
+directly, so the message can be serialized by the C accelerated JSON encoder
+without ever falling back to a Python ``default`` hook. The ``to_dict``
+methods of the states describe the same documents and are what the converters
+are tested against.
+
+``StateStream`` sends these documents as a versioned stream of keyframes and
+deltas, see its docstring for the protocol. ``BinaryStateStream`` does the
+same but leaves out the fields that change every tick, those are packed in a
+small binary frame instead.
+"""
+from __future__ import annotations
+import json
+import math
+import struct
+from typing import Any, Callable
+
+from autokat.game import Ball, Countdown, GameOver, Intro, Pillar, Playing
+
+# no indent and no default: json takes the C encoder path
+_encoder = json.JSONEncoder(separators=(",", ":"), check_circular=False)
+
+
+def _ball(ball: Ball | None) -> dict | None:
+    if ball is None:
+        return None
+    return {
+        "position": ball.position,
+        "velocity": ball.velocity,
+        "radius": ball.radius,
+    }
+
+
+def _pillar(pillar: Pillar) -> dict:
+    return {
+        "position": pillar.position,
+        "radius": pillar.radius,
+        "forbidden_radius": pillar.forbidden_radius,
+    }
+
+
+def _playing(state: Playing) -> dict:
+    return {
+        "name": "playing",
+        "red_light": state.red_light,
+        "green_light": state.green_light,
+        "ball": _ball(state.ball),
+        "red_cone": state.red_cone.coords,
+        "green_cone": state.green_cone.coords,
+        "pillar": _pillar(state.pillar),
+        "team_name": state.team_name,
+        # copied, the list is updated in place while the state is diffed against it
+        "scores": list(state.scores),
+        "max_lives": state.max_lives,
+        "demo_mode": state.demo_mode,
+    }
+
+
+def _countdown(state: Countdown) -> dict:
+    return {
+        "name": "countdown",
+        "start_at": state.start_at.total_seconds(),
+        "playing_state": _playing(state.playing_state),
+    }
+
+
+def _game_over(state: GameOver) -> dict:
+    return {
+        "name": "game_over",
+        "scores": list(state.scores),
+        "team_name": state.team_name,
+        "to_intro_at": state.to_intro_at.total_seconds(),
+        "top_highscores": [h._asdict() for h in state.top_highscores],
+        "my_highscore": state.my_highscore._asdict(),
+        "my_highscore_index": state.my_highscore_index,
+    }
+
+
+def _intro(state: Intro) -> dict:
+    return {
+        "name": "intro",
+        "playing_state": _playing(state.playing_state),
+        "team_name": state.team_name,
+        "red_start_box": state.red_start_box.boundary.coords[:],
+        "green_start_box": state.green_start_box.boundary.coords[:],
+        "in_red_start_box": state.in_red_start_box,
+        "in_green_start_box": state.in_green_start_box,
+    }
+
+
+STATE_CONVERTERS: dict[type, Callable[[Any], dict]] = {
+    Playing: _playing,
+    Countdown: _countdown,
+    GameOver: _game_over,
+    Intro: _intro,
+}
+
+
+def state_message(message: dict) -> dict:
+    """A ``{"type": "state", ...}`` message of ``Game.tick`` as plain JSON values."""
+    return {
+        "type": "state",
+        "state": STATE_CONVERTERS[type(message["state"])](message["state"]),
+        # a NamedTuple of Vecs, encoded as a list of points
+        "calibration": message["calibration"],
+        "debug": message["debug"],
+        "time": message["time"].total_seconds(),
+    }
+
+
+def encode_message(message: dict) -> str:
+    """Serialize a message of ``Game.tick``, once for all clients."""
+    if message.get("type") == "state":
+        message = state_message(message)
+    return _encoder.encode(message)
+
+
+Path = list[str]
+
+
+def diff(old: dict, new: dict, path: Path | None = None, ops: list | None = None) -> list:
+    """The operations that turn the document ``old`` into ``new``.
+
+    Dicts are compared key by key, everything else (lists, points, numbers)
+    is replaced as a whole when it changed. The operations are
+    ``["set", path, value]`` and ``["del", path]``.
+    """
+    path = path or []
+    ops = [] if ops is None else ops
+    for key, value in new.items():
+        if key not in old:
+            ops.append(["set", path + [key], value])
+            continue
+        previous = old[key]
+        # cached values like the cones are the very same object tick after tick
+        if previous is value:
+            continue
+        if type(value) is dict and type(previous) is dict:
+            diff(previous, value, path + [key], ops)
+        elif previous != value:
+            ops.append(["set", path + [key], value])
+    for key in old:
+        if key not in new:
+            ops.append(["del", path + [key]])
+    return ops
+
+
+class StateStream:
+    """Encodes the state messages as keyframes and the deltas between them.
+
+    Every state message gets the next ``version``. Every ``keyframe_every``
+    versions, and to clients that just connected or asked for a resync, the
+    whole state is sent::
+
+        {"type": "keyframe", "version": 7, "message": {"type": "state", ...}}
+
+    In between only the changes since the previous version are sent::
+
+        {"type": "delta", "version": 8, "base": 7, "ops": [["set", ["state", "ball", "position"], [1, 2]]]}
+
+    The deltas are shared by all clients, so they are against the previous
+    version rather than against what each client has seen. A client that
+    misses a version (its send queue dropped a message) sends
+    ``{"type": "resync"}`` and ignores deltas until the next keyframe.
+    """
+
+    def __init__(self, keyframe_every: int = 100):
+        self.keyframe_every = keyframe_every
+        self.version = 0
+        self._document: dict | None = None
+        self._keyframe: str | None = None
+
+    def encode(self, message: dict) -> str:
+        """Serialize a message of ``Game.tick``, once for all clients."""
+        if message.get("type") != "state":
+            return _encoder.encode(message)
+        return self.encode_document(state_message(message))
+
+    def encode_document(self, document: dict) -> str:
+        """Serialize a state message that was already converted by ``state_message``."""
+        previous, self._document = self._document, document
+        self.version += 1
+        self._keyframe = None
+        if previous is None or self.version % self.keyframe_every == 0:
+            return self.keyframe()
+        return _encoder.encode({
+            "type": "delta",
+            "version": self.version,
+            "base": self.version - 1,
+            "ops": diff(previous, document),
+        })
+
+    def reset(self) -> None:
+        """Forget the latest state, the next one is encoded as a keyframe."""
+        self._document = None
+        self._keyframe = None
+
+    def keyframe(self) -> str | None:
+        """The latest state as a keyframe, None before the first state."""
+        if self._document is None:
+            return None
+        if self._keyframe is None:
+            self._keyframe = _encoder.encode({"type": "keyframe", "version": self.version, "message": self._document})
+        return self._keyframe
+
+
+# version, then ball position and velocity, the red and green light and the
+# red and green debug pointer positions. NaN where there is no ball or lights.
+HOT_FIELDS = struct.Struct("<I12f")
+_NO_POINT = (math.nan, math.nan)
+
+
+def _playing_document(state: dict) -> dict | None:
+    if state["name"] == "playing":
+        return state
+    return state.get("playing_state")
+
+
+def _strip_playing(playing: dict) -> dict:
+    playing = {key: value for key, value in playing.items() if key not in ("red_light", "green_light")}
+    if playing["ball"] is not None:
+        playing["ball"] = {"radius": playing["ball"]["radius"]}
+    return playing
+
+
+def strip_hot_fields(document: dict) -> dict:
+    """A copy of a state message without the fields that are in ``pack_hot_fields``."""
+    state = document["state"]
+    if state["name"] == "playing":
+        state = _strip_playing(state)
+    elif "playing_state" in state:
+        state = {**state, "playing_state": _strip_playing(state["playing_state"])}
+    return {**document, "state": state, "debug": {}}
+
+
+def pack_hot_fields(version: int, document: dict) -> bytes:
+    """The fields of a state message that change every tick, as float32s."""
+    playing = _playing_document(document["state"])
+    ball = playing["ball"] if playing is not None else None
+    return HOT_FIELDS.pack(
+        version,
+        *(ball["position"] if ball is not None else _NO_POINT),
+        *(ball["velocity"] if ball is not None else _NO_POINT),
+        *(playing["red_light"] if playing is not None else _NO_POINT),
+        *(playing["green_light"] if playing is not None else _NO_POINT),
+        *document["debug"]["red_position"],
+        *document["debug"]["green_position"],
+    )
+
+
+class BinaryStateStream(StateStream):
+    """A ``StateStream`` for clients that get the hot fields as binary frames.
+
+    The keyframes and deltas leave out the hot fields, after each of them
+    ``hot_fields`` holds the packed hot fields of the same version.
+    """
+
+    def __init__(self, keyframe_every: int = 100):
+        super().__init__(keyframe_every)
+        self.hot_fields: bytes | None = None
+
+    def encode_document(self, document: dict) -> str:
+        encoded = super().encode_document(strip_hot_fields(document))
+        self.hot_fields = pack_hot_fields(self.version, document)
+        return encoded
@@ -4,7 +4,7 @@ import dataclasses
 import datetime
 from functools import cached_property, lru_cache
 import math
-from typing import Literal, Protocol, Self
+from typing import Literal, NamedTuple, Protocol, Self
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as mppatch
@@ -15,8 +15,10 @@ from shapely.affinity import translate
 
 from autokat.animals import Flock, Dog, Sheep
 from autokat.constants import SCREEN_HEIGHT, SCREEN_WIDTH
+from autokat.geometry import capsule_segment_interval, capsule_within_box, contains_interval, polygon_segment_interval, relative_location
 from autokat.multitrack import Detection, DummyMultiLaserTracker, MultiLaserTracker, Vec
-from autokat.highscores import Highscore, Highscores, generate_team_name
+from autokat.highscores import Highscore, generate_team_name
+from autokat.leaderboard import default_leaderboard
 
 
 @dataclasses.dataclass(kw_only=True)
@@ -68,6 +70,40 @@ class Ball:
 
 DEFAULT_SIZE = Vec(1024, 768)
 
+# how far the cone polygons reach, relative to the distance between the light and the pillar
+CONE_LENGTH = 1000
+
+
+class Cone(NamedTuple):
+    """The light cone cast by a light past the pillar.
+
+    The cone starts at the light (``apex``) and is bounded by two edges, along
+    ``left`` and ``right``. ``coords`` is the polygon that is sent to the clients.
+    """
+    apex: Vec
+    left: Vec
+    right: Vec
+    coords: tuple[tuple[float, float], ...]
+
+
+@lru_cache(maxsize=16)
+def cone_geometry(light_position: Vec, pillar_position: Vec, pillar_radius: float) -> Cone:
+    """The cone of a light, only computed again when the light (or the pillar) moves."""
+    diff_vector = light_position - pillar_position
+    perp_left = diff_vector.rotate(math.pi / 2).norm() * pillar_radius
+    perp_right = diff_vector.rotate(-math.pi / 2).norm() * pillar_radius
+    left = (diff_vector + perp_left) * -1
+    right = (diff_vector + perp_right) * -1
+    tangent_left = light_position + left * CONE_LENGTH
+    tangent_right = light_position + right * CONE_LENGTH
+    apex = (float(light_position.x), float(light_position.y))
+    return Cone(
+        apex=light_position,
+        left=left,
+        right=right,
+        coords=(apex, tuple(tangent_left), tuple(tangent_right), apex),
+    )
+
 def segments(curve):
     return list(map(LineString, zip(curve.coords[:-1], curve.coords[1:])))
 
@@ -90,10 +126,12 @@ class Playing:
     ball_speed: float = 100
     ball_radius: float = 30
     ball: Ball | None = None
-    red_cone: Polygon = dataclasses.field(init=False)
-    green_cone: Polygon = dataclasses.field(init=False)
+    red_cone: Cone = dataclasses.field(init=False)
+    green_cone: Cone = dataclasses.field(init=False)
     max_lives: int = 3
     demo_mode: bool = False
+    # added to the speed of the ball at every bounce
+    bounce_speed_up: float = 20
 
     def __post_init__(self):
         self.red_cone = self._cone(self.red_light)
@@ -104,6 +142,14 @@ class Playing:
         w, h = self.size
         return LinearRing([(0, 0), (0, h), (w, h), (w, 0)])
 
+    @cached_property
+    def walls(self) -> list[tuple[Vec, Vec]]:
+        return [(Vec(*start), Vec(*end)) for start, end in zip(self.boundary_shape.coords[:-1], self.boundary_shape.coords[1:])]
+
+    @cached_property
+    def wall_normals(self) -> list[Vec]:
+        return [(end - start).norm().rotate(math.pi / 2) for start, end in self.walls]
+
     @cached_property
     def play_field_shape(self) -> Polygon:
         return self.boundary_shape.convex_hull
@@ -116,17 +162,10 @@ class Playing:
         )
         return dataclasses.replace(self, ball=ball)
 
-    def _cone(self, light_position: Vec) -> Polygon:
-        diff_vector = light_position - self.pillar.position
-        # print(diff_vector)
-        perp_left = diff_vector.rotate(math.pi / 2).norm() * self.pillar.radius
-        perp_right = diff_vector.rotate(-math.pi / 2).norm() * self.pillar.radius
-        tangent_left = light_position + (diff_vector + perp_left) * -1000
-        tangent_right = light_position + (diff_vector + perp_right) * -1000
-        return Polygon([light_position, tangent_left, tangent_right, light_position])
-
+    def _cone(self, light_position: Vec) -> Cone:
+        return cone_geometry(light_position, self.pillar.position, self.pillar.radius)
 
-    def _update_light(self, light_position: Vec, pointer_position: Vec, dt: datetime.timedelta) -> tuple[Vec, Polygon]:
+    def _update_light(self, light_position: Vec, pointer_position: Vec, dt: datetime.timedelta) -> tuple[Vec, Cone]:
         max_d = self.light_speed * dt.total_seconds()
         # print(max_d, self.light_speed)
         new_light_position =  light_position + (pointer_position - light_position).truncate(max_d)
@@ -153,17 +192,20 @@ class Playing:
             return self
 
         moved_ball = self.ball.moved(dt)
-        ball_trace_shape = LineString([self.ball.position, moved_ball.position]).buffer(self.ball.radius)
+        ball_trace = (self.ball.position, moved_ball.position)
+        if capsule_within_box(*ball_trace, self.ball.radius, self.size):
+            # nowhere near a wall
+            self.ball = moved_ball
+            return self
 
-        for wall in segments(self.boundary_shape):
-            wall_intersection = wall.intersection(ball_trace_shape)
-            if not wall_intersection.is_empty:
+        for wall, normal in zip(self.walls, self.wall_normals):
+            wall_intersection = capsule_segment_interval(*ball_trace, self.ball.radius, *wall)
+            if wall_intersection is not None:
                 for cone in self.red_cone, self.green_cone:
-                    if cone.contains(wall_intersection):
-                        intersection_point = wall_intersection.centroid
-                        cone_wall_intersection = wall.intersection(cone)
-                        relative_intersection_location = cone_wall_intersection.line_locate_point(intersection_point, normalized=True)
-                        normal = (Vec(*wall.coords[1]) - Vec(*wall.coords[0])).norm().rotate(math.pi / 2)
+                    cone_wall_intersection = polygon_segment_interval(cone.coords, *wall)
+                    if cone_wall_intersection is not None and contains_interval(cone_wall_intersection, wall_intersection):
+                        intersection_location = (wall_intersection[0] + wall_intersection[1]) / 2
+                        relative_intersection_location = relative_location(cone_wall_intersection, intersection_location)
                         moved_ball = moved_ball.bounced(normal, distance_from_center=1 - 2 * relative_intersection_location)
                         if (x_overshoot := moved_ball.position.x + moved_ball.radius - self.size.x) > 0:
                             moved_ball.position = moved_ball.position - Vec(2 * x_overshoot, 0)
@@ -174,7 +216,7 @@ class Playing:
                         if (y_undershoot := moved_ball.position.y - moved_ball.radius) < 0:
                             moved_ball.position = moved_ball.position - Vec(0, 2 * y_undershoot)
                         self.scores[-1] += 1
-                        moved_ball.velocity = moved_ball.velocity + moved_ball.velocity.norm() * 20
+                        moved_ball.velocity = moved_ball.velocity + moved_ball.velocity.norm() * self.bounce_speed_up
                         break
                 else:
                     if self.demo_mode:
@@ -182,7 +224,7 @@ class Playing:
                     else:
                         self.ball = None
                         if len(self.scores) >= self.max_lives:
-                            highscores = Highscores()
+                            highscores = default_leaderboard()
                             my_highscore, my_highscore_index = highscores.add_score(self.team_name, max(self.scores))
                             top_10 = highscores.top(10)
                             return GameOver(
@@ -214,8 +256,8 @@ class Playing:
             "red_light": self.red_light,
             "green_light": self.green_light,
             "ball": self.ball,
-            "red_cone": list(self.red_cone.boundary.coords),
-            "green_cone": list(self.green_cone.boundary.coords),
+            "red_cone": self.red_cone.coords,
+            "green_cone": self.green_cone.coords,
             "pillar": self.pillar,
             "team_name": self.team_name,
             "scores": self.scores,
@@ -268,8 +310,8 @@ class GameOver:
     scores: list[int]
     team_name: str
     to_intro_at: datetime.timedelta
-    top_highscores: list[Highscores]
-    my_highscore: Highscores
+    top_highscores: list[Highscore]
+    my_highscore: Highscore
     my_highscore_index: int
     skip_to_intro_box: Polygon = GAME_OVER_BOX
     in_skip_to_intro_box_since: datetime.timedelta | None = None
@@ -426,8 +468,14 @@ class Game:
         self.state = Intro()
         
     def tick(self, total_dt: datetime.timedelta, dt: datetime.timedelta) -> Iterable[dict]:
+        # the last detections are at least a camera frame old, extrapolate them to now
+        now = datetime.datetime.now()
+        pointer_detections = {
+            laser_name: detection._replace(screen_position=detection.predict(now))
+            for laser_name, detection in self.laser_tracker.last_detections.items()
+        }
         self.state = self.state.tick(
-            pointer_detections=self.laser_tracker.last_detections,
+            pointer_detections=pointer_detections,
             total_dt=total_dt,
             dt=dt,
             time_since_last_detection=self.laser_tracker.time_since_last_detection,
@@ -0,0 +1,140 @@
+"""Collision math for the game on plain floats.
+
+Walls are segments, the ball sweeps a capsule (a circle moving along a
+segment) and light cones are convex polygons. Everything is expressed as an
+interval of the wall parameter ``t``, where 0 is the start and 1 the end of
+the wall, so intersections, containment and relative locations along a wall
+are simple comparisons.
+"""
+from __future__ import annotations
+import math
+
+from autokat.vec import Vec
+
+Interval = tuple[float, float]
+
+
+def _clip(t_min: float, t_max: float, value: float, slope: float, low: float, high: float) -> Interval | None:
+    """Restrict [t_min, t_max] to the values of t where low <= value + slope * t <= high."""
+    if slope == 0:
+        if low <= value <= high:
+            return t_min, t_max
+        return None
+    t_low = (low - value) / slope
+    t_high = (high - value) / slope
+    if t_low > t_high:
+        t_low, t_high = t_high, t_low
+    if t_low > t_min:
+        t_min = t_low
+    if t_high < t_max:
+        t_max = t_high
+    if t_min > t_max:
+        return None
+    return t_min, t_max
+
+
+def capsule_within_box(start: Vec, end: Vec, radius: float, size: Vec) -> bool:
+    """Whether a circle swept from ``start`` to ``end`` stays strictly inside the box from (0, 0) to ``size``."""
+    return (
+        radius < start.x < size.x - radius
+        and radius < end.x < size.x - radius
+        and radius < start.y < size.y - radius
+        and radius < end.y < size.y - radius
+    )
+
+
+def capsule_segment_interval(start: Vec, end: Vec, radius: float, segment_start: Vec, segment_end: Vec) -> Interval | None:
+    """The part of a segment covered by a circle of ``radius`` swept from ``start`` to ``end``.
+
+    Returns the covered interval of the segment parameter, or None when they don't touch.
+    """
+    sx, sy = start
+    ex, ey = end
+    ax, ay = segment_start
+    bx, by = segment_end
+    # most of the time the ball is nowhere near the wall
+    if (
+        (ax < sx - radius and ax < ex - radius and bx < sx - radius and bx < ex - radius)
+        or (ax > sx + radius and ax > ex + radius and bx > sx + radius and bx > ex + radius)
+        or (ay < sy - radius and ay < ey - radius and by < sy - radius and by < ey - radius)
+        or (ay > sy + radius and ay > ey + radius and by > sy + radius and by > ey + radius)
+    ):
+        return None
+
+    dx, dy = bx - ax, by - ay
+    a = dx * dx + dy * dy
+    t_min, t_max = math.inf, -math.inf
+    # the circles at both ends of the sweep
+    for cx, cy in (sx, sy), (ex, ey):
+        ox, oy = ax - cx, ay - cy
+        b = 2 * (dx * ox + dy * oy)
+        c = ox * ox + oy * oy - radius * radius
+        discriminant = b * b - 4 * a * c
+        if discriminant >= 0:
+            root = math.sqrt(discriminant)
+            t_low, t_high = (-b - root) / (2 * a), (-b + root) / (2 * a)
+            if t_low < t_min:
+                t_min = t_low
+            if t_high > t_max:
+                t_max = t_high
+    # the rectangle between them, in (along, across) sweep coordinates
+    sweep_x, sweep_y = ex - sx, ey - sy
+    sweep_length = math.hypot(sweep_x, sweep_y)
+    if sweep_length > 0:
+        ux, uy = sweep_x / sweep_length, sweep_y / sweep_length
+        ox, oy = ax - sx, ay - sy
+        rectangle = _clip(
+            -math.inf, math.inf,
+            ox * ux + oy * uy, dx * ux + dy * uy,
+            0, sweep_length,
+        )
+        if rectangle is not None:
+            rectangle = _clip(
+                *rectangle,
+                oy * ux - ox * uy, dy * ux - dx * uy,
+                -radius, radius,
+            )
+        if rectangle is not None:
+            if rectangle[0] < t_min:
+                t_min = rectangle[0]
+            if rectangle[1] > t_max:
+                t_max = rectangle[1]
+    if t_min < 0.0:
+        t_min = 0.0
+    if t_max > 1.0:
+        t_max = 1.0
+    if t_min > t_max:
+        return None
+    return t_min, t_max
+
+
+def polygon_segment_interval(vertices: list[tuple[float, float]], segment_start: Vec, segment_end: Vec) -> Interval | None:
+    """The part of a segment inside a convex polygon, or None when it's outside.
+
+    ``vertices`` may be closed (last vertex equal to the first) and in any orientation.
+    """
+    if vertices[0] == vertices[-1]:
+        vertices = vertices[:-1]
+    edges = list(zip(vertices, vertices[1:] + vertices[:1]))
+    signed_area = sum(px * qy - qx * py for (px, py), (qx, qy) in edges)
+    orientation = 1 if signed_area > 0 else -1
+    dx, dy = segment_end.x - segment_start.x, segment_end.y - segment_start.y
+    interval: Interval | None = (0.0, 1.0)
+    for (px, py), (qx, qy) in edges:
+        ex, ey = qx - px, qy - py
+        # inside is on the left of every edge for counter clockwise polygons
+        value = orientation * (ex * (segment_start.y - py) - ey * (segment_start.x - px))
+        slope = orientation * (ex * dy - ey * dx)
+        interval = _clip(*interval, value, slope, 0, math.inf)
+        if interval is None:
+            return None
+    return interval
+
+
+def contains_interval(outer: Interval, inner: Interval) -> bool:
+    return outer[0] <= inner[0] and inner[1] <= outer[1] and outer[0] < outer[1]
+
+
+def relative_location(interval: Interval, t: float) -> float:
+    """Where ``t`` lies in ``interval``, 0 at its start and 1 at its end."""
+    return (t - interval[0]) / (interval[1] - interval[0])
@@ -1,7 +1,9 @@
-import bisect
+from __future__ import annotations
 import json
+import os
 from pathlib import Path
 import random
+import sys
 from typing import NamedTuple
 
 ADJECTIVES = [
@@ -169,27 +171,168 @@ SUBJECTS = [
 ]
 
 DEFAULT_HIGHSCORES_PATH = Path("highscores.json")
+# the log is rewritten after this many appended scores
+DEFAULT_COMPACT_EVERY = 1000
+
 
 class Highscore(NamedTuple):
     team_name: str
     score: int
 
 
+class _RankIndex:
+    """How many scores there are of every value, in a Fenwick tree.
+
+    Counts the scores below a value and finds the k-th score in O(log n) of
+    the highest score. Scores are non-negative integers, the tree doubles
+    when a higher one comes in.
+    """
+
+    def __init__(self, size: int = 64):
+        self._size = size
+        self._tree = [0] * (size + 1)
+        self.total = 0
+
+    def add(self, score: int, count: int = 1) -> None:
+        while score >= self._size:
+            self._grow()
+        self.total += count
+        i = score + 1
+        while i <= self._size:
+            self._tree[i] += count
+            i += i & -i
+
+    def _grow(self) -> None:
+        counts = [self.count_below(score + 1) - self.count_below(score) for score in range(self._size)]
+        self.__init__(2 * self._size)
+        for score, count in enumerate(counts):
+            if count:
+                self.add(score, count)
+
+    def count_below(self, score: int) -> int:
+        count = 0
+        i = min(score, self._size)
+        while i > 0:
+            count += self._tree[i]
+            i -= i & -i
+        return count
+
+    def kth(self, k: int) -> int:
+        """The score with ``k`` scores below it, counting from 0."""
+        position = 0
+        step = 1 << self._size.bit_length()
+        while step:
+            if position + step <= self._size and self._tree[position + step] <= k:
+                position += step
+                k -= self._tree[position]
+            step >>= 1
+        return position
+
+
 class Highscores:
-    def __init__(self, path: str = DEFAULT_HIGHSCORES_PATH):
-        self._path = path
-        raw_highscores = path.read_text()
-        self._highscores = [Highscore(**score) for score in json.loads(raw_highscores)]
+    """The highscores, in an append-only log.
 
-    def add_score(self, team_name, score):
+    Every score is a line of JSON appended to the file, so adding one writes
+    a single line and a crash can at most lose the line it was writing. The
+    whole table is only rewritten when the log is compacted, into a new file
+    that replaces the old one at once. The first line may be the JSON array
+    of the old format, compacting turns it into lines too.
+
+    In memory the scores are kept per score value, in the order they were
+    added, with a ``_RankIndex`` over them for ``rank`` and ``top``.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_HIGHSCORES_PATH, compact_every: int = DEFAULT_COMPACT_EVERY):
+        self._path = Path(path)
+        self.compact_every = compact_every
+        self._buckets: dict[int, list[Highscore]] = {}
+        self._index = _RankIndex()
+        # scores appended since the log was compacted
+        self._appended = 0
+        self._needs_compaction = False
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            raw_highscores = self._path.read_text()
+        except FileNotFoundError:
+            return
+        lines = raw_highscores.splitlines()
+        if lines and lines[0].lstrip().startswith("["):
+            # the old format, a single array
+            for score in json.loads(lines.pop(0)):
+                self._insert(Highscore(**score))
+            self._needs_compaction = True
+        for line_number, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                self._insert(Highscore(**json.loads(line)))
+            except json.JSONDecodeError:
+                if line_number != len(lines) - 1:
+                    raise
+                # the line we were writing when we crashed
+                sys.stderr.write(f"Ignoring incomplete last line of {self._path}\n")
+                self._needs_compaction = True
+        self._appended = len(lines)
+        if raw_highscores and not raw_highscores.endswith("\n"):
+            # appending would continue the last line
+            self._needs_compaction = True
+
+    def _insert(self, highscore: Highscore) -> int:
+        if not isinstance(highscore.score, int) or highscore.score < 0:
+            raise ValueError(f"Scores are non-negative integers, not {highscore.score!r}")
+        index = self.rank(highscore.score)
+        self._buckets.setdefault(highscore.score, []).append(highscore)
+        self._index.add(highscore.score)
+        return index
+
+    def __len__(self) -> int:
+        return self._index.total
+
+    def rank(self, score: int) -> int:
+        """The index in ``top`` a score would get when it was added now."""
+        return self._index.total - self._index.count_below(score)
+
+    def record(self, team_name: str, score: int) -> tuple[Highscore, int]:
+        """Add a score in memory only, returns it and its index in ``top``."""
         highscore = Highscore(team_name=team_name, score=score)
-        insertion_index = bisect.bisect_right(self._highscores, -highscore.score, key=lambda x: -x.score)
-        self._highscores.insert(insertion_index, highscore)
-        self._path.write_text(json.dumps([h._asdict() for h in self._highscores]))
+        return highscore, self._insert(highscore)
+
+    def add_score(self, team_name, score):
+        highscore, insertion_index = self.record(team_name, score)
+        if self._needs_compaction or self._appended >= self.compact_every:
+            self.compact()
+        else:
+            with self._path.open("a") as f:
+                f.write(json.dumps(highscore._asdict()) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._appended += 1
         return highscore, insertion_index
 
     def top(self, n: int):
-        return self._highscores[:n]
+        top = []
+        for i in range(min(n, len(self))):
+            # the i-th best score has len - 1 - i scores below it
+            score = self._index.kth(len(self) - 1 - i)
+            # equal scores are in the order they were added
+            top.append(self._buckets[score][i - self.rank(score + 1)])
+        return top
+
+    def compact(self) -> None:
+        """Rewrite the log with one line per score, best first."""
+        temporary_path = self._path.with_name(self._path.name + ".tmp")
+        with temporary_path.open("w") as f:
+            for score in sorted(self._buckets, reverse=True):
+                for highscore in self._buckets[score]:
+                    f.write(json.dumps(highscore._asdict()) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self._path)
+        self._appended = 0
+        self._needs_compaction = False
+
 
 def generate_team_name():
     return f"{random.choice(ADJECTIVES)} {random.choice(SUBJECTS)}"
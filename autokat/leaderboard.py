@@ -0,0 +1,81 @@
+"""The highscores as the game loop sees them: in memory, written to disk behind its back.
+
+The game loop runs on the asyncio event loop of the server, so it must not
+wait for the disk. A ``Leaderboard`` is loaded once, answers ``top`` and
+``rank`` from memory and hands every new score to a background thread that
+appends it to the highscores file.
+"""
+from __future__ import annotations
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from pathlib import Path
+import sys
+import threading
+
+from autokat.highscores import DEFAULT_HIGHSCORES_PATH, Highscore, Highscores
+
+
+class Leaderboard:
+    """Highscores in memory, persisted write-behind on ``executor``.
+
+    The executor writes to a ``Highscores`` of its own, so the game never
+    shares anything with it but the scores it submits. Writes are only in
+    order on a single worker, like the default executor has. ``flush``
+    waits for all of them.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_HIGHSCORES_PATH, executor: Executor | None = None):
+        self._highscores = Highscores(path)
+        # only used on the executor
+        self._store = Highscores(path)
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="leaderboard")
+        self._pending: set[Future] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._highscores)
+
+    def add_score(self, team_name: str, score: int) -> tuple[Highscore, int]:
+        """Add a score, returns it and its index in ``top`` without waiting for the disk."""
+        highscore, index = self._highscores.record(team_name, score)
+        future = self._executor.submit(self._store.add_score, team_name, score)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._written)
+        return highscore, index
+
+    def _written(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+        if future.exception() is not None:
+            sys.stderr.write(f"Could not save highscore: {future.exception()!r}\n")
+
+    def top(self, n: int) -> list[Highscore]:
+        return self._highscores.top(n)
+
+    def rank(self, score: int) -> int:
+        return self._highscores.rank(score)
+
+    def flush(self) -> None:
+        """Wait until every score added so far is on disk."""
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            # failures were reported by _written
+            future.exception()
+
+    def close(self) -> None:
+        self.flush()
+        if self._owns_executor:
+            self._executor.shutdown()
+
+
+_default: Leaderboard | None = None
+
+
+def default_leaderboard() -> Leaderboard:
+    """The leaderboard of ``DEFAULT_HIGHSCORES_PATH``, loaded the first time it's needed."""
+    global _default
+    if _default is None:
+        _default = Leaderboard()
+    return _default
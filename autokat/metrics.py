@@ -0,0 +1,247 @@
+"""Counters, gauges and histograms, served in the Prometheus text format.
+
+Metrics are declared once, at import time, in the module that records them.
+A metric with labels hands out a child per combination of label values, the
+code that records in a loop keeps its children around so a recording is
+just a float addition. The server renders ``REGISTRY`` at ``/metrics``.
+
+Another process, like the tracker process, sends its ``Registry.snapshot``
+to the server, where a collector adds it to what the server renders.
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from collections.abc import Callable, Sequence
+import math
+from typing import Any
+
+# seconds, for the stages of a frame and the ticks of a game
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# name -> (type, help, label names, buckets, {label values: value})
+Snapshot = dict[str, tuple[str, str, tuple[str, ...], tuple[float, ...], dict[tuple[str, ...], Any]]]
+
+
+class _CounterValue:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def sample(self) -> float:
+        return self.value
+
+
+class _GaugeValue:
+    def __init__(self):
+        self.value = 0.0
+        self.function: Callable[[], float] | None = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from ``function`` whenever the metrics are rendered."""
+        self.function = function
+
+    def sample(self) -> float:
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+
+class _HistogramValue:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # per bucket, not cumulative, the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def sample(self) -> tuple[list[int], float]:
+        return list(self.counts), self.sum
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets: tuple[float, ...] = ()
+        self._children: dict[tuple[str, ...], Any] = {}
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """The child of these label values, keep it to record without a lookup."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} has labels {self.labelnames}, got {values}")
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._new_value())
+        return child
+
+    def remove(self, *values: str) -> None:
+        self._children.pop(tuple(str(value) for value in values), None)
+
+    def samples(self) -> dict[tuple[str, ...], Any]:
+        return {values: child.sample() for values, child in list(self._children.items())}
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_value(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_value(self):
+        return _GaugeValue()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+def _merge(into: Snapshot, snapshot: Snapshot) -> None:
+    """Add the samples of ``snapshot`` to ``into``, a gauge that's in both keeps the value of ``into``."""
+    for name, (kind, description, labelnames, buckets, samples) in snapshot.items():
+        if name not in into:
+            into[name] = (kind, description, labelnames, buckets, dict(samples))
+            continue
+        merged = into[name][4]
+        for values, sample in samples.items():
+            if values not in merged:
+                merged[values] = sample
+            elif kind == "counter":
+                merged[values] += sample
+            elif kind == "histogram":
+                counts, total = merged[values]
+                merged[values] = [a + b for a, b in zip(counts, sample[0])], total + sample[1]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labelnames: Sequence[str], values: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def render(snapshot: Snapshot) -> str:
+    """``snapshot`` in the Prometheus text exposition format."""
+    lines = []
+    for name, (kind, description, labelnames, buckets, samples) in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {_escape(description)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for values, sample in sorted(samples.items()):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labelnames, values)} {_number(sample)}")
+                continue
+            counts, total = sample
+            cumulative = 0
+            for bound, count in zip((*buckets, math.inf), counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels((*labelnames, 'le'), (*values, _number(bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labelnames, values)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labelnames, values)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class Registry:
+    """The metrics of a process, and collectors for those of other processes."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], Snapshot]] = []
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        # declaring a metric again, like a module that's imported twice, gives the same one
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"{name} is already a {metric.type}")
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def add_collector(self, collector: Callable[[], Snapshot]) -> None:
+        """Render the snapshots ``collector`` returns too, like those of a child process."""
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Snapshot]) -> None:
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def snapshot(self) -> Snapshot:
+        """The current values of the metrics of this process, it can be pickled."""
+        return {
+            name: (metric.type, metric.help, metric.labelnames, metric.buckets, metric.samples())
+            for name, metric in list(self._metrics.items())
+        }
+
+    def collect(self) -> Snapshot:
+        """The metrics of this process and of the collectors, this process has the last word on gauges."""
+        snapshot = self.snapshot()
+        for collector in list(self._collectors):
+            _merge(snapshot, collector())
+        return snapshot
+
+    def render(self) -> str:
+        return render(self.collect())
+
+
+REGISTRY = Registry()
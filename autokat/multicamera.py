@@ -0,0 +1,177 @@
+"""Tracks the lasers with several cameras at once.
+
+Every camera gets its own ``TrackerProcess``, so the cameras are processed
+in parallel on separate cores, and its own calibration, so each can see a
+different part of the projection. The detections of all cameras are fused
+into one ``last_detections``: a laser is wherever the cameras that saw it
+most recently agree it is. More cameras then sample the lasers more often,
+and a player blocking one camera only leaves the others.
+"""
+from __future__ import annotations
+import datetime
+import json
+import sys
+import threading
+from typing import NamedTuple
+
+from autokat.detection_channel import DetectionChannel
+from autokat.multitrack import MAX_PREDICTION_TIME, Calibration, Detection, ProcessingConfig, Vec
+from autokat.tracker_process import TrackerProcess
+
+
+class CameraConfig(NamedTuple):
+    # a camera device number or any other source open_frame_source knows
+    source: str
+    calibration_file_path: str
+    cam_width: int = 800
+    cam_height: int = 600
+
+
+def load_cameras(file_path: str) -> list[CameraConfig]:
+    """The cameras in a JSON file with a list of ``CameraConfig`` objects."""
+    with open(file_path) as f:
+        return [CameraConfig(**camera) for camera in json.load(f)]
+
+
+def _seen_at(detection: Detection) -> datetime.datetime:
+    return detection.captured_at or detection.time
+
+
+def fuse_detections(
+    camera_detections: list[dict[str, Detection]],
+    max_age: datetime.timedelta = MAX_PREDICTION_TIME,
+) -> dict[str, Detection]:
+    """Combine the detections of several cameras into one per laser.
+
+    Only the cameras that saw a laser at most ``max_age`` before the newest
+    sighting count, the others lost it. Their screen positions are predicted
+    at the time of the newest sighting and averaged, weighted by confidence.
+    The camera position is that of the newest sighting.
+    """
+    fused = {}
+    for detections in camera_detections:
+        for laser_name in detections:
+            if laser_name in fused:
+                continue
+            sightings = [d[laser_name] for d in camera_detections if laser_name in d]
+            newest = max(sightings, key=_seen_at)
+            newest_at = _seen_at(newest)
+            recent = [d for d in sightings if newest_at - _seen_at(d) <= max_age]
+            total_confidence = sum(d.confidence for d in recent)
+            if len(recent) == 1 or total_confidence <= 0:
+                fused[laser_name] = newest
+                continue
+            position, velocity = Vec(0, 0), Vec(0, 0)
+            for detection in recent:
+                weight = detection.confidence / total_confidence
+                position = position + detection.predict(newest_at) * weight
+                velocity = velocity + detection.velocity * weight
+            fused[laser_name] = newest._replace(
+                screen_position=position,
+                velocity=velocity,
+                confidence=max(d.confidence for d in recent),
+            )
+    return fused
+
+
+class MultiCameraTracker:
+    """Runs a ``TrackerProcess`` per camera and fuses their detections.
+
+    Can be used instead of a single tracker. ``max_age`` is how long a camera
+    that doesn't see a laser anymore still counts, see ``fuse_detections``.
+    """
+
+    def __init__(
+        self,
+        cameras: list[CameraConfig],
+        processing_config: ProcessingConfig | None = None,
+        max_age: datetime.timedelta = MAX_PREDICTION_TIME,
+        name: str = "default",
+        **process_kwargs,
+    ):
+        if not cameras:
+            raise ValueError("No cameras to track with")
+        if processing_config is None:
+            processing_config = ProcessingConfig.load_from_file('processing_config.json')
+        self.max_age = max_age
+        # the camera detections that were fused last, and what came out
+        self._fused: tuple[list[dict[str, Detection]], dict[str, Detection]] | None = None
+        self.trackers = [
+            TrackerProcess(
+                cam_width=camera.cam_width,
+                cam_height=camera.cam_height,
+                processing_config=processing_config,
+                calibration_file_path=camera.calibration_file_path,
+                source=camera.source,
+                name=f"{name} camera {camera_number}",
+                **process_kwargs,
+            )
+            for camera_number, camera in enumerate(cameras)
+        ]
+        # of the first camera
+        self.debug_preview = self.trackers[0].debug_preview
+
+    @property
+    def detection_channel(self) -> DetectionChannel | None:
+        return self.trackers[0].detection_channel
+
+    @detection_channel.setter
+    def detection_channel(self, detection_channel: DetectionChannel | None) -> None:
+        # every camera wakes the game, the detections are fused when it reads them
+        for tracker in self.trackers:
+            tracker.detection_channel = detection_channel
+
+    @property
+    def camera_detections(self) -> list[dict[str, Detection]]:
+        """The latest detections of every camera, in the order of the cameras."""
+        return [tracker.last_detections for tracker in self.trackers]
+
+    @property
+    def last_detections(self) -> dict[str, Detection]:
+        """The fused detections, only fused again when a camera wrote new detections.
+
+        The slots of a camera hand out the same detections until its sequence
+        number changes, so the game can read this several times per tick.
+        """
+        camera_detections = self.camera_detections
+        fused = self._fused
+        if fused is None or any(new is not old for new, old in zip(camera_detections, fused[0])):
+            fused = self._fused = camera_detections, fuse_detections(camera_detections, self.max_age)
+        return fused[1]
+
+    @property
+    def time_since_last_detection(self) -> datetime.timedelta:
+        return max(d.time for d in self.last_detections.values()) - datetime.datetime.now()
+
+    @property
+    def calibration(self) -> Calibration:
+        return self.trackers[0].calibration
+
+    def calibrate_corner(self, corner: str, laser_name: str) -> None:
+        """Calibrate ``corner`` of every camera at its own detection of ``laser_name``.
+
+        The cameras that haven't seen the laser recently keep their corner.
+        """
+        now = datetime.datetime.now()
+        for camera_number, tracker in enumerate(self.trackers):
+            detection = tracker.last_detections[laser_name]
+            if now - _seen_at(detection) > self.max_age:
+                sys.stderr.write(f"Camera {camera_number} doesn't see the {laser_name} laser, not calibrating its {corner}\n")
+                continue
+            tracker.update_calibration(**{corner: detection.camera_position})
+
+    def update_processing_config(self, processing_config: ProcessingConfig) -> None:
+        for tracker in self.trackers:
+            tracker.update_processing_config(processing_config)
+
+    def run(self) -> None:
+        """Supervise the tracker processes of all cameras until ``stop``."""
+        threads = [threading.Thread(target=tracker.run) for tracker in self.trackers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def stop(self) -> None:
+        for tracker in self.trackers:
+            tracker.stop()
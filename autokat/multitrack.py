@@ -1,42 +1,89 @@
 from __future__ import annotations
+from collections.abc import Callable
 from dataclasses import dataclass
 import dataclasses
 import datetime
+from functools import lru_cache
 import json
 import math
 import os
 import random
 import sys
-from typing import Any, NamedTuple
+import threading
+import time
+from typing import TYPE_CHECKING, NamedTuple
 from typing_extensions import Self
 import cv2
 import numpy
 
+from autokat.capture import Frame, FrameGrabber, LatestFrameBuffer
+from autokat.classifier import FIRST_LASER, FrameBuffers, PixelClassifier, config_key
 from autokat.constants import SCREEN_HEIGHT, SCREEN_WIDTH
+from autokat.metrics import REGISTRY
+from autokat.sources import FrameSource, open_frame_source
 from autokat.vec import Vec
 
+if TYPE_CHECKING:
+    from autokat.detection_channel import DetectionChannel
+
+SCREEN_CORNERS = (
+    (0, 0),
+    (SCREEN_WIDTH - 1, 0),
+    (0, SCREEN_HEIGHT - 1),
+    (SCREEN_WIDTH - 1, SCREEN_HEIGHT - 1),
+)
+
+
+@lru_cache(maxsize=16)
+def homography(corners: tuple[tuple[float, float], ...]) -> tuple[float, ...]:
+    """Solve the perspective transform that maps the calibrated ``corners`` onto the screen corners.
+
+    Calibrations are immutable, so this is only computed once per calibration.
+    The 3x3 matrix is returned row by row.
+    """
+    a = numpy.zeros((8, 8))
+    b = numpy.zeros(8)
+    for i, ((x, y), (u, v)) in enumerate(zip(corners, SCREEN_CORNERS)):
+        a[2 * i] = [x, y, 1, 0, 0, 0, -u * x, -u * y]
+        a[2 * i + 1] = [0, 0, 0, x, y, 1, -v * x, -v * y]
+        b[2 * i] = u
+        b[2 * i + 1] = v
+    return (*numpy.linalg.solve(a, b).tolist(), 1.0)
+
+
+def perspective_transform(corners: tuple[tuple[float, float], ...], x: float, y: float) -> tuple[float, float]:
+    """The screen coordinates of camera coordinates ``x``, ``y``, for a calibration with ``corners``."""
+    h00, h01, h02, h10, h11, h12, h20, h21, h22 = homography(corners)
+    w = h20 * x + h21 * y + h22
+    return (h00 * x + h01 * y + h02) / w, (h10 * x + h11 * y + h12) / w
+
+
+def perspective_transform_many(corners: tuple[tuple[float, float], ...], points: numpy.ndarray) -> numpy.ndarray:
+    """``perspective_transform`` of an (N, 2) array of camera coordinates at once."""
+    matrix = numpy.array(homography(corners)).reshape(3, 3)
+    points = numpy.asarray(points, numpy.float64).reshape(-1, 2)
+    projected = points @ matrix[:, :2].T + matrix[:, 2]
+    return projected[:, :2] / projected[:, 2:]
+
+
 class Calibration(NamedTuple):
     top_left: Vec
     top_right: Vec
     bottom_left: Vec
     bottom_right: Vec
 
+    @property
+    def homography(self) -> numpy.ndarray:
+        """The 3x3 perspective transform from camera to screen coordinates."""
+        return numpy.array(homography(self)).reshape(3, 3)
+
     def transform(self, coords: Vec) -> Vec:
-        tl, tr, bl, br = self
-        y_offset_top = (tl.y + tr.y) / 2
-        delta_y =  (bl.y + br.y) / 2 - y_offset_top
-        y_scale = (SCREEN_HEIGHT - 1) / delta_y
-        x, y = coords
-        ty = (y - y_offset_top) * y_scale
-        
-        t = ty / (SCREEN_HEIGHT - 1)
-        x_offset_left = tl[0] * (1 - t) + bl[0] * t
-        x_offset_right = tr[0] * (1 - t) + br[0] * t
-        x_width = x_offset_right - x_offset_left
-        x_scale = x_width / (SCREEN_WIDTH - 1)
-        tx = (x - x_offset_left) / x_scale
-        return Vec(tx,ty)
-    
+        return Vec(*perspective_transform(self, *coords))
+
+    def transform_many(self, points: numpy.ndarray) -> numpy.ndarray:
+        """Transform an (N, 2) array of camera coordinates to screen coordinates at once."""
+        return perspective_transform_many(self, points)
+
     @classmethod
     def from_dict(cls, data: dict[str, list[float]]) -> Self:
         return cls(**{k: Vec(*v) for k, v in data.items()})
@@ -44,6 +91,54 @@ class Calibration(NamedTuple):
     def to_dict(self) -> dict[str, list[float, float]]:
         return {k: list(v) for k, v in self._asdict().items()}
 
+    @classmethod
+    def load_from_file(cls, file_path: str) -> Self:
+        """The calibration saved in ``file_path``, or the whole camera image mapped to the screen."""
+        try:
+            with open(file_path) as f:
+                calibration = cls.from_dict(json.load(f))
+            print(f"Using calibration from file {file_path}: {calibration}")
+        except IOError:
+            calibration = cls(*(Vec(*corner) for corner in SCREEN_CORNERS))
+            print(f"Couldn't open calibration file, using default {calibration}")
+        return calibration
+
+    def region_of_interest(self, cam_width: int, cam_height: int, margin: int = 10) -> RegionOfInterest:
+        """The part of the camera image that maps to the play field, ``margin`` pixels wider on every side.
+
+        When the play field is completely outside the camera image, like with
+        a calibration of another camera, it's the whole image.
+        """
+        quadrilateral = numpy.array([self.top_left, self.top_right, self.bottom_right, self.bottom_left], numpy.float64)
+        x_min, y_min = (int(v) - margin for v in numpy.floor(quadrilateral.min(axis=0)))
+        x_max, y_max = (int(v) + margin + 1 for v in numpy.ceil(quadrilateral.max(axis=0)))
+        x_min, y_min = max(x_min, 0), max(y_min, 0)
+        x_max, y_max = min(x_max, cam_width), min(y_max, cam_height)
+        if x_max <= x_min or y_max <= y_min:
+            return RegionOfInterest(x=0, y=0, width=cam_width, height=cam_height, mask=numpy.full((cam_height, cam_width), 255, numpy.uint8))
+        mask = numpy.zeros((y_max - y_min, x_max - x_min), numpy.uint8)
+        corners = numpy.round(quadrilateral - (x_min, y_min)).astype(numpy.int32)
+        cv2.fillConvexPoly(mask, corners, 255)
+        cv2.polylines(mask, [corners], True, 255, 2 * margin + 1)
+        return RegionOfInterest(x=x_min, y=y_min, width=x_max - x_min, height=y_max - y_min, mask=mask)
+
+
+class RegionOfInterest(NamedTuple):
+    x: int
+    y: int
+    width: int
+    height: int
+    # 255 inside the calibration quadrilateral, 0 outside
+    mask: numpy.ndarray
+
+    @property
+    def slices(self) -> tuple[slice, slice]:
+        return slice(self.y, self.y + self.height), slice(self.x, self.x + self.width)
+
+    @property
+    def offset(self) -> Vec:
+        return Vec(self.x, self.y)
+
 class DummyTracker:
     position = (300, 300)
     calibration = Calibration(
@@ -96,8 +191,16 @@ class ProcessingConfig:
 
 class ProcessingConfigEditor:
 
-    def __init__(self, processing_config: ProcessingConfig):
+    def __init__(
+        self,
+        processing_config: ProcessingConfig,
+        file_path: str = 'processing_config.json',
+        on_change: Callable[[ProcessingConfig], None] | None = None,
+    ):
         self._processing_config = processing_config
+        self._file_path = file_path
+        # told about every edit, for the trackers that don't share this processing config
+        self._on_change = on_change
 
     def run(self):
         import tkinter as tk
@@ -133,7 +236,9 @@ class ProcessingConfigEditor:
                     setattr(self._processing_config.laser_configs[laser_name], field_name, value)
                 case field_name:
                     setattr(self._processing_config, field_name, value)
-            self._processing_config.save_to_file('processing_config.json')
+            self._processing_config.save_to_file(self._file_path)
+            if self._on_change is not None:
+                self._on_change(self._processing_config)
 
         def slider_changed(field, current_value):
             def _(value):
@@ -184,10 +289,202 @@ class ProcessingConfigEditor:
         threading.Thread(target=self.run).start()
 
 
+# never extrapolate a pointer further than this into the future
+MAX_PREDICTION_TIME = datetime.timedelta(seconds=0.1)
+
+
 class Detection(NamedTuple):
     camera_position: Vec
     screen_position: Vec
     time: datetime.datetime
+    captured_at: datetime.datetime | None = None
+    # estimated screen velocity in pixels per second
+    velocity: Vec = Vec(0, 0)
+    # how sure the tracker is this is the laser, from 0 to 1
+    confidence: float = 1.0
+
+    def predict(self, at_time: datetime.datetime) -> Vec:
+        """Extrapolate the screen position to ``at_time`` using the estimated velocity."""
+        seen_at = self.captured_at or self.time
+        dt = min(at_time - seen_at, MAX_PREDICTION_TIME).total_seconds()
+        if dt <= 0:
+            return self.screen_position
+        return self.screen_position + self.velocity * dt
+
+
+class AlphaBetaFilter:
+    """Tracks the position and velocity of a single laser pointer.
+
+    A lightweight alternative to a Kalman filter with fixed gains: ``alpha``
+    weighs how much a new measurement corrects the position, ``beta`` how
+    much it corrects the velocity. When a pointer hasn't been seen for
+    ``max_gap`` the filter starts over from the new measurement.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.85,
+        beta: float = 0.4,
+        max_gap: datetime.timedelta = datetime.timedelta(seconds=0.25),
+    ):
+        self.alpha = alpha
+        self.beta = beta
+        self.max_gap = max_gap
+        self.position: Vec | None = None
+        self.velocity = Vec(0, 0)
+        self.time: datetime.datetime | None = None
+
+    def update(self, measurement: Vec, time: datetime.datetime) -> tuple[Vec, Vec]:
+        """Add a measured position, returns the filtered position and velocity."""
+        dt = (time - self.time).total_seconds() if self.time is not None else 0
+        if self.position is None or not 0 < dt <= self.max_gap.total_seconds():
+            self.position = measurement
+            self.velocity = Vec(0, 0)
+        else:
+            predicted = self.position + self.velocity * dt
+            residual = measurement - predicted
+            self.position = predicted + residual * self.alpha
+            self.velocity = self.velocity + residual * (self.beta / dt)
+        self.time = time
+        return self.position, self.velocity
+
+
+class FrameTimings(NamedTuple):
+    captured_at: datetime.datetime
+    processing_started_at: datetime.datetime
+    detected_at: datetime.datetime
+
+    @property
+    def queue_latency(self) -> datetime.timedelta:
+        """Time the frame waited between the capture thread and the detection worker."""
+        return self.processing_started_at - self.captured_at
+
+    @property
+    def processing_time(self) -> datetime.timedelta:
+        return self.detected_at - self.processing_started_at
+
+    @property
+    def latency(self) -> datetime.timedelta:
+        """Glass-to-detection latency."""
+        return self.detected_at - self.captured_at
+
+
+class Blob(NamedTuple):
+    camera_position: Vec
+    area: int
+    mean_hue: float
+    debug_color: list[int]
+    # the fraction of its pixels that have the color of its class
+    confidence: float = 1.0
+
+
+class FrameResult(NamedTuple):
+    detections: dict[str, Blob]
+    unknowns: list[Blob]
+    timings: FrameTimings
+    # seconds spent in each stage of process_frame, by stage name
+    stage_times: dict[str, float]
+
+
+class BlobStatistics(NamedTuple):
+    area: numpy.ndarray
+    mean_hue: numpy.ndarray
+    bbox: numpy.ndarray
+
+
+def blob_statistics(labels: numpy.ndarray, stats: numpy.ndarray, hue: numpy.ndarray) -> BlobStatistics:
+    """Compute the area, mean hue and bounding box of all labels at once.
+
+    ``labels`` and ``stats`` are the outputs of ``cv2.connectedComponentsWithStats``,
+    ``hue`` is the hue channel of the same frame. Instead of masking the frame once
+    per label, the hue values are summed per label in a single pass over ``labels``.
+    Index 0 is the background, just like in ``stats``; its mean hue is not computed.
+    """
+    num_labels = len(stats)
+    flat_labels = labels.ravel()
+    foreground = flat_labels != 0
+    blob_labels = flat_labels[foreground]
+    hue_sum = numpy.bincount(blob_labels, weights=hue.ravel()[foreground], minlength=num_labels)
+    area = stats[:, cv2.CC_STAT_AREA]
+    mean_hue = hue_sum / numpy.maximum(area, 1)
+    bbox = stats[:, [cv2.CC_STAT_LEFT, cv2.CC_STAT_TOP, cv2.CC_STAT_WIDTH, cv2.CC_STAT_HEIGHT]]
+    return BlobStatistics(area=area, mean_hue=mean_hue, bbox=bbox)
+
+
+def debug_colors(mean_hue: numpy.ndarray) -> list[list[int]]:
+    """Convert mean hue values to BGR colors to draw the detected blobs with."""
+    hsv_pixels = numpy.empty((1, len(mean_hue), 3), numpy.uint8)
+    hsv_pixels[0, :, 0] = mean_hue.astype(numpy.uint8)
+    hsv_pixels[0, :, 1] = 255
+    hsv_pixels[0, :, 2] = 128
+    return cv2.cvtColor(hsv_pixels, cv2.COLOR_HSV2BGR)[0].tolist()
+
+
+def _elapsed_since(started_at: float) -> tuple[float, float]:
+    """The seconds since ``started_at`` (a ``time.perf_counter``) and the current ``time.perf_counter``."""
+    now = time.perf_counter()
+    return now - started_at, now
+
+
+class DebugPreview:
+    """Annotated camera frames for debugging a headless tracker.
+
+    Only every ``every``-th frame is annotated, or the next frame after a
+    preview was explicitly requested, so the detection loop hardly pays for it.
+    """
+
+    def __init__(self, every: int = 30):
+        self.every = every
+        self.frame: Frame | None = None
+        self._requested = threading.Event()
+
+    def request(self) -> None:
+        """Ask for the next frame to be annotated."""
+        self._requested.set()
+
+    def wants(self, frame: Frame) -> bool:
+        return self._requested.is_set() or (self.every > 0 and frame.index % self.every == 0)
+
+    def update(self, frame: Frame) -> None:
+        self._requested.clear()
+        self.frame = frame
+
+    def jpeg(self) -> bytes | None:
+        """The most recent preview, encoded as JPEG."""
+        frame = self.frame
+        if frame is None:
+            return None
+        success, encoded = cv2.imencode('.jpg', frame.image)
+        return encoded.tobytes() if success else None
+
+
+TRACKER_FRAMES = REGISTRY.counter("autokat_tracker_frames_total", "Frames the tracker processed", ["tracker"])
+TRACKER_FPS = REGISTRY.gauge("autokat_tracker_frames_per_second", "Frames the tracker processed per second, over the last second", ["tracker"])
+TRACKER_BLOBS = REGISTRY.histogram(
+    "autokat_tracker_blobs_per_frame", "Blobs found in a frame", ["tracker"],
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128),
+)
+TRACKER_STAGE_SECONDS = REGISTRY.histogram("autokat_tracker_stage_seconds", "Time spent in each stage of processing a frame", ["tracker", "stage"])
+DETECTION_AGE = REGISTRY.gauge("autokat_tracker_detection_age_seconds", "Time since every laser was last detected", ["tracker", "laser"])
+
+
+def serve_detection_ages(tracker) -> None:
+    """Read ``DETECTION_AGE`` of every laser from the ``last_detections`` of ``tracker`` when it's rendered."""
+    for laser_name in tracker.last_detections:
+        DETECTION_AGE.labels(tracker.name, laser_name).set_function(
+            lambda laser_name=laser_name: (datetime.datetime.now() - tracker.last_detections[laser_name].time).total_seconds()
+        )
+
+
+def remove_detection_ages(tracker) -> None:
+    for laser_name in tracker.last_detections:
+        DETECTION_AGE.remove(tracker.name, laser_name)
+
+
+def headless_from_environment() -> bool:
+    """Whether ``HEADLESS=1`` asks to run without any windows."""
+    return os.environ.get('HEADLESS') == '1'
+
 
 class MultiLaserTracker:
     def __init__(
@@ -196,30 +493,35 @@ class MultiLaserTracker:
         cam_height=600,
         processing_config: ProcessingConfig|None = None,
         calibration_file_path: str = 'calibration.json',
+        headless: bool | None = None,
+        preview_every: int = 30,
+        source: str | None = None,
+        name: str = "default",
     ):
+        # the tracker label of its metrics
+        self.name = name
         self.cam_width = cam_width
         self.cam_height = cam_height
+        # read from the environment when the tracker is made, not when this module is imported
+        self.headless = headless_from_environment() if headless is None else headless
+        # in headless mode nothing is drawn, except for the occasional debug preview
+        self.debug_preview = DebugPreview(every=preview_every)
         self.processing_config = processing_config
         if self.processing_config is None:
             # self._processing_config = GuiProcessingConfig()
             self.processing_config = ProcessingConfig.load_from_file('processing_config.json')
 
         self.capture = None  # camera capture device
+        # where start_capture gets its frames from, see open_frame_source
+        self.source = source
+        self.frame_grabber: FrameGrabber | None = None
+        self._stopped = threading.Event()
+        self.last_frame_timings: FrameTimings | None = None
 
         self.calibration_file_path = calibration_file_path
-        self.calibration = Calibration(
-            top_left=Vec(0, 0),
-            top_right=Vec(SCREEN_WIDTH - 1, 0),
-            bottom_left=Vec(0, SCREEN_HEIGHT - 1),
-            bottom_right=Vec(SCREEN_WIDTH - 1, SCREEN_HEIGHT - 1)
-        )
-        try:
-            with open(calibration_file_path) as f:
-                self.calibration = Calibration.from_dict(json.load(f))
-            print(f"Using calibration from file {calibration_file_path}: {self.calibration}")
-        except IOError:
-            print(f"Couldn't open calibration file, using default {self.calibration}")
-        
+        self.calibration = Calibration.load_from_file(calibration_file_path)
+        self.region_of_interest = self.calibration.region_of_interest(self.cam_width, self.cam_height)
+
         self.last_detections = {
             laser_name: Detection(
                 camera_position=Vec(self.cam_width / 2, self.cam_height / 2),
@@ -228,15 +530,50 @@ class MultiLaserTracker:
             )
             for laser_name in self.processing_config.laser_configs.keys()
         }
+        # built from processing_config and the region of interest on the first frame
+        self.classifier: PixelClassifier | None = None
+        self.frame_buffers: FrameBuffers | None = None
+        # told about every frame with detections, see autokat.detection_channel
+        self.detection_channel: DetectionChannel | None = None
+        self.motion_filters = {
+            laser_name: AlphaBetaFilter()
+            for laser_name in self.processing_config.laser_configs.keys()
+        }
+        self._frames = TRACKER_FRAMES.labels(name)
+        self._fps = TRACKER_FPS.labels(name)
+        self._fps_since = time.monotonic()
+        self._fps_frames = 0
+        self._blobs = TRACKER_BLOBS.labels(name)
+        self._stage_seconds = {}
+        serve_detection_ages(self)
+
+    def _record_metrics(self, num_blobs: int, stage_times: dict[str, float]) -> None:
+        self._frames.inc()
+        self._blobs.observe(num_blobs)
+        for stage, seconds in stage_times.items():
+            histogram = self._stage_seconds.get(stage)
+            if histogram is None:
+                histogram = self._stage_seconds[stage] = TRACKER_STAGE_SECONDS.labels(self.name, stage)
+            histogram.observe(seconds)
+        self._fps_frames += 1
+        now = time.monotonic()
+        if now - self._fps_since >= 1:
+            self._fps.set(self._fps_frames / (now - self._fps_since))
+            self._fps_since, self._fps_frames = now, 0
 
     def update_calibration(
         self,
         **kwargs: Vec,
     ) -> None:
         self.calibration = self.calibration._replace(**kwargs)
+        self.region_of_interest = self.calibration.region_of_interest(self.cam_width, self.cam_height)
         with open(self.calibration_file_path, 'w') as f:
             json.dump(self.calibration.to_dict(), f)
 
+    def update_processing_config(self, processing_config: ProcessingConfig) -> None:
+        # the classifier is rebuilt on the next frame, see process_frame
+        self.processing_config = processing_config
+
     @property
     def time_since_last_detection(self) -> datetime.timedelta:
         return max(d.time for d in self.last_detections.values()) - datetime.datetime.now()
@@ -285,6 +622,8 @@ class MultiLaserTracker:
             else cv2.CAP_PROP_FRAME_HEIGHT,
             self.cam_height,
         )
+        # frames are grabbed continuously, don't let the driver queue up stale ones
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         return self.capture
 
     def handle_quit(self, delay=10):
@@ -297,96 +636,155 @@ class MultiLaserTracker:
             sys.exit(0)
 
 
-    def threshold(self, img, min_val, max_val):
-        """Threshold the image to only include values between min_val and max_val."""
-        (t, tmp) = cv2.threshold(
-            img,  # src
-            max_val,  # threshold value
-            0,  # we dont care because of the selected type
-            cv2.THRESH_TOZERO_INV,  # t type
-        )
+    def process_frame(self, frame: Frame) -> FrameResult:
+        """Detect the lasers in a captured frame and update ``last_detections``."""
+        processing_started_at = datetime.datetime.now()
+        stage_started_at = time.perf_counter()
+        stage_times = {}
+        height, width = frame.image.shape[:2]
+        if (width, height) != (self.cam_width, self.cam_height):
+            # the camera doesn't deliver the size we asked for
+            self.cam_width, self.cam_height = width, height
+            self.region_of_interest = self.calibration.region_of_interest(self.cam_width, self.cam_height)
+        # only process the part of the image the play field is projected on
+        region_of_interest = self.region_of_interest
+        image = frame.image[region_of_interest.slices]
+
+        # the lookup table only changes when the config was edited
+        if self.classifier is None or self.classifier.key != config_key(self.processing_config):
+            self.classifier = PixelClassifier(self.processing_config)
+        classifier = self.classifier
+        if self.frame_buffers is None or self.frame_buffers.shape != image.shape[:2]:
+            # a new region of interest
+            self.frame_buffers = FrameBuffers(image.shape[:2])
+        buffers = self.frame_buffers
+        _, foreground = classifier.classify(image, buffers, region_of_interest.mask)
+        stage_times["threshold"], stage_started_at = _elapsed_since(stage_started_at)
+
+        num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(foreground, buffers.labels, connectivity=4, ltype=cv2.CV_32S)
+        blobs = classifier.blob_statistics(labels, stats, buffers)
+        # colors to draw the detected blobs with, based on their mean hue
+        blob_colors = debug_colors(blobs.mean_hue)
+        stage_times["blobs"], stage_started_at = _elapsed_since(stage_started_at)
+
+        # loop over all detected blobs
+        # the first blob is the background, so we skip it
+        candidates: dict[str, list[Blob]] = {}
+        unknowns: list[Blob] = []
+        blob_classes = blobs.blob_class.tolist()
+        for i in range(1, num_labels):
+            x, y = centroids[i]
+            blob = Blob(
+                camera_position=Vec(x + region_of_interest.x, y + region_of_interest.y),
+                area=blobs.area[i],
+                mean_hue=blobs.mean_hue[i],
+                debug_color=blob_colors[i],
+                confidence=blobs.confidence[i],
+            )
+            if blob_classes[i] >= FIRST_LASER:
+                candidates.setdefault(classifier.laser_names[blob_classes[i] - FIRST_LASER], []).append(blob)
+            else:
+                unknowns.append(blob)
+
+        stage_times["classify"], stage_started_at = _elapsed_since(stage_started_at)
+        detected_at = datetime.datetime.now()
+        detections = {
+            laser_name: max(laser_candidates, key=lambda blob: blob.area)
+            for laser_name, laser_candidates in candidates.items()
+        }
+        if detections:
+            screen_positions = self.calibration.transform_many([blob.camera_position for blob in detections.values()])
+            for (laser_name, blob), screen_position in zip(detections.items(), screen_positions.tolist()):
+                position, velocity = self.motion_filters[laser_name].update(Vec(*screen_position), frame.captured_at)
+                self.last_detections[laser_name] = Detection(
+                    camera_position=blob.camera_position,
+                    screen_position=position,
+                    time=detected_at,
+                    captured_at=frame.captured_at,
+                    velocity=velocity,
+                    confidence=blob.confidence,
+                )
+        stage_times["transform"], _ = _elapsed_since(stage_started_at)
+        self._record_metrics(num_labels - 1, stage_times)
 
-        (t, img) = cv2.threshold(
-            tmp,  # src
-            min_val,  # threshold value
-            255,  # maxvalue
-            cv2.THRESH_BINARY,  # type
+        self.last_frame_timings = FrameTimings(
+            captured_at=frame.captured_at,
+            processing_started_at=processing_started_at,
+            detected_at=detected_at,
         )
-        return img
+        return FrameResult(detections=detections, unknowns=unknowns, timings=self.last_frame_timings, stage_times=stage_times)
+
+    def draw_detections(self, image: numpy.ndarray, result: FrameResult) -> None:
+        for laser_name, blob in result.detections.items():
+            cv2.putText(image, f"{laser_name} {int(blob.mean_hue)}", (int(blob.camera_position.x), int(blob.camera_position.y)), cv2.FONT_HERSHEY_SIMPLEX, 1, blob.debug_color, 2)
 
+        for blob in result.unknowns:
+            cv2.putText(image, f"??? {int(blob.mean_hue)}", (int(blob.camera_position.x), int(blob.camera_position.y)), cv2.FONT_HERSHEY_SIMPLEX, 1, blob.debug_color, 2)
+            # cv2.circle(image, (int(x), int(y)), 10, blob.debug_color, 2)
+
+    def start_capture(self, frame_source: FrameSource | None = None) -> LatestFrameBuffer:
+        """Start grabbing frames on a separate thread.
+
+        The frames come from ``frame_source``, the source the tracker was
+        made with or the one described by the ``FRAME_SOURCE`` environment
+        variable (see ``open_frame_source``), or else the camera. Returns the
+        buffer the latest frames end up in.
+        """
+        spec = self.source or os.environ.get('FRAME_SOURCE')
+        if frame_source is None and spec and not spec.isdigit():
+            # the tracker films the scene live, whatever its frame rate
+            frame_source = open_frame_source(spec, self.cam_width, self.cam_height, realtime=True)
+        if frame_source is None and spec:
+            # a camera device number
+            self.setup_camera_capture(spec)
+        elif frame_source is None:
+            self.setup_camera_capture()
+        else:
+            self.capture = frame_source
+        frame_buffer = LatestFrameBuffer()
+        self.frame_grabber = FrameGrabber(self.capture, frame_buffer)
+        self.frame_grabber.start()
+        return frame_buffer
 
     def run(self):
         # Set up window positions
         # self.setup_windows()
         # Set up the camera capture
-        self.setup_camera_capture()
+        frame_buffer = self.start_capture()
 
         while True:
-            # 1. capture the current image
-            success, frame = self.capture.read()
-            if not success:  # no image captured... end the processing
+            # 1. wait for the most recent image
+            frame = frame_buffer.get()
+            if frame is None and self._stopped.is_set():
+                return
+            if frame is None:  # no image captured... end the processing
                 sys.stderr.write("Could not read camera frame. Quitting\n")
                 sys.exit(1)
 
-            hsv_image = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            hue, saturation, value = cv2.split(hsv_image)
-            hue = cv2.medianBlur(hue, 3)
-            value_t = self.threshold(value, self.processing_config.val_min, self.processing_config.val_max)
-
-            num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(value_t, 4, cv2.CV_32S)
-
-            # loop over all detected blobs
-            # the first blob is the background, so we skip it
-            candidates: dict[str, list[tuple[Vec, float, float, Any]]] = {}
-            unknowns: list[tuple[Vec, float, float, Any]] = []
-            for i in range(1, num_labels):
-                x, y = centroids[i]
-                # get the average hue value of the blob
-                mean_mask = (labels == i).astype(numpy.uint8)
-                mean_hue = cv2.mean(hue, mask=mean_mask)[0]
-                area = stats[i, cv2.CC_STAT_AREA]
-
-                # convert the mean hue value to BGR to color the circle around the detected blob
-                hsv_pixel = numpy.array([[[int(mean_hue), 255, 128]]], numpy.uint8)
-                bgr_pixel = cv2.cvtColor(hsv_pixel, cv2.COLOR_HSV2BGR)
-
-                debug_color = bgr_pixel[0][0].tolist()
-
-                for laser_name, laser_config in self.processing_config.laser_configs.items():
-                    if laser_config.hue_min <= mean_hue <= laser_config.hue_max:
-                        candidates.setdefault(laser_name, []).append((Vec(x, y), area, mean_hue, debug_color))
-                    else:
-                        unknowns.append((Vec(x, y), area, mean_hue, debug_color))
-                        # self.last_detections[laser_name] = Detection(
-                        #     camera_position=Vec(x, y),
-                        #     screen_position=self.calibration.transform(Vec(x, y)),
-                        #     time=datetime.datetime.now(),
-                        # )
-                        # cv2.putText(frame, f"{laser_name} {mean_hue}", (int(x), int(y)), cv2.FONT_HERSHEY_SIMPLEX, 1, debug_color, 2)
-                        # break
-                # else:
-                #     cv2.putText(frame, f"??? {mean_hue}", (int(x), int(y)), cv2.FONT_HERSHEY_SIMPLEX, 1, debug_color, 2)
-
-            for laser_name, laser_candidates in candidates.items():
-                camera_position, area, mean_hue, debug_color = max(laser_candidates, key=lambda x: x[1])
-                self.last_detections[laser_name] = Detection(
-                    camera_position=camera_position,
-                    screen_position=self.calibration.transform(camera_position),
-                    time=datetime.datetime.now(),
-                )
-                cv2.putText(frame, f"{laser_name} {int(mean_hue)}", (int(camera_position.x), int(camera_position.y)), cv2.FONT_HERSHEY_SIMPLEX, 1, debug_color, 2)
-
-            for camera_position, area, mean_hue, debug_color in unknowns:
-                cv2.putText(frame, f"??? {int(mean_hue)}", (int(camera_position.x), int(camera_position.y)), cv2.FONT_HERSHEY_SIMPLEX, 1, debug_color, 2)
-                # cv2.circle(frame, (int(x), int(y)), 10, debug_color, 2)
-                
-            
-            # cv2.imshow("Hue", hue)
-            # cv2.imshow("Saturation", saturation)
-            # cv2.imshow("Value", value)
-            # cv2.imshow("Value Thresholded", value_t)
-            cv2.imshow("RGB", frame)
-            self.handle_quit()
+            # 2. detect the lasers in it
+            result = self.process_frame(frame)
+            if result.detections and self.detection_channel is not None:
+                self.detection_channel.publish(frame.captured_at)
+
+            # 3. show what we found
+            if not self.headless:
+                self.draw_detections(frame.image, result)
+                # cv2.imshow("Hue", hue)
+                # cv2.imshow("Saturation", saturation)
+                # cv2.imshow("Value", value)
+                # cv2.imshow("Value Thresholded", value_t)
+                cv2.imshow("RGB", frame.image)
+                self.handle_quit()
+            elif self.debug_preview.wants(frame):
+                self.draw_detections(frame.image, result)
+                self.debug_preview.update(frame)
+
+    def stop(self) -> None:
+        """Stop grabbing frames, ``run`` returns, and stop serving the metrics of this tracker."""
+        self._stopped.set()
+        if self.frame_grabber is not None:
+            self.frame_grabber.stop()
+        remove_detection_ages(self)
 
 
 @dataclass
@@ -409,6 +807,7 @@ class DummyMultiLaserTracker:
         bottom_left=Vec(0, SCREEN_HEIGHT - 1),
         bottom_right=Vec(SCREEN_WIDTH - 1, SCREEN_HEIGHT - 1)
     )
+    detection_channel: DetectionChannel | None = None
 
     @property
     def time_since_last_detection(self) -> datetime.timedelta:
@@ -420,6 +819,8 @@ class DummyMultiLaserTracker:
             screen_position=coords,
             time=datetime.datetime.now(),
         )
+        if self.detection_channel is not None:
+            self.detection_channel.publish(None)
     
     def update_calibration(
         self,
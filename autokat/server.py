@@ -1,117 +1,182 @@
 from __future__ import annotations
 import asyncio
 from contextlib import asynccontextmanager
-import datetime
 import json
 import os
-from threading import Thread
-import traceback
 
 from watchfiles import awatch
-from autokat.game import Game
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Response, WebSocket
 from fastapi.templating import Jinja2Templates
 from fastapi import Request
 from fastapi.staticfiles import StaticFiles
 
-from autokat.multitrack import Detection, DummyMultiLaserTracker, MultiLaserTracker, ProcessingConfigEditor, Vec
+from autokat.arena import Arena
+from autokat.leaderboard import default_leaderboard
+from autokat.metrics import REGISTRY
+from autokat.multicamera import MultiCameraTracker, load_cameras
+from autokat.multitrack import DummyMultiLaserTracker, MultiLaserTracker, ProcessingConfig, ProcessingConfigEditor, headless_from_environment
+from autokat.tracker_process import TrackerProcess
 
 task_started = False
+# the game is simulated at a fixed rate...
 tick_time = 0.03
-laser_tracker = MultiLaserTracker()
-dummy_tracker = DummyMultiLaserTracker()
-if os.environ.get('POINTER', 'dummy') == 'dummy':
-    laser_tracker = dummy_tracker
-
-
-def _json_encoder_default(obj):
-    if isinstance(obj, datetime.timedelta):
-        return obj.total_seconds()
-    if hasattr(obj, "to_dict"):
-        return obj.to_dict()
-    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
-
-async def run_game():
-    start_time = datetime.datetime.now(tz=datetime.timezone.utc)
-    last_current_time = start_time
-    game = Game(laser_tracker=laser_tracker)
-    await asyncio.sleep(tick_time)
-    while True:
-        current_time = datetime.datetime.now(tz=datetime.timezone.utc)
-        dt = current_time - last_current_time
-        total_dt = current_time - start_time
-        for message in game.tick(total_dt=total_dt, dt=dt):
-            await manager.broadcast(json.dumps(message, default=_json_encoder_default))
-        current_time = datetime.datetime.now(tz=datetime.timezone.utc)
-        await asyncio.sleep(
-            tick_time
+max_substeps = 4
+# ...and broadcast to the clients at its own rate
+broadcast_time = 0.03
+# the clients get the whole state every this many broadcasts, deltas in between
+keyframe_every = 100
+# tick as soon as the tracker has fresh detections, instead of only on the fixed schedule
+wake_on_detection = os.environ.get('WAKE_ON_DETECTION') == '1'
+# the processing config in every file the trackers use, shared by all trackers of that file
+processing_configs: dict[str, ProcessingConfig] = {}
+# the trackers of every processing config file, that are told about the edits of its editor
+processing_config_trackers: dict[str, list] = {}
+
+
+def make_tracker(name: str, config: dict):
+    """The laser tracker of the arena ``name``, see ``ARENAS``."""
+    if os.environ.get('POINTER', 'dummy') == 'dummy':
+        return DummyMultiLaserTracker()
+    config = dict(config)
+    file_path = config.pop('processing_config_file_path', 'processing_config.json')
+    if file_path not in processing_configs:
+        processing_configs[file_path] = ProcessingConfig.load_from_file(file_path)
+    processing_config = processing_configs[file_path]
+    if 'cameras' in config:
+        # a JSON file with the cameras to fuse, see autokat.multicamera
+        tracker = MultiCameraTracker(load_cameras(config['cameras']), processing_config=processing_config, name=name)
+    elif os.environ.get('TRACKER_PROCESS', '1') == '1':
+        # the camera is processed in a separate process, see autokat.tracker_process
+        tracker = TrackerProcess(name=name, processing_config=processing_config, **config)
+    else:
+        tracker = MultiLaserTracker(name=name, processing_config=processing_config, **config)
+    processing_config_trackers.setdefault(file_path, []).append(tracker)
+    return tracker
+
+
+def processing_config_changed(trackers: list):
+    """Tell ``trackers`` about an edit of their processing config, the tracker processes have a copy of their own."""
+    def changed(processing_config: ProcessingConfig) -> None:
+        for tracker in trackers:
+            tracker.update_processing_config(processing_config)
+    return changed
+
+
+def load_arenas() -> dict[str, Arena]:
+    """The arenas in the JSON file ``ARENAS`` names, or a single one.
+
+    The file maps the name of every arena to the arguments of its tracker,
+    or to ``{"cameras": path}`` for a multi-camera tracker. Either can have a
+    ``processing_config_file_path``, ``processing_config.json`` by default.
+    """
+    if os.environ.get('ARENAS'):
+        with open(os.environ['ARENAS']) as f:
+            configs = json.load(f)
+        if not configs:
+            raise ValueError(f"No arenas configured in {os.environ['ARENAS']}")
+    else:
+        configs = {"default": {"cameras": os.environ['CAMERAS']} if os.environ.get('CAMERAS') else {}}
+    return {
+        name: Arena(
+            name,
+            make_tracker(name, config),
+            tick_time=tick_time,
+            max_substeps=max_substeps,
+            broadcast_time=broadcast_time,
+            keyframe_every=keyframe_every,
+            wake_on_detection=wake_on_detection,
         )
-        last_current_time = current_time
+        for name, config in configs.items()
+    }
+
+
+arenas = load_arenas()
+# the arena of /ws
+default_arena = next(iter(arenas.values()))
+
 
 async def autoreload_on_frontend_changes():
     async for change in awatch("autokat/web/static", "autokat/web/templates"):
         print(change)
-        await manager.broadcast('{"type": "reload"}')
+        for arena in arenas.values():
+            await arena.manager.broadcast('{"type": "reload"}')
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    thread = Thread(target=laser_tracker.run)
-    thread.start()
-    if hasattr(laser_tracker, "processing_config"):
-        ProcessingConfigEditor(laser_tracker.processing_config).run_thread()
-    asyncio.create_task(run_game())
+    # read the highscores now, not when the first game is over
+    leaderboard = default_leaderboard()
+    for arena in arenas.values():
+        arena.start()
+    if not headless_from_environment():
+        # one editor per file, for all the arenas that use it
+        for file_path, processing_config in processing_configs.items():
+            on_change = processing_config_changed(processing_config_trackers[file_path])
+            ProcessingConfigEditor(processing_config, file_path, on_change).run_thread()
     asyncio.create_task(autoreload_on_frontend_changes())
     yield
-    # thread.join()
+    for arena in arenas.values():
+        arena.stop()
+    # the last scores may still be on their way to disk
+    leaderboard.close()
 
 
 app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="autokat/web/static"), name="static")
 
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+templates = Jinja2Templates(directory="autokat/web/templates")
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+@app.get("/")
+async def get(request: Request):
+    return templates.TemplateResponse("index.html", {"request": request})
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                traceback.print_exc()
 
+def get_arena(name: str | None) -> Arena:
+    if name is None:
+        return default_arena
+    if name not in arenas:
+        raise HTTPException(status_code=404, detail=f"No arena {name}")
+    return arenas[name]
 
-manager = ConnectionManager()
 
-templates = Jinja2Templates(directory="autokat/web/templates")
+@app.get("/debug/preview.jpg")
+async def debug_preview(arena: str | None = None):
+    preview = getattr(get_arena(arena).laser_tracker, "debug_preview", None)
+    if preview is None:
+        raise HTTPException(status_code=404, detail="The tracker has no debug preview")
+    last_frame = preview.frame
+    preview.request()
+    # give the tracker a few frames to annotate a fresh preview
+    for _ in range(10):
+        if preview.frame is not last_frame:
+            break
+        await asyncio.sleep(tick_time)
+    jpeg = await asyncio.get_running_loop().run_in_executor(None, preview.jpeg)
+    if jpeg is None:
+        raise HTTPException(status_code=404, detail="No preview available yet")
+    return Response(content=jpeg, media_type="image/jpeg")
 
 
-@app.get("/")
-async def get(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+@app.get("/debug/timing")
+async def debug_timing(arena: str | None = None):
+    arena = get_arena(arena)
+    return {**arena.timestep.metrics.to_dict(), "detection_latency": arena.detection_latency.to_dict()}
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
-    try:
-        while True:
-            raw_data = await websocket.receive_text()
-            # print(raw_data)
-            data = json.loads(raw_data)
-            match data:
-                case {"type": "pointer", "position": [x, y], "color": color}:
-                    dummy_tracker.detect(color, Vec(x, y))
-                case {"type": "calibration", "corner": corner}:
-                    print("cal", corner)
-                    laser_tracker.update_calibration(**{corner: Vec(*laser_tracker.last_detections["red"].camera_position)})
-
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+    await default_arena.serve(websocket)
+
+
+@app.websocket("/ws/{arena_name}")
+async def arena_websocket_endpoint(websocket: WebSocket, arena_name: str):
+    if arena_name not in arenas:
+        await websocket.close(code=4404, reason=f"No arena {arena_name}")
+        return
+    await arenas[arena_name].serve(websocket)
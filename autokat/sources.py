@@ -0,0 +1,102 @@
+"""Where the tracker gets its frames from when it's not a live camera.
+
+Every frame source has the ``read`` and ``release`` methods of
+``cv2.VideoCapture``, so a ``FrameGrabber`` or a benchmark can read from a
+camera, a recorded video, a directory of images or a synthetic scene alike.
+Sources that know where the lasers really are, set ``ground_truth`` to the
+camera position of every laser in the frame they returned last.
+"""
+from __future__ import annotations
+import glob
+import os
+import time
+from typing import Protocol, Sequence
+
+import cv2
+import numpy
+
+from autokat.synthetic import LaserFrameGenerator, SceneConfig
+from autokat.vec import Vec
+
+
+class FrameSource(Protocol):
+    def read(self) -> tuple[bool, numpy.ndarray | None]:
+        ...
+
+    def release(self) -> None:
+        ...
+
+
+class ImageSequenceSource:
+    """Reads the images in ``paths`` one after another, optionally starting over at the end."""
+
+    def __init__(self, paths: Sequence[str], loop: bool = False):
+        if not paths:
+            raise ValueError("No images in the sequence")
+        self.paths = list(paths)
+        self.loop = loop
+        self._index = 0
+
+    @classmethod
+    def from_pattern(cls, pattern: str, loop: bool = False) -> ImageSequenceSource:
+        """All images in a directory, or the files matching a glob pattern, sorted by name."""
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        return cls(sorted(path for path in glob.glob(pattern) if os.path.isfile(path)), loop=loop)
+
+    def read(self) -> tuple[bool, numpy.ndarray | None]:
+        if self._index == len(self.paths):
+            if not self.loop:
+                return False, None
+            self._index = 0
+        image = cv2.imread(self.paths[self._index])
+        self._index += 1
+        return image is not None, image
+
+    def release(self) -> None:
+        pass
+
+
+class SyntheticLaserSource:
+    """Renders ``frames`` frames (endless when None) of a synthetic scene, see ``autokat.synthetic``.
+
+    The lasers move from frame to frame at the ``fps`` of the scene, however
+    fast the frames are read. A ``realtime`` scene moves with the clock
+    instead, so every camera that renders it sees the lasers at the same place.
+    """
+
+    def __init__(self, width: int = 800, height: int = 600, frames: int | None = None, realtime: bool = False, **scene):
+        self.generator = LaserFrameGenerator(SceneConfig(width=width, height=height, **scene))
+        self.frames = frames
+        self.realtime = realtime
+        self.index = 0
+        self.ground_truth: dict[str, Vec] = {}
+
+    def read(self) -> tuple[bool, numpy.ndarray | None]:
+        if self.frames is not None and self.index >= self.frames:
+            return False, None
+        image, self.ground_truth = self.generator.render(self.index, time.time() if self.realtime else None)
+        self.index += 1
+        return True, image
+
+    def release(self) -> None:
+        pass
+
+
+def open_frame_source(spec: str, width: int = 800, height: int = 600, realtime: bool = False) -> FrameSource:
+    """Open a frame source from a command line style description.
+
+    ``spec`` is a camera device number, ``synthetic``, a directory or glob
+    pattern of images, or the path of a video file. A ``realtime`` synthetic
+    scene moves with the clock, like one a live camera films.
+    """
+    if spec.isdigit():
+        return cv2.VideoCapture(int(spec))
+    if spec == "synthetic":
+        return SyntheticLaserSource(width=width, height=height, realtime=realtime)
+    if os.path.isdir(spec) or glob.has_magic(spec):
+        return ImageSequenceSource.from_pattern(spec)
+    capture = cv2.VideoCapture(spec)
+    if not capture.isOpened():
+        raise ValueError(f"Can't open video file {spec}")
+    return capture
@@ -0,0 +1,154 @@
+"""Renders camera frames of laser dots on a projection, with the true laser positions.
+
+Only the pixels around the dots are computed per frame. The background,
+with the projected image and the sensor noise, is prepared once in a few
+variants that are cycled through, so rendering stays cheap even at 4K and
+the tracker can be stressed with many frames.
+"""
+from __future__ import annotations
+import dataclasses
+import math
+
+import cv2
+import numpy
+
+from autokat.vec import Vec
+
+# hues of the default laser configs, in OpenCV's 0-179 range
+DEFAULT_LASER_HUES = {"red": 170, "green": 72}
+
+
+def laser_color(hue: int, saturation: int = 255) -> tuple[int, int, int]:
+    """The BGR color of a bright laser dot of ``hue``."""
+    hsv_pixel = numpy.array([[[hue, saturation, 255]]], numpy.uint8)
+    return tuple(int(c) for c in cv2.cvtColor(hsv_pixel, cv2.COLOR_HSV2BGR)[0, 0])
+
+
+@dataclasses.dataclass
+class SceneConfig:
+    width: int = 800
+    height: int = 600
+    hues: dict[str, int] = dataclasses.field(default_factory=lambda: dict(DEFAULT_LASER_HUES))
+    radius: float = 4.0
+    # a faint glow around the dots, as a gaussian of this standard deviation
+    bloom_radius: float = 0.0
+    bloom_strength: float = 0.3
+    # standard deviation of the sensor noise, in pixel values
+    noise: float = 0.0
+    # the dots are smeared over their path during the exposure
+    exposure: float = 0.0
+    # small bright reflections at random positions, in random faint colors
+    distractors: int = 0
+    distractor_radius: float = 1.5
+    distractor_saturation: int = 80
+    # path of the image that is projected on the play field, dimmed to background_level
+    background: str | None = None
+    background_level: float = 0.25
+    # the number of noisy backgrounds that are rendered upfront and cycled
+    noise_frames: int = 8
+    fps: float = 30
+    seed: int = 0
+
+
+class LaserFrameGenerator:
+    """Renders the frames of a ``SceneConfig``, the lasers move along Lissajous curves."""
+
+    def __init__(self, config: SceneConfig):
+        self.config = config
+        self.colors = {laser_name: numpy.array(laser_color(hue), numpy.float32) for laser_name, hue in config.hues.items()}
+        self._rng = numpy.random.default_rng(config.seed)
+        self._backgrounds = self._render_backgrounds()
+
+    def _render_backgrounds(self) -> list[numpy.ndarray]:
+        config = self.config
+        background = numpy.zeros((config.height, config.width, 3), numpy.float32)
+        if config.background is not None:
+            image = cv2.imread(config.background)
+            if image is None:
+                raise ValueError(f"Can't read background image {config.background}")
+            background[:] = cv2.resize(image, (config.width, config.height)) * config.background_level
+        if not config.noise:
+            return [background.astype(numpy.uint8)]
+        return [
+            numpy.clip(background + self._rng.normal(0, config.noise, background.shape), 0, 255).astype(numpy.uint8)
+            for _ in range(config.noise_frames)
+        ]
+
+    def position(self, laser_number: int, t: float) -> Vec:
+        """Where laser ``laser_number`` is at ``t`` seconds."""
+        config = self.config
+        margin = 4 * config.radius + 3 * config.bloom_radius
+        half_width, half_height = config.width / 2 - margin, config.height / 2 - margin
+        return Vec(
+            config.width / 2 + half_width * math.sin((0.3 + 0.1 * laser_number) * t + 2 * laser_number),
+            config.height / 2 + half_height * math.sin((0.4 + 0.07 * laser_number) * t + laser_number),
+        )
+
+    def _draw_dot(self, image: numpy.ndarray, path: list[Vec], radius: float, color: numpy.ndarray, bloom_radius: float = 0.0) -> None:
+        """Add a dot that moves along ``path`` during the exposure, only touching the pixels around it."""
+        reach = radius + 3 * bloom_radius + 1
+        xs = [p.x for p in path]
+        ys = [p.y for p in path]
+        x0, x1 = max(int(min(xs) - reach), 0), min(int(max(xs) + reach) + 2, image.shape[1])
+        y0, y1 = max(int(min(ys) - reach), 0), min(int(max(ys) + reach) + 2, image.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        # pixel centers are at integer coordinates, like the centroids of the tracker
+        yy, xx = numpy.mgrid[y0:y1, x0:x1].astype(numpy.float32)
+        intensity = numpy.zeros_like(xx)
+        for p in path:
+            distance = numpy.sqrt((xx - p.x) ** 2 + (yy - p.y) ** 2)
+            # anti aliased disc
+            intensity += numpy.clip(radius + 0.5 - distance, 0, 1)
+            if bloom_radius:
+                intensity += self.config.bloom_strength * numpy.exp(-(distance ** 2) / (2 * bloom_radius ** 2))
+        intensity /= len(path)
+        window = image[y0:y1, x0:x1]
+        window[:] = numpy.clip(window + intensity[..., None] * color, 0, 255)
+
+    def render(self, index: int, t: float | None = None) -> tuple[numpy.ndarray, dict[str, Vec]]:
+        """Frame ``index`` and the position of every laser halfway through its exposure.
+
+        The frame shows the scene at ``t`` seconds, ``index / fps`` by default.
+        """
+        config = self.config
+        image = self._backgrounds[index % len(self._backgrounds)].copy()
+        if t is None:
+            t = index / config.fps
+        ground_truth = {}
+        for laser_number, (laser_name, color) in enumerate(self.colors.items()):
+            start = self.position(laser_number, t - config.exposure / 2)
+            end = self.position(laser_number, t + config.exposure / 2)
+            # enough samples that the smear looks continuous
+            samples = max(math.ceil(math.dist(start, end) / (config.radius / 2)), 1)
+            path = [start + (end - start) * ((i + 0.5) / samples) for i in range(samples)] if samples > 1 else [self.position(laser_number, t)]
+            self._draw_dot(image, path, config.radius, color, config.bloom_radius)
+            ground_truth[laser_name] = self.position(laser_number, t)
+        if config.distractors:
+            self._draw_distractors(image)
+        return image, ground_truth
+
+    def _draw_distractors(self, image: numpy.ndarray) -> None:
+        """Add all distractors at once, they are small enough to all use a window of the same size."""
+        config = self.config
+        count = config.distractors
+        centers = self._rng.uniform((0, 0), (config.width, config.height), (count, 2)).astype(numpy.float32)
+        hsv = numpy.empty((1, count, 3), numpy.uint8)
+        hsv[0, :, 0] = self._rng.integers(0, 180, count)
+        hsv[0, :, 1] = self._rng.integers(0, config.distractor_saturation + 1, count)
+        hsv[0, :, 2] = 255
+        colors = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0].astype(numpy.float32)
+
+        reach = math.ceil(config.distractor_radius + 1)
+        offsets = numpy.arange(-reach, reach + 1)
+        # (count, size, size) pixel coordinates around every distractor
+        xs = numpy.floor(centers[:, 0])[:, None, None].astype(numpy.intp) + offsets[None, None, :]
+        ys = numpy.floor(centers[:, 1])[:, None, None].astype(numpy.intp) + offsets[None, :, None]
+        distance = numpy.sqrt((xs - centers[:, 0, None, None]) ** 2 + (ys - centers[:, 1, None, None]) ** 2)
+        intensity = numpy.clip(config.distractor_radius + 0.5 - distance, 0, 1)
+        inside = (xs >= 0) & (xs < config.width) & (ys >= 0) & (ys < config.height)
+        intensity[~inside] = 0
+        xs, ys = numpy.broadcast_arrays(numpy.clip(xs, 0, config.width - 1), numpy.clip(ys, 0, config.height - 1))
+        # where distractors overlap one of them wins, they're only reflections
+        pixels = image[ys, xs] + intensity[..., None] * colors[:, None, None, :]
+        image[ys, xs] = numpy.clip(pixels, 0, 255)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import dataclasses
+import datetime
+import time
+from typing import Callable
+
+
+@dataclasses.dataclass
+class TimestepMetrics:
+    steps: int = 0
+    # loop iterations that had to run more than one step to catch up
+    overruns: int = 0
+    # steps that were skipped because the loop fell too far behind
+    dropped_steps: int = 0
+    # how late the loop woke up for a step that was due, in seconds
+    last_jitter: float = 0.0
+    max_jitter: float = 0.0
+    total_jitter: float = 0.0
+    # loop iterations that ran at least one step
+    wakeups: int = 0
+    # loop iterations that ran a step before it was due, see FixedTimestep.advance
+    early_wakeups: int = 0
+
+    @property
+    def mean_jitter(self) -> float:
+        return self.total_jitter / self.wakeups if self.wakeups else 0.0
+
+    def to_dict(self) -> dict:
+        return {**dataclasses.asdict(self), "mean_jitter": self.mean_jitter}
+
+
+class FixedTimestep:
+    """Schedules simulation steps at an exact rate, whatever the loop around it does.
+
+    Elapsed wall clock time is collected in an accumulator and handed out in
+    steps of exactly ``step``, so every tick of the simulation sees the same
+    ``dt``. When the loop falls behind it catches up with at most
+    ``max_substeps`` steps at once and drops the rest, so a long stall slows
+    the game down for a moment instead of making it spiral.
+    """
+
+    def __init__(
+        self,
+        step: datetime.timedelta,
+        max_substeps: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.step = step
+        self.max_substeps = max_substeps
+        self._clock = clock
+        self._step_seconds = step.total_seconds()
+        self._last_time = clock()
+        self._accumulator = 0.0
+        self.simulation_time = datetime.timedelta(0)
+        self.metrics = TimestepMetrics()
+
+    def start(self) -> None:
+        """Start counting from now, forgetting the time that passed since construction."""
+        self._last_time = self._clock()
+        self._accumulator = 0.0
+
+    def advance(self, lead: float = 0.0) -> int:
+        """Returns how many steps are due now. Call ``next_step`` for each of them.
+
+        A step that is due within ``lead`` seconds counts as due now, the
+        steps after it are then due that much later. ``lead`` is at most one
+        step, so the simulation never runs more than a step ahead.
+        """
+        now = self._clock()
+        self._accumulator += now - self._last_time
+        self._last_time = now
+
+        steps = int((self._accumulator + min(lead, self._step_seconds)) // self._step_seconds)
+        if steps and self._accumulator < self._step_seconds:
+            self.metrics.early_wakeups += 1
+        if steps:
+            # a step that's taken early isn't late at all
+            jitter = max(self._accumulator - self._step_seconds, 0.0)
+            self.metrics.last_jitter = jitter
+            self.metrics.max_jitter = max(self.metrics.max_jitter, jitter)
+            self.metrics.total_jitter += jitter
+            self.metrics.wakeups += 1
+
+        if steps > 1:
+            self.metrics.overruns += 1
+        if steps > self.max_substeps:
+            self.metrics.dropped_steps += steps - self.max_substeps
+            self._accumulator -= (steps - self.max_substeps) * self._step_seconds
+            steps = self.max_substeps
+        return steps
+
+    def next_step(self) -> datetime.timedelta:
+        """Consume one step, returns the simulation time at the end of it."""
+        self._accumulator -= self._step_seconds
+        self.simulation_time += self.step
+        self.metrics.steps += 1
+        return self.simulation_time
+
+    def time_until_next_step(self) -> float:
+        """Seconds to sleep until the next step is due."""
+        return max(self._step_seconds - self._accumulator - (self._clock() - self._last_time), 0.0)
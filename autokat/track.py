@@ -8,6 +8,8 @@ from typing_extensions import Self
 import cv2
 import numpy
 
+from autokat.multitrack import homography, perspective_transform, perspective_transform_many
+
 SCREEN_HEIGHT = 768
 SCREEN_WIDTH = 1024
 
@@ -32,22 +34,18 @@ class Calibration(NamedTuple):
     bottom_left: Coords
     bottom_right: Coords
 
+    @property
+    def homography(self) -> numpy.ndarray:
+        """The 3x3 perspective transform from camera to screen coordinates."""
+        return numpy.array(homography(self)).reshape(3, 3)
+
     def transform(self, coords: Coords) -> Coords:
-        tl, tr, bl, br = self
-        y_offset_top = (tl.y + tr.y) / 2
-        delta_y =  (bl.y + br.y) / 2 - y_offset_top
-        y_scale = (SCREEN_HEIGHT - 1) / delta_y
-        x, y = coords
-        ty = (y - y_offset_top) * y_scale
-        
-        t = ty / (SCREEN_HEIGHT - 1)
-        x_offset_left = tl[0] * (1 - t) + bl[0] * t
-        x_offset_right = tr[0] * (1 - t) + br[0] * t
-        x_width = x_offset_right - x_offset_left
-        x_scale = x_width / (SCREEN_WIDTH - 1)
-        tx = (x - x_offset_left) / x_scale
-        return Coords(tx,ty)
-    
+        return Coords(*perspective_transform(self, *coords))
+
+    def transform_many(self, points: numpy.ndarray) -> numpy.ndarray:
+        """Transform an (N, 2) array of camera coordinates to screen coordinates at once."""
+        return perspective_transform_many(self, points)
+
     @classmethod
     def from_dict(cls, data: dict[str, list[float]]) -> Self:
         return cls(**{k: Coords(*v) for k, v in data.items()})
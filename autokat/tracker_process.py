@@ -0,0 +1,400 @@
+"""Runs the laser tracker in its own process.
+
+The OpenCV loop then doesn't compete with the game loop for the GIL. The
+tracker process publishes the latest detections in shared memory, where the
+game reads them without any system call. ``TrackerProcess`` restarts the
+tracker process when it dies or stops delivering frames.
+"""
+from __future__ import annotations
+import datetime
+import math
+import multiprocessing
+import multiprocessing.connection
+import os
+import queue
+import sys
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy
+
+from autokat.constants import SCREEN_HEIGHT, SCREEN_WIDTH
+from autokat.detection_channel import DetectionChannel, latest_capture
+from autokat.metrics import REGISTRY, Snapshot
+from autokat.multitrack import Calibration, Detection, MultiLaserTracker, ProcessingConfig, Vec, remove_detection_ages, serve_detection_ages
+
+# camera position, screen position, velocity, time, captured at and confidence
+_DETECTION_SIZE = 9
+# how often the tracker process sends its metrics, in seconds
+METRICS_INTERVAL = 1.0
+# a write takes microseconds, a reader that still sees one after this many tries found a dead writer
+_READ_ATTEMPTS = 1000
+
+TRACKER_RESTARTS = REGISTRY.counter("autokat_tracker_restarts_total", "Times the tracker process was restarted", ["tracker"])
+
+
+class DetectionSlots:
+    """The latest detection of every laser in shared memory, guarded by a seqlock.
+
+    There is a single writer, the tracker process. It makes the sequence
+    number odd while it writes and even again when it's done, a reader copies
+    the values and retries when the sequence number was odd or changed while
+    copying. Neither side ever waits for the other.
+
+    A writer that's killed halfway leaves the sequence number odd. The next
+    writer starts from the even number after it, ``reset`` makes it even
+    before then, and a reader gives up after ``_READ_ATTEMPTS`` tries and
+    hands out its last good read.
+    """
+
+    def __init__(self, shared_memory: SharedMemory, laser_names: list[str], owner: bool):
+        self.shared_memory = shared_memory
+        self.laser_names = laser_names
+        self._owner = owner
+        self._sequence = numpy.ndarray((1,), numpy.uint64, buffer=shared_memory.buf)
+        # the heartbeat, then the detections
+        self._values = numpy.ndarray((1 + _DETECTION_SIZE * len(laser_names),), numpy.float64, buffer=shared_memory.buf, offset=8)
+        # written once per frame, so it's not allocated every time
+        self._write_values = numpy.empty(_DETECTION_SIZE * len(laser_names))
+        self._read_sequence: int | None = None
+        self._read_detections: dict[str, Detection] = {}
+        self._closed = False
+
+    @classmethod
+    def create(cls, laser_names: list[str]) -> DetectionSlots:
+        shared_memory = SharedMemory(create=True, size=8 * (2 + _DETECTION_SIZE * len(laser_names)))
+        return cls(shared_memory, laser_names, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, laser_names: list[str]) -> DetectionSlots:
+        return cls(SharedMemory(name=name), laser_names, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shared_memory.name
+
+    @property
+    def heartbeat(self) -> float:
+        """The time (``time.time``) the writer last processed a frame."""
+        return float(self._values[0])
+
+    def beat(self) -> None:
+        self._values[0] = time.time()
+
+    def write(self, detections: dict[str, Detection]) -> None:
+        values = self._write_values
+        for i, laser_name in enumerate(self.laser_names):
+            detection = detections[laser_name]
+            values[i * _DETECTION_SIZE:(i + 1) * _DETECTION_SIZE] = (
+                *detection.camera_position,
+                *detection.screen_position,
+                *detection.velocity,
+                detection.time.timestamp(),
+                detection.captured_at.timestamp() if detection.captured_at is not None else math.nan,
+                detection.confidence,
+            )
+        # even, if a killed writer left it odd
+        sequence = (int(self._sequence[0]) + 1) & ~1
+        self._sequence[0] = sequence + 1
+        self._values[1:] = values
+        self._sequence[0] = sequence + 2
+
+    def reset(self) -> None:
+        """Make the sequence number even again, after the writer died. Only while there is no writer."""
+        sequence = int(self._sequence[0])
+        if sequence & 1:
+            self._sequence[0] = sequence + 1
+
+    def read(self) -> dict[str, Detection]:
+        for _ in range(_READ_ATTEMPTS):
+            sequence = int(self._sequence[0])
+            if sequence == self._read_sequence:
+                return self._read_detections
+            if sequence & 1:
+                # the writer is halfway, it takes microseconds
+                continue
+            values = self._values[1:].tolist()
+            if int(self._sequence[0]) == sequence:
+                break
+        else:
+            return self._read_detections
+        detections = {}
+        for i, laser_name in enumerate(self.laser_names):
+            camera_x, camera_y, screen_x, screen_y, velocity_x, velocity_y, detected_at, captured_at, confidence = values[i * _DETECTION_SIZE:(i + 1) * _DETECTION_SIZE]
+            detections[laser_name] = Detection(
+                camera_position=Vec(camera_x, camera_y),
+                screen_position=Vec(screen_x, screen_y),
+                time=datetime.datetime.fromtimestamp(detected_at),
+                captured_at=None if math.isnan(captured_at) else datetime.datetime.fromtimestamp(captured_at),
+                velocity=Vec(velocity_x, velocity_y),
+                confidence=confidence,
+            )
+        self._read_sequence, self._read_detections = sequence, detections
+        return detections
+
+    def close(self) -> None:
+        """Release the shared memory, closing again does nothing."""
+        if self._closed:
+            return
+        self._closed = True
+        # the shared memory can't be closed while arrays point into it
+        del self._sequence, self._values
+        self.shared_memory.close()
+        if self._owner:
+            self.shared_memory.unlink()
+
+
+class RemoteDebugPreview:
+    """The debug preview of a tracker in another process, with the interface of ``DebugPreview``."""
+
+    def __init__(self, commands: multiprocessing.Queue, previews: multiprocessing.Queue):
+        self._commands = commands
+        self._previews = previews
+        self._jpeg: bytes | None = None
+
+    @property
+    def frame(self) -> bytes | None:
+        try:
+            while True:
+                self._jpeg = self._previews.get_nowait()
+        except queue.Empty:
+            pass
+        return self._jpeg
+
+    def request(self) -> None:
+        self._commands.put(("preview",))
+
+    def jpeg(self) -> bytes | None:
+        return self.frame
+
+
+def _handle_command(tracker: MultiLaserTracker, command: tuple) -> None:
+    match command:
+        case ("calibration", corners):
+            tracker.update_calibration(**{corner: Vec(*position) for corner, position in corners.items()})
+        case ("config", processing_config):
+            tracker.update_processing_config(processing_config)
+        case ("preview",):
+            tracker.debug_preview.request()
+
+
+def _notify(detected: multiprocessing.connection.Connection) -> None:
+    """Wake the parent process, with a single byte that is written whole even when we're killed."""
+    try:
+        os.write(detected.fileno(), b"\0")
+    except BlockingIOError:
+        # the pipe is full of wake ups the parent hasn't read yet
+        pass
+
+
+def run_tracker(
+    slots_name: str,
+    laser_names: list[str],
+    commands: multiprocessing.Queue,
+    previews: multiprocessing.Queue,
+    tracker_kwargs: dict,
+    detected: multiprocessing.connection.Connection,
+    metrics: multiprocessing.Queue,
+) -> None:
+    """The main function of the tracker process."""
+    slots = DetectionSlots.attach(slots_name, laser_names)
+    os.set_blocking(detected.fileno(), False)
+    # previews are only made when the server asks for one
+    tracker = MultiLaserTracker(headless=True, preview_every=0, **tracker_kwargs)
+    frame_buffer = tracker.start_capture()
+    metrics_sent_at = time.monotonic()
+    while True:
+        try:
+            while True:
+                _handle_command(tracker, commands.get_nowait())
+        except queue.Empty:
+            pass
+        if time.monotonic() - metrics_sent_at >= METRICS_INTERVAL:
+            metrics_sent_at = time.monotonic()
+            try:
+                metrics.put_nowait(REGISTRY.snapshot())
+            except queue.Full:
+                # the server hasn't picked up the last ones yet
+                pass
+
+        frame = frame_buffer.get()
+        if frame is None:
+            sys.stderr.write("Could not read camera frame. Quitting\n")
+            sys.exit(1)
+        result = tracker.process_frame(frame)
+        if result.detections:
+            slots.write(tracker.last_detections)
+            _notify(detected)
+        slots.beat()
+
+        if tracker.debug_preview.wants(frame):
+            tracker.draw_detections(frame.image, result)
+            tracker.debug_preview.update(frame)
+            try:
+                previews.put_nowait(tracker.debug_preview.jpeg())
+            except queue.Full:
+                pass
+
+
+class TrackerProcess:
+    """Runs a ``MultiLaserTracker`` in a child process and reads its detections.
+
+    Can be used instead of the tracker itself: ``run`` supervises the child
+    process, restarting it when it exits or when it hasn't processed a frame
+    for ``stall_timeout`` seconds.
+    """
+
+    def __init__(
+        self,
+        cam_width=800,
+        cam_height=600,
+        processing_config: ProcessingConfig | None = None,
+        calibration_file_path: str = 'calibration.json',
+        source: str | None = None,
+        restart_delay: float = 1.0,
+        stall_timeout: float = 5.0,
+        target=run_tracker,
+        name: str = "default",
+    ):
+        if processing_config is None:
+            processing_config = ProcessingConfig.load_from_file('processing_config.json')
+        self.laser_names = list(processing_config.laser_configs)
+        self.calibration = Calibration.load_from_file(calibration_file_path)
+        self.restart_delay = restart_delay
+        self.stall_timeout = stall_timeout
+        self.restarts = 0
+        self.name = name
+        self.process: multiprocessing.Process | None = None
+        self._target = target
+        self._tracker_kwargs = dict(
+            cam_width=cam_width,
+            cam_height=cam_height,
+            processing_config=processing_config,
+            calibration_file_path=calibration_file_path,
+            source=source,
+            name=name,
+        )
+        # a fresh interpreter, forking the threads of the server isn't safe
+        self._context = multiprocessing.get_context("spawn")
+        self._commands = self._context.Queue()
+        self._previews = self._context.Queue(maxsize=1)
+        self._metrics = self._context.Queue(maxsize=1)
+        # the latest metrics of the tracker process, added to those of this process
+        self.child_metrics: Snapshot = {}
+        # the tracker process writes a byte after every write of the slots. Not an
+        # Event, whose lock a killed tracker process could leave locked.
+        self._detected, self._detected_writer = self._context.Pipe(duplex=False)
+        os.set_blocking(self._detected.fileno(), False)
+        self.detection_channel: DetectionChannel | None = None
+        self._stopped = threading.Event()
+        self.debug_preview = RemoteDebugPreview(self._commands, self._previews)
+
+        self.slots = DetectionSlots.create(self.laser_names)
+        now = datetime.datetime.now()
+        self.slots.write({
+            laser_name: Detection(
+                camera_position=Vec(cam_width / 2, cam_height / 2),
+                screen_position=Vec(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2),
+                time=now,
+            )
+            for laser_name in self.laser_names
+        })
+
+    @property
+    def last_detections(self) -> dict[str, Detection]:
+        return self.slots.read()
+
+    @property
+    def time_since_last_detection(self) -> datetime.timedelta:
+        return max(d.time for d in self.last_detections.values()) - datetime.datetime.now()
+
+    def update_calibration(
+        self,
+        **kwargs: Vec,
+    ) -> None:
+        self.calibration = self.calibration._replace(**kwargs)
+        self._commands.put(("calibration", {corner: tuple(position) for corner, position in kwargs.items()}))
+
+    def update_processing_config(self, processing_config: ProcessingConfig) -> None:
+        """Use ``processing_config`` from now on, also when the tracker process is restarted."""
+        self._tracker_kwargs["processing_config"] = processing_config
+        self._commands.put(("config", processing_config))
+
+    def _start_process(self) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=self._target,
+            args=(self.slots.name, self.laser_names, self._commands, self._previews, self._tracker_kwargs, self._detected_writer, self._metrics),
+            daemon=True,
+        )
+        # the previous process may have been killed in the middle of a write
+        self.slots.reset()
+        # give the new process until the stall timeout to deliver its first frame
+        self.slots.beat()
+        process.start()
+        return process
+
+    def _collect_child_metrics(self) -> Snapshot:
+        return self.child_metrics
+
+    def _forward_detections(self, done: threading.Event) -> None:
+        """Publish every write of the tracker process to ``detection_channel``, and pick up its metrics."""
+        while not done.is_set():
+            try:
+                while True:
+                    self.child_metrics = self._metrics.get_nowait()
+            except queue.Empty:
+                pass
+            if self._detected.poll(0.1):
+                try:
+                    # however many writes there were, they're published once
+                    os.read(self._detected.fileno(), 4096)
+                except BlockingIOError:
+                    pass
+                if self.detection_channel is not None:
+                    self.detection_channel.publish(latest_capture(self.slots.read()))
+
+    def run(self) -> None:
+        # the ages the tracker process reports are up to a metrics interval old, these are read from the slots
+        serve_detection_ages(self)
+        REGISTRY.add_collector(self._collect_child_metrics)
+        restarts = TRACKER_RESTARTS.labels(self.name)
+        forwarding_done = threading.Event()
+        forwarder = threading.Thread(target=self._forward_detections, args=(forwarding_done,), daemon=True)
+        forwarder.start()
+        try:
+            while not self._stopped.is_set():
+                self.process = self._start_process()
+                while True:
+                    self.process.join(self.stall_timeout / 2)
+                    if self.process.exitcode is not None or self._stopped.is_set():
+                        break
+                    if time.time() - self.slots.heartbeat > self.stall_timeout:
+                        sys.stderr.write(f"Tracker process didn't process a frame in {self.stall_timeout}s, killing it\n")
+                        self.process.kill()
+                        self.process.join()
+                        break
+                if self._stopped.is_set():
+                    break
+                self.restarts += 1
+                restarts.inc()
+                sys.stderr.write(f"Tracker process exited with code {self.process.exitcode}, restarting in {self.restart_delay}s\n")
+                self._stopped.wait(self.restart_delay)
+        finally:
+            if self.process is not None and self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+            forwarding_done.set()
+            forwarder.join()
+            REGISTRY.remove_collector(self._collect_child_metrics)
+            remove_detection_ages(self)
+            self.slots.close()
+
+    def stop(self) -> None:
+        """Stop the tracker process, ``run`` returns when it's gone."""
+        if self.process is None:
+            # never ran
+            self.slots.close()
+        self._stopped.set()
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
@@ -17,7 +17,16 @@ type PointerCommand = {
   position: [number, number];
   color: string;
 };
-export type GameCommand = CalibrationCommand | PointerCommand;
+
+type ResyncCommand = {
+  type: "resync";
+};
+
+type EncodingCommand = {
+  type: "encoding";
+  binary: boolean;
+};
+export type GameCommand = CalibrationCommand | PointerCommand | ResyncCommand | EncodingCommand;
 
 export type Polygon = [number, number][];
 
@@ -87,6 +96,92 @@ type Game = {
   time: number;
 }
 
+type Path = string[];
+type DeltaOperation = ["set", Path, unknown] | ["del", Path];
+
+// returns a copy of `value` with the operation applied, only the objects along the path are copied
+const applyOperation = (value: any, path: Path, operation: DeltaOperation): any => {
+  const [key, ...rest] = path;
+  const copy = { ...value };
+  if (rest.length > 0) {
+    copy[key] = applyOperation(value[key], rest, operation);
+  } else if (operation[0] === "set") {
+    copy[key] = operation[2];
+  } else {
+    delete copy[key];
+  }
+  return copy;
+};
+
+export const applyDelta = (game: Game, ops: DeltaOperation[]): Game =>
+  ops.reduce((current, operation) => applyOperation(current, operation[1], operation), game);
+
+type Point = [number, number];
+
+// the fields that change every tick, sent as binary frames to clients that ask for them
+type HotFields = {
+  version: number;
+  ball_position: Point;
+  ball_velocity: Point;
+  red_light: Point;
+  green_light: Point;
+  red_position: Point;
+  green_position: Point;
+};
+
+// must match HOT_FIELDS in autokat/encoding.py: a uint32 and 12 float32s, little endian
+export const parseHotFields = (buffer: ArrayBuffer): HotFields => {
+  const view = new DataView(buffer);
+  const point = (index: number): Point => [
+    view.getFloat32(4 + index * 8, true),
+    view.getFloat32(8 + index * 8, true),
+  ];
+  return {
+    version: view.getUint32(0, true),
+    ball_position: point(0),
+    ball_velocity: point(1),
+    red_light: point(2),
+    green_light: point(3),
+    red_position: point(4),
+    green_position: point(5),
+  };
+};
+
+const withHotPlayingFields = (playing: PlayingState, hot: HotFields): PlayingState => ({
+  ...playing,
+  red_light: hot.red_light,
+  green_light: hot.green_light,
+  ball: playing.ball && {
+    ...playing.ball,
+    position: hot.ball_position,
+    velocity: hot.ball_velocity,
+  },
+});
+
+export const withHotFields = (game: Game, hot: HotFields | null): Game => {
+  if (hot === null) {
+    return game;
+  }
+  let state = game.state;
+  switch (state.name) {
+    case "playing":
+      state = withHotPlayingFields(state, hot);
+      break;
+    case "countdown":
+    case "intro":
+      state = { ...state, playing_state: withHotPlayingFields(state.playing_state, hot) };
+      break;
+  }
+  return {
+    ...game,
+    state,
+    debug: {
+      red_position: hot.red_position,
+      green_position: hot.green_position,
+    },
+  };
+};
+
 export const useGame = () => {
   const [gameState, setGameState] = useState<Game>({
     state: {
@@ -126,14 +221,74 @@ export const useGame = () => {
     [ws]
   );
   useEffect(() => {
+    // the version of the state we have, null until the first keyframe
+    let version: number | null = null;
+    let game: Game | null = null;
+    let resyncRequested = false;
+    // opt in with ?binary in the url, e.g. on the kiosk that drives the projector
+    const params = new URLSearchParams(document.location.search);
+    const binary = params.has("binary");
+    // the wall to show, e.g. ?arena=hall, the server's first arena when not given
+    const arena = params.get("arena");
+    let hot: HotFields | null = null;
+    const render = () => {
+      if (game !== null) {
+        setGameState(withHotFields(game, hot));
+      }
+    };
     function connect() {
-      ws.current = new WebSocket(`ws://${document.location.host}/ws`);
+      version = null;
+      resyncRequested = false;
+      ws.current = new WebSocket(
+        `ws://${document.location.host}/ws${arena === null ? "" : `/${encodeURIComponent(arena)}`}`
+      );
+      ws.current.binaryType = "arraybuffer";
+      ws.current.addEventListener("open", () => {
+        if (binary) {
+          ws.current?.send(JSON.stringify({ type: "encoding", binary: true }));
+        }
+      });
       ws.current.addEventListener("message", (message) => {
+        if (message.data instanceof ArrayBuffer) {
+          hot = parseHotFields(message.data);
+          render();
+          return;
+        }
         const parsedMessage = JSON.parse(message.data);
         switch (parsedMessage.type) {
           case "state":
             setGameState(parsedMessage);
             break;
+          case "keyframe":
+            version = parsedMessage.version;
+            game = parsedMessage.message;
+            resyncRequested = false;
+            if (!binary || hot !== null) {
+              // a binary keyframe has no ball or lights until the first hot fields arrive
+              render();
+            }
+            break;
+          case "delta":
+            if (version === null || game === null || parsedMessage.version <= version) {
+              // waiting for a keyframe, or a delta from before the last keyframe
+              break;
+            }
+            if (parsedMessage.base !== version) {
+              // missed a delta, wait for a keyframe
+              version = null;
+              if (!resyncRequested) {
+                resyncRequested = true;
+                ws.current?.send(JSON.stringify({ type: "resync" }));
+              }
+              break;
+            }
+            version = parsedMessage.version;
+            game = applyDelta(game, parsedMessage.ops);
+            if (!binary) {
+              // binary clients render when the hot fields of this version arrive
+              render();
+            }
+            break;
           case "reload":
             document.location.reload();
             break
@@ -0,0 +1,106 @@
+"""How many arenas one core can run at the tick rate of the server.
+
+Every arena runs its game on one shared event loop, like the server does,
+with dummy pointers that move around and a few clients that accept every
+message at once. For every number of arenas the table shows how many of the
+due steps were simulated, how late the loop woke up and how busy the core
+was. An arena count is sustained when no steps were dropped, the steps were
+late by less than half a tick on average and the core had time to spare.
+
+Run with ``python -m benchmarks.arenas`` from the repository root.
+"""
+import argparse
+import asyncio
+import math
+import time
+
+from autokat.arena import Arena
+from autokat.multitrack import DummyMultiLaserTracker, Vec
+
+
+class NullWebSocket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        pass
+
+    async def send_bytes(self, message):
+        pass
+
+    async def close(self):
+        pass
+
+
+async def move_pointers(arenas: list[Arena], tick_time: float):
+    """Players that wave their pointers in circles, a different phase for every arena."""
+    started_at = time.monotonic()
+    while True:
+        t = time.monotonic() - started_at
+        for i, arena in enumerate(arenas):
+            for j, color in enumerate(("red", "green")):
+                angle = 2 * t + i + j * math.pi
+                arena.dummy_tracker.detect(color, Vec(512 + 300 * math.cos(angle), 384 + 250 * math.sin(angle)))
+        await asyncio.sleep(tick_time)
+
+
+async def measure(num_arenas: int, clients: int, duration: float, tick_time: float) -> dict:
+    arenas = [Arena(f"arena {i}", DummyMultiLaserTracker(), tick_time=tick_time, broadcast_time=tick_time) for i in range(num_arenas)]
+    for arena in arenas:
+        for _ in range(clients):
+            await arena.manager.connect(NullWebSocket())
+    tasks = [asyncio.create_task(arena.run()) for arena in arenas]
+    tasks.append(asyncio.create_task(move_pointers(arenas, tick_time)))
+    wall_started_at, cpu_started_at = time.monotonic(), time.process_time()
+    await asyncio.sleep(duration)
+    wall_time, cpu_time = time.monotonic() - wall_started_at, time.process_time() - cpu_started_at
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for arena in arenas:
+        for websocket in list(arena.manager.active_connections):
+            arena.manager.disconnect(websocket)
+
+    metrics = [arena.timestep.metrics for arena in arenas]
+    # the games start a tick after their task
+    due_steps = num_arenas * (wall_time - tick_time) / tick_time
+    steps = sum(m.steps for m in metrics)
+    return {
+        "steps": steps / due_steps,
+        "dropped": sum(m.dropped_steps for m in metrics),
+        "mean_jitter": sum(m.total_jitter for m in metrics) / max(sum(m.wakeups for m in metrics), 1),
+        "max_jitter": max(m.max_jitter for m in metrics),
+        "busy": cpu_time / wall_time,
+        "tick_cost": cpu_time / max(steps, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-a", "--arenas", default="1,2,4,8,16,32,64", help="Comma separated numbers of arenas to try")
+    parser.add_argument("-c", "--clients", default=2, type=int, help="Clients per arena")
+    parser.add_argument("-d", "--duration", default=3.0, type=float, help="Seconds to run every number of arenas")
+    parser.add_argument("-t", "--tick-time", default=0.03, type=float, help="Seconds per tick")
+    params = parser.parse_args()
+
+    print(f"{'arenas':>6} {'steps':>7} {'dropped':>8} {'jitter (ms)':>12} {'max (ms)':>9} {'busy':>6} {'tick (us)':>10} {'sustained':>10}")
+    sustained = 0
+    tick_cost = None
+    for num_arenas in (int(n) for n in params.arenas.split(",")):
+        result = asyncio.run(measure(num_arenas, params.clients, params.duration, params.tick_time))
+        # late by less than half a tick on average, and never a step dropped
+        ok = result["dropped"] == 0 and result["mean_jitter"] < params.tick_time / 2 and result["busy"] < 0.9
+        if ok:
+            sustained = max(sustained, num_arenas)
+        tick_cost = result["tick_cost"]
+        print(
+            f"{num_arenas:>6} {result['steps']:>6.1%} {result['dropped']:>8} {result['mean_jitter'] * 1e3:>12.2f} "
+            f"{result['max_jitter'] * 1e3:>9.2f} {result['busy']:>5.0%} {result['tick_cost'] * 1e6:>10.0f} {'yes' if ok else 'no':>10}"
+        )
+    print(f"sustained up to {sustained} arenas on one core")
+    if tick_cost:
+        print(f"the tick budget of {params.tick_time * 1e3:.0f} ms fits about {params.tick_time / tick_cost:.0f} arenas at the last measured cost per tick")
+
+
+if __name__ == "__main__":
+    main()
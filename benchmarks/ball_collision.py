@@ -0,0 +1,66 @@
+"""Compare the cost of the ball collision queries of one tick with shapely and with autokat.geometry.
+
+Run with ``python -m benchmarks.ball_collision`` from the repository root.
+"""
+import argparse
+import datetime
+import timeit
+
+from shapely import LineString, Polygon
+
+from autokat.game import Ball, Playing, segments
+from autokat.geometry import capsule_segment_interval, capsule_within_box, contains_interval, polygon_segment_interval, relative_location
+from autokat.vec import Vec
+
+
+def shapely_collision(playing: Playing, end: Vec):
+    ball_trace_shape = LineString([playing.ball.position, end]).buffer(playing.ball.radius)
+    locations = []
+    for wall in segments(playing.boundary_shape):
+        wall_intersection = wall.intersection(ball_trace_shape)
+        if not wall_intersection.is_empty:
+            for cone in Polygon(playing.red_cone.coords), Polygon(playing.green_cone.coords):
+                if cone.contains(wall_intersection):
+                    locations.append(wall.intersection(cone).line_locate_point(wall_intersection.centroid, normalized=True))
+                    break
+    return locations
+
+
+def kernel_collision(playing: Playing, end: Vec):
+    locations = []
+    if capsule_within_box(playing.ball.position, end, playing.ball.radius, playing.size):
+        return locations
+    for wall in playing.walls:
+        wall_intersection = capsule_segment_interval(playing.ball.position, end, playing.ball.radius, *wall)
+        if wall_intersection is not None:
+            for cone in playing.red_cone, playing.green_cone:
+                cone_wall_intersection = polygon_segment_interval(cone.coords, *wall)
+                if cone_wall_intersection is not None and contains_interval(cone_wall_intersection, wall_intersection):
+                    locations.append(relative_location(cone_wall_intersection, sum(wall_intersection) / 2))
+                    break
+    return locations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--repeat", default=2000, type=int, help="Number of ticks per measurement")
+    params = parser.parse_args()
+
+    playing = Playing(team_name="benchmark", red_light=Vec(700, 200))
+    playing.red_light, playing.red_cone = playing._update_light(playing.red_light, Vec(700, 200), datetime.timedelta(seconds=1))
+    scenarios = {
+        "free flight": Ball(position=Vec(300, 300), velocity=Vec(500, 100), radius=30),
+        "hits a wall": Ball(position=Vec(200, 740), velocity=Vec(-300, 600), radius=30),
+    }
+    print(f"{'scenario':>12} {'shapely (us)':>13} {'kernel (us)':>12} {'speedup':>8}")
+    for name, ball in scenarios.items():
+        playing.ball = ball
+        end = ball.moved(datetime.timedelta(seconds=0.03)).position
+        assert len(shapely_collision(playing, end)) == len(kernel_collision(playing, end))
+        shapely_time = timeit.timeit(lambda: shapely_collision(playing, end), number=params.repeat) / params.repeat
+        kernel_time = timeit.timeit(lambda: kernel_collision(playing, end), number=params.repeat) / params.repeat
+        print(f"{name:>12} {shapely_time * 1e6:>13.1f} {kernel_time * 1e6:>12.1f} {shapely_time / kernel_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
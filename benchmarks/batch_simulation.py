@@ -0,0 +1,56 @@
+"""Compare the cost of a tick of one game with Playing and with a BatchPlaying of many games.
+
+Both play with the demo player of Intro: the scalar games through Intro
+itself, the batch with IntroPointers. The scalar time includes the start
+boxes and team names of Intro, it's what a demo tick costs on the server.
+
+Run with ``python -m benchmarks.batch_simulation`` from the repository root.
+"""
+import argparse
+import datetime
+import time
+
+from autokat.batch import BatchPlaying
+from autokat.game import Intro
+from autokat.multitrack import Detection, Vec
+
+DT = datetime.timedelta(seconds=0.03)
+
+
+def scalar_tick_time(games: int, ticks: int) -> float:
+    intros = [Intro() for _ in range(games)]
+    outside_start_boxes = {
+        color: Detection(camera_position=Vec(0, 0), screen_position=Vec(0, 0), time=datetime.timedelta(0))
+        for color in ("red", "green")
+    }
+    started_at = time.perf_counter()
+    for tick in range(ticks):
+        for intro in intros:
+            intro.tick(outside_start_boxes, DT * tick, DT, DT)
+    return (time.perf_counter() - started_at) / (games * ticks)
+
+
+def batch_tick_time(games: int, ticks: int) -> float:
+    batch = BatchPlaying(games, light_speed=Intro.light_speed, demo_mode=True, seed=0)
+    started_at = time.perf_counter()
+    for _ in range(ticks):
+        batch.tick(DT.total_seconds())
+    return (time.perf_counter() - started_at) / (games * ticks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-g", "--games", default="1,100,1000,10000,100000", help="Comma separated batch sizes to try")
+    parser.add_argument("-t", "--ticks", default=300, type=int, help="Ticks per measurement")
+    params = parser.parse_args()
+
+    scalar_time = scalar_tick_time(20, params.ticks)
+    print(f"{'games':>7} {'per game tick (us)':>19} {'game ticks/s':>13} {'speedup':>8}")
+    print(f"{'Playing':>7} {scalar_time * 1e6:>19.2f} {1 / scalar_time:>13.0f} {1:>7.1f}x")
+    for games in (int(n) for n in params.games.split(",")):
+        batch_time = batch_tick_time(games, params.ticks)
+        print(f"{games:>7} {batch_time * 1e6:>19.2f} {1 / batch_time:>13.0f} {scalar_time / batch_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compare the per-label mask loop with the single pass ``blob_statistics``.
+
+Run with ``python -m benchmarks.blob_statistics`` from the repository root.
+"""
+import argparse
+import timeit
+
+import cv2
+import numpy
+
+from autokat.multitrack import blob_statistics
+
+
+def per_label_mean_hue(labels, stats, hue):
+    """The original implementation: one full-frame mask per label."""
+    return [
+        cv2.mean(hue, mask=(labels == i).astype(numpy.uint8))[0]
+        for i in range(1, len(stats))
+    ]
+
+
+def make_frame(width, height, num_blobs, seed=0):
+    rng = numpy.random.default_rng(seed)
+    value = numpy.zeros((height, width), numpy.uint8)
+    for x, y in zip(rng.integers(0, width, num_blobs), rng.integers(0, height, num_blobs)):
+        cv2.circle(value, (int(x), int(y)), 3, 255, -1)
+    hue = rng.integers(0, 180, (height, width), dtype=numpy.uint8)
+    return value, hue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-W", "--width", default=800, type=int, help="Frame width")
+    parser.add_argument("-H", "--height", default=600, type=int, help="Frame height")
+    parser.add_argument("-n", "--repeat", default=20, type=int, help="Number of runs per measurement")
+    params = parser.parse_args()
+
+    print(f"{'blobs':>6} {'per label (ms)':>15} {'single pass (ms)':>17} {'speedup':>8}")
+    for num_blobs in (1, 5, 20, 50, 200):
+        value, hue = make_frame(params.width, params.height, num_blobs)
+        num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(value, 4, cv2.CV_32S)
+        loop_time = timeit.timeit(lambda: per_label_mean_hue(labels, stats, hue), number=params.repeat) / params.repeat
+        vectorized_time = timeit.timeit(lambda: blob_statistics(labels, stats, hue), number=params.repeat) / params.repeat
+        print(f"{num_labels - 1:>6} {loop_time * 1000:>15.3f} {vectorized_time * 1000:>17.3f} {loop_time / vectorized_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
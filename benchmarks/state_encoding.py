@@ -0,0 +1,60 @@
+"""Compare the cost of encoding one game state message with the old ``default`` hook and with autokat.encoding.
+
+Run with ``python -m benchmarks.state_encoding`` from the repository root.
+"""
+import argparse
+import datetime
+import json
+import timeit
+
+from autokat.encoding import encode_message
+from autokat.game import Countdown, Game, GameOver, Intro, Playing
+from autokat.highscores import Highscore
+from autokat.multitrack import DummyMultiLaserTracker
+
+
+def _json_encoder_default(obj):
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+
+def default_hook_encode(message: dict) -> str:
+    return json.dumps(message, default=_json_encoder_default)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--repeat", default=2000, type=int, help="Number of encodes per measurement")
+    params = parser.parse_args()
+
+    game = Game(laser_tracker=DummyMultiLaserTracker())
+    [message] = game.tick(total_dt=datetime.timedelta(seconds=1), dt=datetime.timedelta(seconds=0.03))
+    playing = Playing(team_name="benchmark").spawn_ball()
+    states = {
+        "intro": Intro(),
+        "playing": playing,
+        "countdown": Countdown(start_at=datetime.timedelta(seconds=5), playing_state=playing),
+        "game_over": GameOver(
+            scores=[3, 5, 8],
+            team_name="benchmark",
+            to_intro_at=datetime.timedelta(seconds=20),
+            top_highscores=[Highscore(f"team {i}", 10 - i) for i in range(10)],
+            my_highscore=Highscore("benchmark", 8),
+            my_highscore_index=2,
+        ),
+    }
+    print(f"{'state':>10} {'default (us)':>13} {'encoding (us)':>14} {'bytes':>6} {'speedup':>8}")
+    for name, state in states.items():
+        message["state"] = state
+        assert json.loads(default_hook_encode(message)) == json.loads(encode_message(message))
+        default_time = timeit.timeit(lambda: default_hook_encode(message), number=params.repeat) / params.repeat
+        encoding_time = timeit.timeit(lambda: encode_message(message), number=params.repeat) / params.repeat
+        size = len(encode_message(message).encode())
+        print(f"{name:>10} {default_time * 1e6:>13.1f} {encoding_time * 1e6:>14.1f} {size:>6} {default_time / encoding_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
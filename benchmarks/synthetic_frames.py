@@ -0,0 +1,80 @@
+"""Chart the cost of rendering and of detecting lasers against resolution and distractor count.
+
+The frames come from ``autokat.synthetic`` with noise, bloom, motion blur
+and specular distractors on a projected background, so the detection rate
+and error show how well the tracker copes too.
+
+Run with ``python -m benchmarks.synthetic_frames`` from the repository root.
+"""
+import argparse
+import datetime
+import math
+import time
+
+from autokat.capture import Frame
+from autokat.multitrack import Calibration, MultiLaserTracker, ProcessingConfig
+from autokat.synthetic import LaserFrameGenerator, SceneConfig
+from autokat.vec import Vec
+
+RESOLUTIONS = [(800, 600), (1280, 720), (1920, 1080), (3840, 2160)]
+DISTRACTORS = [0, 10, 100, 1000]
+
+
+def measure(width: int, height: int, distractors: int, frames: int, background: str | None):
+    generator = LaserFrameGenerator(SceneConfig(
+        width=width,
+        height=height,
+        bloom_radius=3,
+        noise=4,
+        exposure=1 / 60,
+        distractors=distractors,
+        background=background,
+    ))
+    tracker = MultiLaserTracker(
+        cam_width=width,
+        cam_height=height,
+        processing_config=ProcessingConfig(),
+        calibration_file_path="",
+        headless=True,
+    )
+    # the whole camera image is the play field
+    tracker.calibration = Calibration(Vec(0, 0), Vec(width - 1, 0), Vec(0, height - 1), Vec(width - 1, height - 1))
+    tracker.region_of_interest = tracker.calibration.region_of_interest(width, height)
+    render_time = detect_time = 0.0
+    detected = 0
+    errors = []
+    for index in range(frames):
+        started_at = time.perf_counter()
+        image, ground_truth = generator.render(index)
+        rendered_at = time.perf_counter()
+        result = tracker.process_frame(Frame(image=image, index=index, captured_at=datetime.datetime.now()))
+        detect_time += time.perf_counter() - rendered_at
+        render_time += rendered_at - started_at
+        for laser_name, position in ground_truth.items():
+            if (blob := result.detections.get(laser_name)) is not None:
+                detected += 1
+                errors.append(math.dist(blob.camera_position, position))
+    return (
+        render_time / frames,
+        detect_time / frames,
+        detected / (frames * len(generator.colors)),
+        sum(errors) / len(errors) if errors else math.nan,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--frames", default=20, type=int, help="Number of frames per measurement")
+    parser.add_argument("--background", default="autokat/web/static/disco_00000.png", help="Projected image, 'none' for black")
+    params = parser.parse_args()
+    background = None if params.background == "none" else params.background
+
+    print(f"{'resolution':>10} {'distractors':>12} {'render (ms)':>12} {'detect (ms)':>12} {'detected':>9} {'error (px)':>11}")
+    for width, height in RESOLUTIONS:
+        for distractors in DISTRACTORS:
+            render_time, detect_time, detection_rate, error = measure(width, height, distractors, params.frames, background)
+            print(f"{f'{width}x{height}':>10} {distractors:>12} {render_time * 1e3:>12.2f} {detect_time * 1e3:>12.2f} {detection_rate:>8.1%} {error:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Replay frames through ``MultiLaserTracker.process_frame`` and report its speed and accuracy.
+
+The frames come from a video file, a directory or glob pattern of images or
+a synthetic scene (the default), see ``autokat.sources.open_frame_source``.
+Accuracy can only be reported for sources with a ground truth.
+
+Run with ``python -m benchmarks.tracker_replay [source]`` from the repository root.
+"""
+import argparse
+import datetime
+import math
+import statistics
+import time
+
+from autokat.capture import Frame
+from autokat.multitrack import MultiLaserTracker, ProcessingConfig
+from autokat.sources import open_frame_source
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", default="synthetic", help="Video file, image directory or pattern, or 'synthetic'")
+    parser.add_argument("-n", "--frames", default=300, type=int, help="Maximum number of frames to process")
+    parser.add_argument("-W", "--width", default=800, type=int, help="Frame width of the synthetic source")
+    parser.add_argument("-H", "--height", default=600, type=int, help="Frame height of the synthetic source")
+    parser.add_argument("--processing-config", default="processing_config.json", help="ProcessingConfig file to tune")
+    parser.add_argument("--calibration", default="calibration.json", help="Calibration file")
+    params = parser.parse_args()
+
+    source = open_frame_source(params.source, params.width, params.height)
+    tracker = MultiLaserTracker(
+        cam_width=params.width,
+        cam_height=params.height,
+        processing_config=ProcessingConfig.load_from_file(params.processing_config),
+        calibration_file_path=params.calibration,
+        headless=True,
+    )
+
+    stage_times: dict[str, list[float]] = {}
+    latencies = []
+    errors: dict[str, list[float]] = {}
+    misses: dict[str, int] = {}
+    frames = 0
+    processing_time = 0.0
+    while frames < params.frames:
+        success, image = source.read()
+        if not success:
+            break
+        ground_truth = getattr(source, "ground_truth", None)
+        started_at = time.perf_counter()
+        result = tracker.process_frame(Frame(image=image, index=frames, captured_at=datetime.datetime.now()))
+        processing_time += time.perf_counter() - started_at
+        frames += 1
+
+        for stage, seconds in result.stage_times.items():
+            stage_times.setdefault(stage, []).append(seconds)
+        latencies.append(result.timings.latency.total_seconds())
+        if ground_truth is not None:
+            for laser_name, position in ground_truth.items():
+                blob = result.detections.get(laser_name)
+                if blob is None:
+                    misses[laser_name] = misses.get(laser_name, 0) + 1
+                else:
+                    errors.setdefault(laser_name, []).append(math.dist(blob.camera_position, position))
+    source.release()
+
+    if not frames:
+        print("No frames in source")
+        return
+    print(f"{frames} frames in {processing_time:.2f}s: {frames / processing_time:.1f} fps")
+    print(f"{'stage':>10} {'mean (ms)':>10} {'p95 (ms)':>9}")
+    for stage, seconds in stage_times.items():
+        print(f"{stage:>10} {statistics.mean(seconds) * 1e3:>10.2f} {percentile(seconds, 0.95) * 1e3:>9.2f}")
+    print(f"{'latency':>10} {statistics.mean(latencies) * 1e3:>10.2f} {percentile(latencies, 0.95) * 1e3:>9.2f}")
+    if errors or misses:
+        print(f"{'laser':>10} {'detected':>9} {'mean error (px)':>16} {'max error (px)':>15}")
+        for laser_name in sorted(errors.keys() | misses.keys()):
+            laser_errors = errors.get(laser_name, [])
+            detected = len(laser_errors) / (len(laser_errors) + misses.get(laser_name, 0))
+            mean_error = statistics.mean(laser_errors) if laser_errors else math.nan
+            max_error = max(laser_errors, default=math.nan)
+            print(f"{laser_name:>10} {detected:>8.1%} {mean_error:>16.2f} {max_error:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from autokat.arena import Arena
+from autokat.multitrack import DummyMultiLaserTracker, Vec
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        self.received.append(message)
+
+    async def send_bytes(self, message):
+        self.received.append(message)
+
+    async def close(self):
+        pass
+
+
+def test_arenas_run_side_by_side():
+    async def scenario():
+        hall, stage = Arena("hall", DummyMultiLaserTracker()), Arena("stage", DummyMultiLaserTracker())
+        hall_client, stage_client = FakeWebSocket(), FakeWebSocket()
+        await hall.manager.connect(hall_client)
+        await stage.manager.connect(stage_client)
+        stage.dummy_tracker.detect("red", Vec(100, 200))
+        tasks = [asyncio.create_task(hall.run()), asyncio.create_task(stage.run())]
+        await asyncio.sleep(0.2)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return hall, stage, hall_client, stage_client
+
+    hall, stage, hall_client, stage_client = asyncio.run(scenario())
+    assert hall.timestep.metrics.steps > 0 and stage.timestep.metrics.steps > 0
+    assert json.loads(hall_client.received[0])["type"] == "keyframe"
+    assert json.loads(stage_client.received[0])["type"] == "keyframe"
+    # every arena has its own pointers
+    assert stage.laser_tracker.last_detections["red"].screen_position == Vec(100, 200)
+    assert hall.laser_tracker.last_detections["red"].screen_position != Vec(100, 200)
+
+
+def test_binary_stream_only_runs_for_binary_clients():
+    async def scenario():
+        arena = Arena("binary", DummyMultiLaserTracker())
+        text_client, binary_client = FakeWebSocket(), FakeWebSocket()
+        await arena.manager.connect(text_client)
+        task = asyncio.create_task(arena.run())
+        await asyncio.sleep(0.15)
+        binary_versions = arena.binary_state_stream.version
+        await arena.manager.connect(binary_client)
+        arena.manager.set_binary(binary_client, True)
+        await arena.send_keyframe(binary_client)
+        await asyncio.sleep(0.15)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return binary_versions, text_client, binary_client
+
+    binary_versions, text_client, binary_client = asyncio.run(scenario())
+    # nobody wanted the binary frames, so they weren't encoded
+    assert binary_versions == 0
+    assert len(text_client.received) > 1
+    # the first binary client starts from a keyframe, the deltas follow on from it
+    keyframe, *rest = [json.loads(m) for m in binary_client.received if isinstance(m, str)]
+    assert keyframe["type"] == "keyframe"
+    assert rest and rest[0]["base"] == keyframe["version"]
+    assert isinstance(binary_client.received[1], bytes)
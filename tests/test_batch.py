@@ -0,0 +1,190 @@
+import dataclasses
+import datetime
+import math
+import random
+
+import numpy as np
+
+from autokat.batch import BatchPlaying, IntroPointers, ScriptedPointers, distribution
+from autokat.game import Ball, Countdown, Intro, Playing
+from autokat.multitrack import Detection
+from autokat.vec import Vec
+
+DT = datetime.timedelta(seconds=0.03)
+
+
+def _detections(red: Vec, green: Vec) -> dict[str, Detection]:
+    return {
+        "red": Detection(camera_position=red, screen_position=red, time=datetime.timedelta(0)),
+        "green": Detection(camera_position=green, screen_position=green, time=datetime.timedelta(0)),
+    }
+
+
+def _random_games(rng: random.Random, n: int) -> list[Playing]:
+    games = []
+    for _ in range(n):
+        angle = rng.uniform(0, 2 * math.pi)
+        speed = rng.uniform(100, 600)
+        games.append(Playing(
+            team_name="",
+            red_light=Vec(rng.uniform(0, 1024), rng.uniform(0, 768)),
+            green_light=Vec(rng.uniform(0, 1024), rng.uniform(0, 768)),
+            ball=Ball(
+                position=Vec(rng.uniform(31, 993), rng.uniform(31, 737)),
+                velocity=Vec(speed * math.cos(angle), speed * math.sin(angle)),
+                radius=30,
+            ),
+            bounce_speed_up=rng.choice([0, 20, 50]),
+        ))
+    return games
+
+
+def test_matches_playing_with_scripted_pointers():
+    rng = random.Random(0)
+    games = _random_games(rng, 60)
+    centers = np.array([[rng.uniform(200, 824), rng.uniform(200, 568)] for _ in games])
+
+    def script(time, batch):
+        # every game waves its pointers in circles around its own center
+        offset = 250 * np.array([math.cos(time), math.sin(time)])
+        return centers + offset, centers - offset
+
+    batch = BatchPlaying.from_playing(games, pointers=ScriptedPointers(script))
+    bounces = 0
+    for tick in range(400):
+        red, green = script(tick * DT.total_seconds(), batch)
+        playing = [i for i, game in enumerate(games) if isinstance(game, Playing)]
+        for i in playing:
+            games[i] = games[i].tick(_detections(Vec(*red[i]), Vec(*green[i])), DT * tick, DT, DT)
+        batch.tick(DT.total_seconds())
+        for i in playing:
+            game = games[i]
+            if isinstance(game, Playing):
+                assert batch.has_ball[i]
+                np.testing.assert_allclose(batch.ball_position[i], game.ball.position, atol=1e-6)
+                np.testing.assert_allclose(batch.ball_velocity[i], game.ball.velocity, atol=1e-6)
+                np.testing.assert_allclose(batch.red_light[i], game.red_light, atol=1e-6)
+                assert batch.score[i] == game.scores[-1]
+                bounces += game.scores[-1]
+            else:
+                # missed, and counting down to the next ball
+                assert isinstance(game, Countdown)
+                assert not batch.has_ball[i]
+                assert batch.lives_used[i] == 1
+    # the games actually bounced and missed
+    assert bounces > 0
+    assert any(isinstance(game, Countdown) for game in games)
+
+
+def test_matches_playing_near_walls_and_corners():
+    rng = random.Random(2)
+    games = []
+    for _ in range(400):
+        # into a corner, or along a wall, from close by
+        corner = Vec(rng.choice([0, 1024]), rng.choice([0, 768]))
+        position = Vec(
+            abs(corner.x - rng.uniform(31, 80)),
+            abs(corner.y - rng.uniform(31, 80)),
+        )
+        speed = rng.uniform(300, 900)
+        direction = (corner - position).norm() if rng.random() < 0.7 else Vec(1 if corner.x else -1, 0)
+        games.append(Playing(
+            team_name="",
+            red_light=Vec(rng.uniform(0, 1024), rng.uniform(0, 768)),
+            green_light=Vec(rng.uniform(0, 1024), rng.uniform(0, 768)),
+            ball=Ball(position=position, velocity=direction * speed, radius=30),
+        ))
+    still = ScriptedPointers(lambda time, batch: (batch.red_light, batch.green_light))
+    batch = BatchPlaying.from_playing([dataclasses.replace(game) for game in games], pointers=still)
+    for tick in range(10):
+        playing = [i for i, game in enumerate(games) if isinstance(game, Playing)]
+        for i in playing:
+            game = games[i]
+            games[i] = game.tick(_detections(game.red_light, game.green_light), DT * tick, DT, DT)
+        batch.tick(DT.total_seconds())
+        for i in playing:
+            game = games[i]
+            assert batch.has_ball[i] == isinstance(game, Playing)
+            if isinstance(game, Playing):
+                np.testing.assert_allclose(batch.ball_position[i], game.ball.position, atol=1e-6)
+                np.testing.assert_allclose(batch.ball_velocity[i], game.ball.velocity, atol=1e-6)
+                assert batch.score[i] == game.scores[-1]
+    # both bounced and missed balls were compared
+    assert batch.score.any()
+    assert any(isinstance(game, Countdown) for game in games)
+
+
+def test_matches_intro_demo():
+    random.seed(1)
+    intros = [Intro() for _ in range(15)]
+    batch = BatchPlaying.from_playing([intro.playing_state for intro in intros], pointers=IntroPointers())
+    batch.red_pointer[:] = [intro.pointer_detections["red"].screen_position for intro in intros]
+    batch.green_pointer[:] = [intro.pointer_detections["green"].screen_position for intro in intros]
+    outside_start_boxes = _detections(Vec(0, 0), Vec(0, 0))
+    compared = np.ones(len(intros), dtype=bool)
+    for tick in range(400):
+        for intro in intros:
+            intro.tick(outside_start_boxes, DT * tick, DT, DT)
+        rallies = len(batch.results().rally_games)
+        batch.tick(DT.total_seconds())
+        # a missed ball is replaced by a random one
+        compared[batch.results().rally_games[rallies:]] = False
+        for i in np.flatnonzero(compared):
+            playing = intros[i].playing_state
+            np.testing.assert_allclose(batch.red_pointer[i], intros[i].pointer_detections["red"].screen_position, atol=1e-6)
+            np.testing.assert_allclose(batch.green_light[i], playing.green_light, atol=1e-6)
+            np.testing.assert_allclose(batch.ball_position[i], playing.ball.position, atol=1e-6)
+            assert batch.score[i] == playing.scores[-1]
+    assert 0 < compared.sum() < len(intros)
+
+
+def _missing_game(**kwargs) -> Playing:
+    # both lights cast their cones to the left, the ball goes right
+    return Playing(
+        team_name="",
+        red_light=Vec(712, 300),
+        green_light=Vec(712, 468),
+        ball=Ball(position=Vec(900, 384), velocity=Vec(500, 0), radius=30),
+        scores=[4],
+        **kwargs,
+    )
+
+
+def test_countdown_is_as_long_as_in_game():
+    game = _missing_game(max_lives=2)
+    still = ScriptedPointers(lambda time, batch: (batch.red_light, batch.green_light))
+    batch = BatchPlaying.from_playing([dataclasses.replace(game)], pointers=still)
+    detections = _detections(game.red_light, game.green_light)
+    state, tick = game, 0
+    while not isinstance(state, Countdown):
+        state = state.tick(detections, DT * tick, DT, DT)
+        batch.tick(DT.total_seconds())
+        tick += 1
+    while isinstance(state, Countdown):
+        assert not batch.has_ball[0]
+        state = state.tick(detections, DT * tick, DT, DT)
+        batch.tick(DT.total_seconds())
+        tick += 1
+    assert batch.has_ball[0]
+    assert batch.results().rally_scores.tolist() == [4]
+
+
+def test_game_is_over_after_the_last_life():
+    batch = BatchPlaying.from_playing(
+        [_missing_game(max_lives=1), _missing_game(max_lives=3)],
+        pointers=ScriptedPointers(lambda time, batch: (batch.red_light, batch.green_light)),
+    )
+    batch.tick(0.2)
+    assert batch.game_over.tolist() == [True, False]
+    results = batch.results()
+    assert results.game_scores.tolist() == [4, -1]
+    assert results.rally_games.tolist() == [0, 1]
+    assert distribution(results.game_scores).tolist() == [0, 0, 0, 0, 1]
+
+
+def test_settings_per_game():
+    batch = BatchPlaying(400, ball_speed=np.repeat([100, 250], 200), max_lives=1, seed=0)
+    assert batch.run(max_ticks=50_000) < 50_000
+    scores = batch.results().game_scores
+    # the demo player gives up on fast balls, so the slow ones go on for longer
+    assert scores[:200].mean() > scores[200:].mean()
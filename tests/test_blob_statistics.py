@@ -0,0 +1,35 @@
+import cv2
+import numpy
+import pytest
+
+from autokat.multitrack import blob_statistics
+
+
+def _random_blobs(seed, width=200, height=150, num_dots=25):
+    rng = numpy.random.default_rng(seed)
+    value = numpy.zeros((height, width), numpy.uint8)
+    for x, y, r in zip(rng.integers(0, width, num_dots), rng.integers(0, height, num_dots), rng.integers(1, 8, num_dots)):
+        cv2.circle(value, (int(x), int(y)), int(r), 255, -1)
+    hue = rng.integers(0, 180, (height, width), dtype=numpy.uint8)
+    return value, hue
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_blob_statistics_matches_per_label_mean(seed):
+    value, hue = _random_blobs(seed)
+    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(value, 4, cv2.CV_32S)
+    blobs = blob_statistics(labels, stats, hue)
+    assert len(blobs.mean_hue) == num_labels
+    for i in range(1, num_labels):
+        mean_mask = (labels == i).astype(numpy.uint8)
+        assert blobs.mean_hue[i] == pytest.approx(cv2.mean(hue, mask=mean_mask)[0])
+        assert blobs.area[i] == stats[i, cv2.CC_STAT_AREA]
+        assert list(blobs.bbox[i]) == list(stats[i, :4])
+
+
+def test_blob_statistics_without_blobs():
+    value = numpy.zeros((10, 10), numpy.uint8)
+    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(value, 4, cv2.CV_32S)
+    blobs = blob_statistics(labels, stats, value)
+    assert num_labels == 1
+    assert list(blobs.area) == [100]
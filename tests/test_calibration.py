@@ -41,3 +41,53 @@ def test_fucked_up_case():
     calibration = Calibration.from_dict(
         {"top_left": [215.2, 110.39999999999999], "top_right": [907.2, 70.39999999999999], "bottom_left": [134.4, 603.2], "bottom_right": [1021.6, 584.8]}
     )
+
+
+def test_region_of_interest():
+    from autokat.multitrack import Calibration as MultiCalibration, Vec
+
+    calibration = MultiCalibration(
+        top_left=Vec(200, 100),
+        top_right=Vec(600, 120),
+        bottom_left=Vec(180, 500),
+        bottom_right=Vec(620, 480),
+    )
+    region_of_interest = calibration.region_of_interest(800, 600, margin=10)
+    assert region_of_interest[:4] == (170, 90, 461, 421)
+    assert region_of_interest.mask.shape == (421, 461)
+    # the center of the play field is inside, the corners of the crop are not
+    assert region_of_interest.mask[200, 230] == 255
+    assert region_of_interest.mask[0, 0] == 0
+
+
+def test_transform_many_matches_transform():
+    import numpy
+
+    calibration = Calibration.from_dict(
+        {"top_left": [215.2, 110.39999999999999], "top_right": [907.2, 70.39999999999999], "bottom_left": [134.4, 603.2], "bottom_right": [1021.6, 584.8]}
+    )
+    points = numpy.array([[215.2, 110.4], [500, 300], [1021.6, 584.8], [0, 0]])
+    transformed = calibration.transform_many(points)
+    for point, transformed_point in zip(points, transformed):
+        assert tuple(transformed_point) == pytest.approx(calibration.transform(Coords(*point)))
+
+
+@pytest.mark.parametrize("corner,screen_corner", list(zip(_non_trivial_calibration, _trivial_calibration)))
+def test_corners_map_to_screen_corners(corner: Coords, screen_corner: Coords):
+    assert _non_trivial_calibration.transform(corner) == pytest.approx(screen_corner)
+
+
+def test_region_of_interest_outside_the_image():
+    from autokat.multitrack import Calibration as MultiCalibration, Vec
+
+    calibration = MultiCalibration(
+        top_left=Vec(1000, 700),
+        top_right=Vec(1400, 700),
+        bottom_left=Vec(1000, 1000),
+        bottom_right=Vec(1400, 1000),
+    )
+    region_of_interest = calibration.region_of_interest(800, 600, margin=10)
+    # nothing of the play field is in view, so the whole image is processed
+    assert region_of_interest[:4] == (0, 0, 800, 600)
+    assert region_of_interest.mask.shape == (600, 800)
+    assert region_of_interest.mask.all()
@@ -0,0 +1,30 @@
+import datetime
+
+import numpy
+
+from autokat.capture import Frame, FrameGrabber, LatestFrameBuffer
+
+
+def _frame(index):
+    return Frame(image=numpy.zeros((2, 2, 3), numpy.uint8), index=index, captured_at=datetime.datetime.now())
+
+
+def test_latest_frame_wins():
+    frame_buffer = LatestFrameBuffer(size=2)
+    for i in range(5):
+        frame_buffer.put(_frame(i))
+    assert frame_buffer.get(timeout=0).index == 4
+    assert frame_buffer.dropped == 4
+    assert frame_buffer.get(timeout=0) is None
+
+
+def test_grabber_closes_buffer_when_capture_fails():
+    class FailingCapture:
+        def read(self):
+            return False, None
+
+    frame_buffer = LatestFrameBuffer()
+    grabber = FrameGrabber(FailingCapture(), frame_buffer)
+    grabber.start()
+    assert frame_buffer.get(timeout=1) is None
+    grabber.stop()
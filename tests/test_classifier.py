@@ -0,0 +1,79 @@
+import datetime
+import tracemalloc
+
+import numpy
+import pytest
+
+from autokat.capture import Frame
+from autokat.classifier import BACKGROUND, FIRST_LASER, UNKNOWN, FrameBuffers, PixelClassifier
+from autokat.multitrack import MultiLaserTracker, ProcessingConfig
+from autokat.synthetic import LaserFrameGenerator, SceneConfig, laser_color
+
+
+@pytest.mark.parametrize("color, expected", [
+    (laser_color(170), FIRST_LASER),  # red
+    (laser_color(72), FIRST_LASER + 1),  # green
+    (laser_color(20), UNKNOWN),  # bright orange
+    ((255, 255, 255), UNKNOWN),
+    ((30, 30, 30), BACKGROUND),
+])
+def test_pixel_classes(color, expected):
+    classifier = PixelClassifier(ProcessingConfig())
+    classes, foreground = classifier.classify(numpy.full((3, 4, 3), color, numpy.uint8), FrameBuffers((3, 4)))
+    assert (classes == expected).all()
+    assert (foreground == (255 if expected != BACKGROUND else 0)).all()
+
+
+def test_tracker_rebuilds_classifier_when_config_changes(tmp_path):
+    tracker = MultiLaserTracker(
+        processing_config=ProcessingConfig(),
+        calibration_file_path=str(tmp_path / "calibration.json"),
+        headless=True,
+    )
+    image = numpy.zeros((600, 800, 3), numpy.uint8)
+    image[300:306, 400:406] = laser_color(72)
+
+    def detect():
+        return tracker.process_frame(Frame(image=image, index=0, captured_at=datetime.datetime.now())).detections
+
+    assert list(detect()) == ["green"]
+    classifier = tracker.classifier
+    detect()
+    assert tracker.classifier is classifier
+    # like ProcessingConfigEditor does
+    tracker.processing_config.laser_configs["green"].hue_max = 70
+    assert detect() == {}
+    assert tracker.classifier is not classifier
+
+
+def test_tracker_reuses_frame_buffers(tmp_path):
+    tracker = MultiLaserTracker(
+        processing_config=ProcessingConfig(),
+        calibration_file_path=str(tmp_path / "calibration.json"),
+        headless=True,
+    )
+    generator = LaserFrameGenerator(SceneConfig(noise=4, distractors=50))
+    images = [generator.render(i)[0] for i in range(10)]
+
+    def process(index):
+        tracker.process_frame(Frame(image=images[index % len(images)], index=index, captured_at=datetime.datetime.now()))
+
+    # the first frames build the lookup table and the buffers
+    for index in range(10):
+        process(index)
+    buffers = tracker.frame_buffers
+    # anything the size of a frame that's allocated per frame shows up in the peak,
+    # and grows the traced memory if it's kept around
+    frame_size = buffers.pixel_classes.nbytes
+    tracemalloc.start()
+    try:
+        started_with = tracemalloc.get_traced_memory()[0]
+        for index in range(10, 110):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            process(index)
+            assert tracemalloc.get_traced_memory()[1] - before < frame_size / 4
+        assert tracemalloc.get_traced_memory()[0] - started_with < frame_size / 4
+    finally:
+        tracemalloc.stop()
+    assert tracker.frame_buffers is buffers
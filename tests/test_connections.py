@@ -0,0 +1,118 @@
+import asyncio
+
+from autokat.connections import CLIENTS, DROPPED_MESSAGES, QUEUE_DEPTH, SEND_FAILURES, ConnectionManager
+from autokat.metrics import REGISTRY
+
+
+class FakeWebSocket:
+    def __init__(self, hang=False):
+        self.hang = hang
+        self.received = []
+        self.closed = False
+        self.client = "fake"
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.hang:
+            await asyncio.sleep(3600)
+        self.received.append(message)
+
+    async def send_bytes(self, message):
+        self.received.append(message)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_slow_client_does_not_block_others_and_is_evicted():
+    async def scenario():
+        manager = ConnectionManager(queue_size=8, send_timeout=0.05)
+        fast, slow = FakeWebSocket(), FakeWebSocket(hang=True)
+        await manager.connect(fast)
+        await manager.connect(slow)
+        for i in range(5):
+            await manager.broadcast(str(i))
+        await asyncio.sleep(0.1)
+        return manager, fast, slow
+
+    manager, fast, slow = asyncio.run(scenario())
+    assert fast.received == ["0", "1", "2", "3", "4"]
+    assert slow.closed
+    assert list(manager.active_connections) == [fast]
+
+
+def test_queue_drops_oldest_messages():
+    async def scenario():
+        manager = ConnectionManager(queue_size=2)
+        websocket = FakeWebSocket()
+        await manager.connect(websocket)
+        # nothing is sent until the sender task gets a chance to run
+        for i in range(5):
+            await manager.broadcast(str(i))
+        client = manager.active_connections[websocket]
+        await asyncio.sleep(0.01)
+        manager.disconnect(websocket)
+        return websocket, client
+
+    websocket, client = asyncio.run(scenario())
+    assert websocket.received == ["3", "4"]
+    assert client.dropped == 3
+
+
+def test_binary_clients_get_binary_messages():
+    async def scenario():
+        manager = ConnectionManager()
+        text, binary = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(text)
+        await manager.connect(binary)
+        manager.set_binary(binary, True)
+        await manager.broadcast("state", binary=["stripped state", b"hot fields"])
+        await manager.broadcast("reload")
+        await asyncio.sleep(0.01)
+        return text, binary
+
+    text, binary = asyncio.run(scenario())
+    assert text.received == ["state", "reload"]
+    assert binary.received == ["stripped state", b"hot fields", "reload"]
+
+
+def test_binary_messages_are_dropped_together():
+    async def scenario():
+        manager = ConnectionManager(queue_size=1)
+        websocket = FakeWebSocket()
+        await manager.connect(websocket)
+        manager.set_binary(websocket, True)
+        for i in range(3):
+            await manager.broadcast("state", binary=[f"stripped state {i}", f"hot fields {i}".encode()])
+        await asyncio.sleep(0.01)
+        return websocket
+
+    websocket = asyncio.run(scenario())
+    # never the stripped state of one version with the hot fields of another
+    assert websocket.received == ["stripped state 2", b"hot fields 2"]
+
+
+def test_metrics_of_the_clients():
+    async def scenario():
+        manager = ConnectionManager(queue_size=2, send_timeout=0.05, name="metrics test")
+        fast, slow = FakeWebSocket(), FakeWebSocket(hang=True)
+        await manager.connect(fast)
+        await manager.connect(slow)
+        for i in range(5):
+            await manager.broadcast(str(i))
+        depth_before_sending = QUEUE_DEPTH.labels("metrics test").sample()
+        clients_before_eviction = CLIENTS.labels("metrics test").sample()
+        await asyncio.sleep(0.1)
+        clients_after_eviction = CLIENTS.labels("metrics test").sample()
+        manager.close()
+        return depth_before_sending, clients_before_eviction, clients_after_eviction
+
+    depth, clients, clients_left = asyncio.run(scenario())
+    assert (depth, clients, clients_left) == (2, 2, 1)
+    # both queues overflowed before the first message was sent
+    assert DROPPED_MESSAGES.labels("metrics test").sample() == 6
+    assert SEND_FAILURES.labels("metrics test", "timeout").sample() == 1
+    # a closed manager doesn't keep its gauges
+    assert 'autokat_clients{arena="metrics test"}' not in REGISTRY.render()
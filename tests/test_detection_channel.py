@@ -0,0 +1,42 @@
+import asyncio
+import datetime
+import threading
+
+from autokat.detection_channel import DetectionChannel, DetectionLatency, latest_capture
+from autokat.multitrack import Detection, Vec
+
+
+def test_publish_from_another_thread_wakes_the_loop():
+    async def main():
+        channel = DetectionChannel()
+        channel.bind(asyncio.get_running_loop())
+        assert not await channel.wait(0.01)
+        captured_at = datetime.datetime.now()
+        threading.Thread(target=channel.publish, args=(captured_at,)).start()
+        assert await channel.wait(5)
+        assert channel.captured_at == captured_at
+        # consumed
+        assert not await channel.wait(0.01)
+
+    asyncio.run(main())
+
+
+def test_publish_before_bind_is_kept():
+    channel = DetectionChannel()
+    channel.publish(None)
+    assert channel.published == 1
+
+
+def test_latency_counts_every_detection_once():
+    captured_at = datetime.datetime(2024, 12, 1, 20, 0, 0)
+    detections = {
+        "red": Detection(camera_position=Vec(0, 0), screen_position=Vec(0, 0), time=captured_at, captured_at=captured_at),
+        "green": Detection(camera_position=Vec(0, 0), screen_position=Vec(0, 0), time=captured_at),
+    }
+    assert latest_capture(detections) == captured_at
+    latency = DetectionLatency()
+    latency.record(latest_capture(detections), captured_at + datetime.timedelta(seconds=0.02))
+    latency.record(latest_capture(detections), captured_at + datetime.timedelta(seconds=0.05))
+    latency.record(None, captured_at)
+    assert latency.count == 1
+    assert latency.to_dict()["mean"] == 0.02
@@ -0,0 +1,148 @@
+import datetime
+import json
+
+import pytest
+
+from autokat.encoding import BinaryStateStream, HOT_FIELDS, StateStream, encode_message
+from autokat.game import Countdown, Game, GameOver, Intro, Playing
+from autokat.highscores import Highscore
+from autokat.multitrack import DummyMultiLaserTracker, Vec
+
+
+def _json_encoder_default(obj):
+    # how the server used to encode every message
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
+
+
+def _playing():
+    return Playing(team_name="team", red_light=Vec(123.5, 456.25)).spawn_ball()
+
+
+@pytest.mark.parametrize("state", [
+    Intro(),
+    _playing(),
+    Playing(team_name="no ball"),
+    Countdown(start_at=datetime.timedelta(seconds=12.5), playing_state=_playing()),
+    GameOver(
+        scores=[3, 5],
+        team_name="team",
+        to_intro_at=datetime.timedelta(seconds=40),
+        top_highscores=[Highscore("best", 10), Highscore("team", 5)],
+        my_highscore=Highscore("team", 5),
+        my_highscore_index=1,
+    ),
+], ids=lambda state: type(state).__name__)
+def test_encoding_matches_to_dict(state):
+    game = Game(laser_tracker=DummyMultiLaserTracker())
+    [message] = game.tick(total_dt=datetime.timedelta(seconds=1.5), dt=datetime.timedelta(seconds=0.03))
+    message["state"] = state
+    expected = json.dumps(message, default=_json_encoder_default)
+    assert json.loads(encode_message(message)) == json.loads(expected)
+
+
+def test_other_messages_are_encoded_as_is():
+    assert json.loads(encode_message({"type": "reload"})) == {"type": "reload"}
+
+
+def _apply(document, ops):
+    # what autokat/web/hooks/gamestate.ts does with a delta
+    for op, path, *value in ops:
+        parent = document
+        for key in path[:-1]:
+            parent = parent[key]
+        if op == "set":
+            parent[path[-1]] = value[0]
+        else:
+            del parent[path[-1]]
+    return document
+
+
+def test_state_stream_reconstructs_every_state():
+    stream = StateStream(keyframe_every=25)
+    game = Game(laser_tracker=DummyMultiLaserTracker())
+    dt = datetime.timedelta(seconds=0.03)
+    document = None
+    for i in range(1, 60):
+        if i == 30:
+            game.state = Countdown(start_at=datetime.timedelta(seconds=1.5), playing_state=_playing())
+        [message] = game.tick(total_dt=i * dt, dt=dt)
+        encoded = json.loads(stream.encode(message))
+        if encoded["type"] == "keyframe":
+            assert i == 1 or i % 25 == 0
+            document = encoded["message"]
+        else:
+            assert encoded["base"] == encoded["version"] - 1
+            document = _apply(document, encoded["ops"])
+        assert encoded["version"] == i
+        assert document == json.loads(encode_message(message))
+        assert json.loads(stream.keyframe()) == {"type": "keyframe", "version": i, "message": document}
+
+
+def test_unchanged_fields_are_not_sent():
+    stream = StateStream()
+    game = Game(laser_tracker=DummyMultiLaserTracker())
+    game.state = _playing()
+    dt = datetime.timedelta(seconds=0.03)
+    for i in range(1, 3):
+        [message] = game.tick(total_dt=i * dt, dt=dt)
+        encoded = json.loads(stream.encode(message))
+    changed = {tuple(path) for _, path, *_ in encoded["ops"]}
+    # the lights are still moving towards the pointers
+    assert changed == {
+        ("state", "ball", "position"),
+        ("state", "red_light"), ("state", "red_cone"),
+        ("state", "green_light"), ("state", "green_cone"),
+        ("time",),
+    }
+
+
+def _with_hot_fields(document, packed):
+    # what autokat/web/hooks/gamestate.ts does with a binary frame
+    version, *values = HOT_FIELDS.unpack(packed)
+    points = [values[i:i + 2] for i in range(0, len(values), 2)]
+    ball_position, ball_velocity, red_light, green_light, red_position, green_position = points
+    state = document["state"]
+    playing = state if state["name"] == "playing" else state.get("playing_state")
+    if playing is not None:
+        playing.update(red_light=red_light, green_light=green_light)
+        if playing["ball"] is not None:
+            playing["ball"].update(position=ball_position, velocity=ball_velocity)
+    document["debug"] = {"red_position": red_position, "green_position": green_position}
+    return version, document
+
+
+def _float32_approx(value):
+    if isinstance(value, dict):
+        return {key: _float32_approx(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_float32_approx(item) for item in value]
+    if isinstance(value, float):
+        return pytest.approx(value, rel=1e-6)
+    return value
+
+
+@pytest.mark.parametrize("state", [
+    Intro(),
+    _playing(),
+    Playing(team_name="no ball"),
+    Countdown(start_at=datetime.timedelta(seconds=12.5), playing_state=_playing()),
+], ids=lambda state: type(state).__name__)
+def test_binary_stream_reconstructs_state(state):
+    stream = BinaryStateStream()
+    game = Game(laser_tracker=DummyMultiLaserTracker())
+    game.state = state
+    dt = datetime.timedelta(seconds=0.03)
+    document = None
+    for i in range(1, 4):
+        [message] = game.tick(total_dt=i * dt, dt=dt)
+        encoded = json.loads(stream.encode(message))
+        assert "red_position" not in json.dumps(encoded)
+        document = encoded["message"] if encoded["type"] == "keyframe" else _apply(document, encoded["ops"])
+        version, full_document = _with_hot_fields(json.loads(json.dumps(document)), stream.hot_fields)
+        assert version == i
+        assert len(stream.hot_fields) == HOT_FIELDS.size
+        assert json.loads(encode_message(message)) == _float32_approx(full_document)
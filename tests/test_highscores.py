@@ -1,45 +1,31 @@
 import json
-from autokat.highscores import Highscore, Highscores
-
-
-class DummyPath:
-    def __init__(self, text=""):
-        self._text = text
+import random
 
-    def read_text(self):
-        return self._text
-
-    def write_text(self, text):
-        self._text = text
+from autokat.highscores import Highscore, Highscores
 
 
-def test_highscores_load():
-    highscores = Highscores(
-        DummyPath(
-            json.dumps(
-                [
-                    {"team_name": "team1", "score": 100},
-                    {"team_name": "team2", "score": 90},
-                ]
-            )
+def _legacy_file(tmp_path):
+    path = tmp_path / "highscores.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"team_name": "team1", "score": 100},
+                {"team_name": "team2", "score": 90},
+            ]
         )
     )
+    return path
+
+
+def test_highscores_load(tmp_path):
+    highscores = Highscores(_legacy_file(tmp_path))
     assert highscores.top(5) == [
         Highscore(team_name="team1", score=100),
         Highscore(team_name="team2", score=90),
     ]
 
-def test_highscores_insert():
-    highscores = Highscores(
-        DummyPath(
-            json.dumps(
-                [
-                    {"team_name": "team1", "score": 100},
-                    {"team_name": "team2", "score": 90},
-                ]
-            )
-        )
-    )
+def test_highscores_insert(tmp_path):
+    highscores = Highscores(_legacy_file(tmp_path))
     highscores.add_score("team3", 95)
     assert highscores.top(5) == [
         Highscore(team_name="team1", score=100),
@@ -47,20 +33,54 @@ def test_highscores_insert():
         Highscore(team_name="team2", score=90),
     ]
 
-def test_highscores_insert_stable():
-    highscores = Highscores(
-        DummyPath(
-            json.dumps(
-                [
-                    {"team_name": "team1", "score": 100},
-                    {"team_name": "team2", "score": 90},
-                ]
-            )
-        )
-    )
+def test_highscores_insert_stable(tmp_path):
+    highscores = Highscores(_legacy_file(tmp_path))
     highscores.add_score("team3", 100)
     assert highscores.top(5) == [
         Highscore(team_name="team1", score=100),
         Highscore(team_name="team3", score=100),
         Highscore(team_name="team2", score=90),
     ]
+
+def test_highscores_are_appended(tmp_path):
+    path = _legacy_file(tmp_path)
+    highscores = Highscores(path)
+    # the old format is compacted into lines first
+    highscores.add_score("team3", 95)
+    assert path.read_text().splitlines() == [
+        '{"team_name": "team1", "score": 100}',
+        '{"team_name": "team3", "score": 95}',
+        '{"team_name": "team2", "score": 90}',
+    ]
+    assert highscores.add_score("team4", 90) == (Highscore("team4", 90), 3)
+    assert path.read_text().splitlines()[-1] == '{"team_name": "team4", "score": 90}'
+    assert Highscores(path).top(10) == highscores.top(10)
+
+def test_incomplete_last_line_is_dropped(tmp_path):
+    path = tmp_path / "highscores.json"
+    path.write_text('{"team_name": "team1", "score": 100}\n{"team_name": "te')
+    highscores = Highscores(path)
+    assert len(highscores) == 1
+    highscores.add_score("team2", 50)
+    assert Highscores(path).top(10) == [Highscore("team1", 100), Highscore("team2", 50)]
+
+def test_log_is_compacted(tmp_path):
+    path = tmp_path / "highscores.json"
+    highscores = Highscores(path, compact_every=3)
+    for score in range(5):
+        highscores.add_score(f"team{score}", score)
+    # compacted at the fourth score, one appended since
+    assert path.read_text().splitlines()[:4] == [json.dumps({"team_name": f"team{score}", "score": score}) for score in (3, 2, 1, 0)]
+    assert not (tmp_path / "highscores.json.tmp").exists()
+
+def test_rank_and_top_match_sorting(tmp_path):
+    rng = random.Random(0)
+    highscores = Highscores(tmp_path / "highscores.json", compact_every=50)
+    added = []
+    for i in range(300):
+        score = rng.randrange(200)
+        assert highscores.rank(score) == sum(1 for h in added if h.score >= score)
+        added.append(highscores.add_score(f"team{i}", score)[0])
+    expected = sorted(added, key=lambda h: -h.score)
+    assert highscores.top(20) == expected[:20]
+    assert Highscores(tmp_path / "highscores.json").top(300) == expected
@@ -0,0 +1,35 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from autokat.highscores import Highscore, Highscores
+from autokat.leaderboard import Leaderboard
+
+
+def test_scores_are_answered_before_they_are_written(tmp_path):
+    path = tmp_path / "highscores.json"
+    Highscores(path).add_score("team1", 10)
+    executor = ThreadPoolExecutor(max_workers=1)
+    disk_busy = threading.Event()
+    leaderboard = Leaderboard(path, executor=executor)
+    # the disk is slow
+    executor.submit(disk_busy.wait)
+    assert leaderboard.add_score("team2", 20) == (Highscore("team2", 20), 0)
+    assert leaderboard.add_score("team3", 15) == (Highscore("team3", 15), 1)
+    assert leaderboard.top(2) == [Highscore("team2", 20), Highscore("team3", 15)]
+    assert leaderboard.rank(12) == 2
+    assert len(Highscores(path)) == 1
+
+    disk_busy.set()
+    leaderboard.flush()
+    assert Highscores(path).top(3) == [Highscore("team2", 20), Highscore("team3", 15), Highscore("team1", 10)]
+    leaderboard.close()
+    executor.shutdown()
+
+
+def test_close_writes_everything(tmp_path):
+    path = tmp_path / "highscores.json"
+    leaderboard = Leaderboard(path)
+    for score in range(20):
+        leaderboard.add_score(f"team{score}", score)
+    leaderboard.close()
+    assert Highscores(path).top(20) == leaderboard.top(20)
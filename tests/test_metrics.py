@@ -0,0 +1,60 @@
+import pickle
+
+from autokat.metrics import Registry
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    frames = registry.counter("frames_total", "Frames", ["tracker"])
+    frames.labels("cam").inc()
+    frames.labels("cam").inc(2)
+    registry.gauge("clients", "Clients").set_function(lambda: 3)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in 0.05, 0.5, 5:
+        latency.observe(value)
+    assert registry.render() == "\n".join([
+        "# HELP clients Clients",
+        "# TYPE clients gauge",
+        "clients 3.0",
+        "# HELP frames_total Frames",
+        "# TYPE frames_total counter",
+        'frames_total{tracker="cam"} 3.0',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1.0"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 5.55",
+        "latency_seconds_count 3",
+    ]) + "\n"
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("messages_total", "Messages", ["arena"]).labels('the "big" hall\n').inc()
+    assert 'messages_total{arena="the \\"big\\" hall\\n"} 1.0' in registry.render()
+
+
+def test_declaring_again_gives_the_same_metric():
+    registry = Registry()
+    assert registry.counter("frames_total", "Frames") is registry.counter("frames_total", "Frames")
+
+
+def test_snapshots_of_other_processes_are_merged():
+    parent, child = Registry(), Registry()
+    for registry in parent, child:
+        registry.counter("frames_total", "Frames", ["tracker"]).labels("cam").inc(2)
+        registry.histogram("stage_seconds", "Stages", buckets=(1,)).observe(0.5)
+        registry.gauge("age_seconds", "Age").set(1 if registry is parent else 7)
+    child.counter("restarts_total", "Restarts").inc()
+    # the snapshot of the child arrives pickled
+    snapshot = pickle.loads(pickle.dumps(child.snapshot()))
+    parent.add_collector(lambda: snapshot)
+    text = parent.render()
+    assert 'frames_total{tracker="cam"} 4.0' in text
+    assert 'stage_seconds_bucket{le="1.0"} 2' in text
+    assert "restarts_total 1.0" in text
+    # the gauges of the parent win
+    assert "age_seconds 1.0" in text
+    # and merging left the parent alone
+    assert parent.snapshot()["frames_total"][4] == {("cam",): 2.0}
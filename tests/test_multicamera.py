@@ -0,0 +1,117 @@
+import datetime
+import json
+import math
+import threading
+import time
+
+import numpy
+
+from autokat.capture import Frame
+from autokat.multicamera import CameraConfig, MultiCameraTracker, fuse_detections, load_cameras
+from autokat.multitrack import Detection, MultiLaserTracker, ProcessingConfig, Vec
+from autokat.synthetic import laser_color
+
+_NOW = datetime.datetime(2024, 12, 1, 20, 0, 0)
+
+
+def _detection(x, seconds_ago=0.0, confidence=1.0, velocity=Vec(0, 0)):
+    seen_at = _NOW - datetime.timedelta(seconds=seconds_ago)
+    return Detection(
+        camera_position=Vec(x, x),
+        screen_position=Vec(x, 0),
+        time=seen_at,
+        captured_at=seen_at,
+        velocity=velocity,
+        confidence=confidence,
+    )
+
+
+def test_fuse_weighs_cameras_by_confidence():
+    fused = fuse_detections([
+        {"red": _detection(100, confidence=0.75)},
+        {"red": _detection(200, confidence=0.25)},
+    ])
+    assert fused["red"].screen_position == Vec(125, 0)
+    assert fused["red"].confidence == 0.75
+
+
+def test_fuse_predicts_older_sightings_at_the_newest():
+    fused = fuse_detections([
+        {"red": _detection(100, velocity=Vec(1000, 0))},
+        {"red": _detection(150, seconds_ago=0.05, velocity=Vec(1000, 0))},
+    ])
+    # the second camera saw it 50 px back
+    assert fused["red"].screen_position.x == 150
+    assert fused["red"].time == _NOW
+
+
+def test_fuse_ignores_cameras_that_lost_the_laser():
+    fused = fuse_detections([
+        {"red": _detection(100, seconds_ago=1), "green": _detection(10)},
+        {"red": _detection(200), "green": _detection(20, seconds_ago=1)},
+    ])
+    assert fused["red"] == _detection(200)
+    assert fused["green"] == _detection(10)
+    assert list(fused) == ["red", "green"]
+
+
+def test_blobs_of_mixed_colors_are_less_confident(tmp_path):
+    tracker = MultiLaserTracker(
+        processing_config=ProcessingConfig(),
+        calibration_file_path=str(tmp_path / "calibration.json"),
+        headless=True,
+    )
+    image = numpy.zeros((600, 800, 3), numpy.uint8)
+    image[300:310, 400:410] = laser_color(72)
+    image[300:310, 100:110] = laser_color(170)
+    # a quarter of the red blob is white
+    image[300:305, 100:105] = 255
+    detections = tracker.process_frame(Frame(image=image, index=0, captured_at=datetime.datetime.now())).detections
+    assert detections["green"].confidence == 1.0
+    assert detections["red"].confidence == 0.75
+    assert tracker.last_detections["red"].confidence == 0.75
+
+
+def test_cameras_are_tracked_in_parallel(tmp_path):
+    cameras_file = tmp_path / "cameras.json"
+    cameras_file.write_text(json.dumps([
+        {"source": "synthetic", "calibration_file_path": str(tmp_path / f"calibration-{i}.json")}
+        for i in range(2)
+    ]))
+    cameras = load_cameras(str(cameras_file))
+    assert cameras[1] == CameraConfig("synthetic", str(tmp_path / "calibration-1.json"))
+
+    tracker = MultiCameraTracker(cameras, processing_config=ProcessingConfig())
+    thread = threading.Thread(target=tracker.run)
+    thread.start()
+    try:
+        started_at = datetime.datetime.now()
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if all(d["red"].time > started_at for d in tracker.camera_detections):
+                break
+            time.sleep(0.05)
+        camera_detections = tracker.camera_detections
+        assert all(d["red"].time > started_at for d in camera_detections)
+        red = tracker.last_detections["red"]
+        # both cameras see the same synthetic scene, on the same clock
+        assert all(math.dist(red.screen_position, d["red"].screen_position) < 100 for d in camera_detections)
+    finally:
+        tracker.stop()
+        thread.join()
+
+
+def test_detections_are_only_fused_when_a_camera_wrote(tmp_path):
+    cameras = [CameraConfig("synthetic", str(tmp_path / f"calibration-{i}.json")) for i in range(2)]
+    tracker = MultiCameraTracker(cameras, processing_config=ProcessingConfig())
+    try:
+        fused = tracker.last_detections
+        assert tracker.last_detections is fused
+        # newer than what the cameras started with
+        seen_at = datetime.datetime.now() + datetime.timedelta(seconds=1)
+        red = _detection(300)._replace(time=seen_at, captured_at=seen_at)
+        tracker.trackers[1].slots.write({"red": red, "green": red})
+        assert tracker.last_detections is not fused
+        assert tracker.last_detections["red"] == red
+    finally:
+        tracker.stop()
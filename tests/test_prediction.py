@@ -0,0 +1,40 @@
+import datetime
+
+import pytest
+
+from autokat.multitrack import AlphaBetaFilter, Detection, MAX_PREDICTION_TIME, Vec
+
+_start = datetime.datetime(2024, 12, 1, 20, 0, 0)
+_frame_time = datetime.timedelta(seconds=1 / 30)
+
+
+def test_filter_learns_constant_velocity():
+    motion_filter = AlphaBetaFilter()
+    for i in range(30):
+        position, velocity = motion_filter.update(Vec(100 + 300 * i / 30, 200), _start + i * _frame_time)
+    assert position.x == pytest.approx(100 + 300 * 29 / 30, abs=1)
+    assert velocity.x == pytest.approx(300, rel=0.05)
+    assert velocity.y == pytest.approx(0)
+
+
+def test_filter_restarts_after_gap():
+    motion_filter = AlphaBetaFilter()
+    motion_filter.update(Vec(0, 0), _start)
+    motion_filter.update(Vec(10, 0), _start + _frame_time)
+    position, velocity = motion_filter.update(Vec(500, 500), _start + datetime.timedelta(seconds=5))
+    assert position == Vec(500, 500)
+    assert velocity == Vec(0, 0)
+
+
+def test_predict_extrapolates_with_limit():
+    detection = Detection(
+        camera_position=Vec(0, 0),
+        screen_position=Vec(100, 100),
+        time=_start,
+        captured_at=_start,
+        velocity=Vec(200, -100),
+    )
+    assert detection.predict(_start) == Vec(100, 100)
+    assert detection.predict(_start + datetime.timedelta(seconds=0.05)) == pytest.approx(Vec(110, 95))
+    far_future = detection.predict(_start + datetime.timedelta(seconds=10))
+    assert far_future == pytest.approx(Vec(100, 100) + Vec(200, -100) * MAX_PREDICTION_TIME.total_seconds())
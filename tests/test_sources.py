@@ -0,0 +1,55 @@
+import datetime
+import math
+
+import cv2
+import numpy
+import pytest
+
+from autokat.capture import Frame
+from autokat.multitrack import MultiLaserTracker, ProcessingConfig
+from autokat.sources import ImageSequenceSource, SyntheticLaserSource, open_frame_source
+
+
+def test_image_sequence_in_name_order(tmp_path):
+    for i in (2, 0, 1):
+        cv2.imwrite(str(tmp_path / f"frame_{i}.png"), numpy.full((4, 4, 3), i, numpy.uint8))
+    source = open_frame_source(str(tmp_path))
+    assert isinstance(source, ImageSequenceSource)
+    values = []
+    while (result := source.read())[0]:
+        values.append(int(result[1][0, 0, 0]))
+    assert values == [0, 1, 2]
+    assert source.read() == (False, None)
+
+
+def test_missing_video_file():
+    with pytest.raises(ValueError):
+        open_frame_source("does-not-exist.mp4")
+
+
+def test_tracker_finds_synthetic_lasers(tmp_path):
+    source = SyntheticLaserSource(frames=10)
+    tracker = MultiLaserTracker(
+        processing_config=ProcessingConfig(),
+        calibration_file_path=str(tmp_path / "calibration.json"),
+        headless=True,
+    )
+    frames = 0
+    while (result := source.read())[0]:
+        frame_result = tracker.process_frame(Frame(image=result[1], index=frames, captured_at=datetime.datetime.now()))
+        assert frame_result.detections.keys() == source.ground_truth.keys()
+        for laser_name, blob in frame_result.detections.items():
+            assert math.dist(blob.camera_position, source.ground_truth[laser_name]) < 1
+        frames += 1
+    assert frames == 10
+    assert set(frame_result.stage_times) == {"threshold", "blobs", "classify", "transform"}
+
+
+def test_realtime_synthetic_scenes_agree():
+    first, second = SyntheticLaserSource(realtime=True), SyntheticLaserSource(realtime=True)
+    for _ in range(5):
+        first.read()
+    second.read()
+    # read at a different frame, but at about the same time
+    for laser_name, position in first.ground_truth.items():
+        assert math.dist(position, second.ground_truth[laser_name]) < 5
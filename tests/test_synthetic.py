@@ -0,0 +1,61 @@
+import datetime
+import math
+
+import numpy
+
+from autokat.capture import Frame
+from autokat.metrics import REGISTRY
+from autokat.multitrack import DETECTION_AGE, TRACKER_BLOBS, TRACKER_FRAMES, TRACKER_STAGE_SECONDS, MultiLaserTracker, ProcessingConfig
+from autokat.synthetic import LaserFrameGenerator, SceneConfig
+
+
+def test_rendering_is_reproducible():
+    config = SceneConfig(width=320, height=240, noise=3, distractors=20)
+    first, first_truth = LaserFrameGenerator(config).render(5)
+    second, second_truth = LaserFrameGenerator(config).render(5)
+    assert numpy.array_equal(first, second)
+    assert first_truth == second_truth
+    assert first.shape == (240, 320, 3) and first.dtype == numpy.uint8
+
+
+def test_tracker_finds_lasers_in_a_busy_scene(tmp_path):
+    generator = LaserFrameGenerator(SceneConfig(
+        bloom_radius=3,
+        noise=4,
+        exposure=1 / 60,
+        distractors=50,
+        background="autokat/web/static/disco_00000.png",
+    ))
+    tracker = MultiLaserTracker(
+        processing_config=ProcessingConfig(),
+        calibration_file_path=str(tmp_path / "calibration.json"),
+        headless=True,
+    )
+    for index in range(0, 300, 30):
+        image, ground_truth = generator.render(index)
+        result = tracker.process_frame(Frame(image=image, index=index, captured_at=datetime.datetime.now()))
+        for laser_name, position in ground_truth.items():
+            assert math.dist(result.detections[laser_name].camera_position, position) < 1.5
+
+
+def test_tracker_records_metrics(tmp_path):
+    generator = LaserFrameGenerator(SceneConfig(width=320, height=240, distractors=5))
+    tracker = MultiLaserTracker(
+        cam_width=320,
+        cam_height=240,
+        processing_config=ProcessingConfig(),
+        calibration_file_path=str(tmp_path / "calibration.json"),
+        headless=True,
+        name="synthetic metrics",
+    )
+    for index in range(3):
+        image, _ = generator.render(index)
+        tracker.process_frame(Frame(image=image, index=index, captured_at=datetime.datetime.now()))
+    assert TRACKER_FRAMES.labels("synthetic metrics").sample() == 3
+    counts, _ = TRACKER_STAGE_SECONDS.labels("synthetic metrics", "threshold").sample()
+    assert sum(counts) == 3
+    counts, blobs = TRACKER_BLOBS.labels("synthetic metrics").sample()
+    assert sum(counts) == 3 and blobs >= 3 * 2
+    assert 0 <= DETECTION_AGE.labels("synthetic metrics", "red").sample() < 10
+    tracker.stop()
+    assert 'autokat_tracker_detection_age_seconds{tracker="synthetic metrics"' not in REGISTRY.render()
@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+
+from autokat.timestep import FixedTimestep
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _timestep(max_substeps=4):
+    clock = FakeClock()
+    return clock, FixedTimestep(datetime.timedelta(seconds=0.03), max_substeps=max_substeps, clock=clock)
+
+
+def test_steps_at_fixed_rate():
+    clock, timestep = _timestep()
+    clock.now += 0.02
+    assert timestep.advance() == 0
+    assert timestep.time_until_next_step() == pytest.approx(0.01)
+    clock.now += 0.015
+    assert timestep.advance() == 1
+    assert timestep.next_step() == datetime.timedelta(seconds=0.03)
+    # the 5 ms we were late are not lost
+    assert timestep.time_until_next_step() == pytest.approx(0.025)
+    assert timestep.metrics.last_jitter == pytest.approx(0.005)
+
+
+def test_catches_up_with_bounded_substeps():
+    clock, timestep = _timestep(max_substeps=3)
+    clock.now += 0.1
+    assert timestep.advance() == 3
+    for _ in range(3):
+        timestep.next_step()
+    assert timestep.metrics.overruns == 1
+    assert timestep.metrics.dropped_steps == 0
+
+    clock.now += 1
+    assert timestep.advance() == 3
+    for _ in range(3):
+        timestep.next_step()
+    assert timestep.metrics.dropped_steps > 0
+    assert timestep.simulation_time == datetime.timedelta(seconds=0.18)
+    # the dropped backlog doesn't make the loop run behind forever
+    assert timestep.time_until_next_step() < 0.03
+    assert timestep.advance() == 0
+
+
+def test_lead_takes_a_step_early():
+    clock, timestep = _timestep()
+    clock.now += 0.01
+    assert timestep.advance() == 0
+    assert timestep.advance(lead=0.03) == 1
+    timestep.next_step()
+    assert timestep.metrics.early_wakeups == 1
+    assert timestep.metrics.max_jitter == 0
+    # at most one step ahead
+    assert timestep.advance(lead=0.03) == 0
+    # the step after is due a full step after the one taken early was
+    assert timestep.time_until_next_step() == pytest.approx(0.05)
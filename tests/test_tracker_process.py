@@ -0,0 +1,164 @@
+import datetime
+import threading
+import time
+
+
+from autokat.capture import Frame
+from autokat.classifier import config_key
+from autokat.detection_channel import DetectionChannel
+from autokat.metrics import REGISTRY
+from autokat.multitrack import TRACKER_FRAMES, Detection, LaserConfig, MultiLaserTracker, ProcessingConfig, Vec
+from autokat.synthetic import LaserFrameGenerator, SceneConfig
+from autokat.tracker_process import DetectionSlots, TrackerProcess, _handle_command, _notify
+
+_LASERS = ["red", "green"]
+
+
+def _detection(x, captured_at=None):
+    return Detection(
+        camera_position=Vec(x, x + 1),
+        screen_position=Vec(x + 2, x + 3),
+        time=datetime.datetime(2024, 12, 1, 20, 0, 0),
+        captured_at=captured_at,
+        velocity=Vec(x + 4, x + 5),
+    )
+
+
+def test_detection_slots_round_trip():
+    slots = DetectionSlots.create(_LASERS)
+    writer = DetectionSlots.attach(slots.name, _LASERS)
+    try:
+        detections = {"red": _detection(1), "green": _detection(10, captured_at=datetime.datetime(2024, 12, 1, 19, 59, 59))}
+        writer.write(detections)
+        assert slots.read() == detections
+        # nothing was written since, the same detections are handed out again
+        assert slots.read() is slots.read()
+        writer.write({**detections, "red": _detection(2)})
+        assert slots.read()["red"] == _detection(2)
+    finally:
+        writer.close()
+        slots.close()
+    # like a TrackerProcess that is stopped before it ran
+    slots.close()
+
+
+def test_detection_slots_after_a_writer_died_halfway():
+    slots = DetectionSlots.create(_LASERS)
+    writer = DetectionSlots.attach(slots.name, _LASERS)
+    try:
+        detections = {"red": _detection(1), "green": _detection(10)}
+        writer.write(detections)
+        assert slots.read() == detections
+        # killed between making the sequence number odd and even again
+        writer._sequence[0] += 1
+        writer._values[1:] = 0
+        assert slots.read() == detections
+        # the next writer goes on from an even number
+        writer.write({**detections, "red": _detection(2)})
+        assert int(slots._sequence[0]) % 2 == 0
+        assert slots.read()["red"] == _detection(2)
+        writer._sequence[0] += 1
+        slots.reset()
+        assert int(slots._sequence[0]) % 2 == 0
+    finally:
+        writer.close()
+        slots.close()
+
+
+def crashing_tracker(slots_name, laser_names, commands, previews, tracker_kwargs, detected, metrics):
+    # runs in the child process
+    slots = DetectionSlots.attach(slots_name, laser_names)
+    slots.write({laser_name: _detection(42) for laser_name in laser_names})
+    _notify(detected)
+    TRACKER_FRAMES.labels(tracker_kwargs["name"]).inc(5)
+    metrics.put(REGISTRY.snapshot())
+    raise SystemExit(3)
+
+
+def test_tracker_process_is_restarted(tmp_path):
+    tracker = TrackerProcess(
+        processing_config=ProcessingConfig(),
+        calibration_file_path=str(tmp_path / "calibration.json"),
+        restart_delay=0,
+        target=crashing_tracker,
+        name="crashing",
+    )
+    tracker.detection_channel = DetectionChannel()
+    assert tracker.last_detections["red"].screen_position == Vec(512, 384)
+    thread = threading.Thread(target=tracker.run)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 30
+        while tracker.restarts < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert tracker.restarts >= 2
+        assert tracker.last_detections["red"] == _detection(42)
+        while tracker.detection_channel.published == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert tracker.detection_channel.published > 0
+        # the metrics of the tracker process are served by this one
+        while 'autokat_tracker_frames_total{tracker="crashing"} 5.0' not in REGISTRY.render() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        metrics = REGISTRY.render()
+        assert 'autokat_tracker_frames_total{tracker="crashing"} 5.0' in metrics
+        assert 'autokat_tracker_detection_age_seconds{tracker="crashing",laser="red"}' in metrics
+    finally:
+        tracker.stop()
+        thread.join()
+    assert tracker.process.exitcode is not None
+    # only the restarts were counted by this process
+    assert 'autokat_tracker_frames_total{tracker="crashing"}' not in REGISTRY.render()
+    assert 'autokat_tracker_restarts_total{tracker="crashing"}' in REGISTRY.render()
+
+
+def stalling_tracker(slots_name, laser_names, commands, previews, tracker_kwargs, detected, metrics):
+    time.sleep(3600)
+
+
+def test_stalled_tracker_process_is_killed(tmp_path):
+    tracker = TrackerProcess(
+        processing_config=ProcessingConfig(),
+        calibration_file_path=str(tmp_path / "calibration.json"),
+        restart_delay=0,
+        stall_timeout=0.5,
+        target=stalling_tracker,
+    )
+    thread = threading.Thread(target=tracker.run)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 30
+        while tracker.restarts < 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert tracker.restarts >= 1
+    finally:
+        tracker.stop()
+        thread.join()
+
+
+def reconfigured_tracker(slots_name, laser_names, commands, previews, tracker_kwargs, detected, metrics):
+    # runs in the child process, reports the lookup table it classified a frame with after every command
+    tracker = MultiLaserTracker(headless=True, **tracker_kwargs)
+    image, _ = LaserFrameGenerator(SceneConfig()).render(0)
+    while True:
+        _handle_command(tracker, commands.get())
+        tracker.process_frame(Frame(image=image, index=0, captured_at=datetime.datetime.now()))
+        previews.put(tracker.classifier.key)
+
+
+def test_processing_config_edits_reach_the_tracker_process(tmp_path):
+    tracker = TrackerProcess(
+        processing_config=ProcessingConfig(),
+        calibration_file_path=str(tmp_path / "calibration.json"),
+        stall_timeout=60,
+        target=reconfigured_tracker,
+    )
+    thread = threading.Thread(target=tracker.run)
+    thread.start()
+    try:
+        edited = ProcessingConfig(val_min=120, laser_configs={"red": LaserConfig(140, 200), "green": LaserConfig(50, 100)})
+        tracker.update_processing_config(edited)
+        assert tracker._previews.get(timeout=30) == config_key(edited)
+        assert config_key(edited) != config_key(ProcessingConfig())
+    finally:
+        tracker.stop()
+        thread.join()